@@ -16,17 +16,42 @@
 #  limitations under the License.
 
 import os
-import natsort
-import re
-from operator import itemgetter
+from collections import OrderedDict
 from datetime import datetime, timedelta
-import xlwings as xw
+try:
+    import xlwings as xw
+except ImportError:
+    xw = None
 from version import VERSION
+from backends import ExcelBackend, XlsxBackend, XlsxStreamBackend
+from backgroundsave import BackgroundSave
+from batchedit import BatchEdit
+from broker import BrokerBackend, BrokerClient
+from cellcache import CellCache
+from workbooks import WorkbookRegistry
+from extraction import extract_sheets
+from performancemode import PerformanceMode, PerformanceModeListener
+from instrumentation import CountingBackend, PerformanceStats, StatsListener, SummaryListener, normalize_name
+from snapshot import SnapshotCache
+from templates import Template
+from valueindex import KeyIndex, SheetIndex
+from cellref import cell_address, column_letter, split_range
+from coercion import coerce_value, coerce_values, date_parser, number_format, stored_value
+from aggregate import column_statistics, group_aggregate
+from compare import compare_blocks, ignored_columns
+from csvtransfer import read_csv_chunks, write_csv
+from rangeops import arithmetic, shift_dates
 import atexit
+import time
 
 _version_ = VERSION
 
 
+def _has_value(values):
+    #  0, 0.0 and False are values, only None and empty text are empty cells.
+    return any(value is not None and value != '' for value in values)
+
+
 class Excel10Library:
     """
     This library provides keywords to allow basic control
@@ -36,18 +61,96 @@ class Excel10Library:
     some keyword are added to provide extra functionality
 
     This library depends heavily on xlwings
+
+    The backend used to open workbooks can be chosen when the library is imported:
+    | *Setting* | *Value*         | *Value*       |
+    | Library   | Excel10Library  | backend=xlsx  |
+
+    - excel (default): workbooks are opened in Excel through xlwings. All keywords are available.
+    - xlsx: workbooks are read straight from the xlsx file, no Excel is started. It works on any operating
+      system and is a lot faster. Cells of opened workbooks can be read and changed, but no sheets added.
+      Save Excel only rewrites the sheets with changed cells and copies the rest of the file as it is.
+      Changed cells lose their formulas and Excel recalculates the other formulas when it opens the file.
+      Workbooks made with Create Excel Workbook can only be written: Add New Sheet, Put ... To Cell and Save
+      Excel stream the rows to disk, so large workbooks take little memory. Cells can be put in any order
+      within the last 1000 rows written.
+
+    With the xlsx backend, workbooks that are opened again and again can be kept parsed on disk. The first
+    open of a file stores a snapshot of its values in cachedir, later opens of the same content, also in
+    later test runs, read the snapshot instead of the file. cachesize limits the snapshots in MB (default
+    512), the least recently used ones are removed first. Workbooks opened from the cache can only be read:
+    | Library   | Excel10Library  | backend=xlsx  | cachedir=${TEMPDIR}/excelcache  |
+
+    With backgroundsave=True and the xlsx backend, Save Excel takes a copy of the workbook's state and
+    writes the file on a separate thread, so the test goes on right away. Wait For Save waits until the
+    files are written and fails when a save failed; closing a workbook waits for its save as well. Excel
+    workbooks are always saved right away:
+    | Library   | Excel10Library  | backend=xlsx  | backgroundsave=True  |
+
+    The library counts the calls it makes to Excel or the file and the cells they move, and times each of
+    its keywords. Get Excel Performance Stats returns the numbers and a summary table is added to the
+    metadata of every suite that used the library, where it shows in the log and the report.
+
+    Several workbooks can be open at the same time, each under its own alias (by default the file name).
+    The keywords work on the current workbook, Switch Workbook changes which one that is. When more than
+    maxworkbooks (default 10) workbooks are open, the least recently used one is closed without saving:
+    | Library   | Excel10Library  | maxworkbooks=4  |
+
+    Parallel runs (pabot) can share Excel instead of starting one per process. With broker set to the path of a
+    Unix socket (or to localhost:port on Windows) the library uses the Excel broker listening there, and starts
+    one when there is none. The broker owns at most brokerapps Excel instances (default 2) for all processes.
+    A workbook that one test has open or saved is locked for the others: Open Excel waits at most brokertimeout
+    seconds (default 60) for it. Changes are sent to the broker together with the next read or save:
+    | Library   | Excel10Library  | broker=${TEMPDIR}/excel.sock  | brokerapps=2  |
+
+    Excel is only started when the first keyword needs it, so importing the library, libdoc and dry-runs
+    do not start Excel. With attachapp=True an Excel instance that is already running is used instead of
+    starting a new one, the library then leaves it running when the tests are done:
+    | Library   | Excel10Library  | attachapp=True  |
     """
 
     ROBOT_LIBRARY_SCOPE = 'GLOBAL'
     ROBOT_LIBRARY_VERSION = VERSION
 
-    def __init__(self):
+    BACKENDS = ('excel', 'xlsx')
+
+    def __init__(self, backend='excel', maxworkbooks=10, attachapp=False, cachedir=None, cachesize=512, backgroundsave=False,
+                 broker=None, brokerapps=2, brokertimeout=60):
+        if backend not in self.BACKENDS:
+            raise ValueError("Unknown backend '%s', use one of: %s" % (backend, ', '.join(self.BACKENDS)))
+        if cachedir and backend != 'xlsx':
+            raise ValueError("cachedir can only be used with backend=xlsx, workbooks opened in Excel can change")
+        if broker and backend != 'excel':
+            raise ValueError("broker can only be used with backend=excel")
+        self.snapshots = SnapshotCache(cachedir, float(cachesize) * 1024 * 1024) if cachedir else None
         self.wb = None
         self.tb = None
         self.sheetNum = None
         self.sheetNames = None
         self.fileName = None
-        self.xa = xw.App(False)
+        self.valueIndex = {}
+        self.keyIndex = {}
+        self.backendName = backend
+        self.backend = None
+        self.alias = None
+        self.workbooks = WorkbookRegistry(maxworkbooks)
+        self.cursors = {}
+        self.created = 0
+        self.xa = None
+        self.attachApp = str(attachapp).lower() in ('true', 'yes', '1')
+        self.ownsApp = False
+        self.broker = broker
+        self.brokerApps = int(brokerapps)
+        self.brokerTimeout = float(brokertimeout)
+        self.brokerClient = None
+        self.templates = {}
+        self.templateCopies = []
+        self.backgroundSave = str(backgroundsave).lower() in ('true', 'yes', '1')
+        self.saves = {}
+        self.stats = PerformanceStats()
+        self.performance = PerformanceMode()
+        self.performanceListener = PerformanceModeListener(self.performance)
+        self.ROBOT_LIBRARY_LISTENER = [StatsListener(self, self.stats), SummaryListener(self.stats), self.performanceListener]
         if os.name is "nt":
             self.tmpDir = "Temp"
         else:
@@ -55,9 +158,238 @@ class Excel10Library:
         atexit.register(self._exit)
 
     def _exit(self):
-        self.xa.quit()
-
-    def open_excel(self, filename, useTempDir=False):
+        try:
+            #  An attached Excel keeps running, it gets the user's settings back.
+            self.performance.disable()
+        finally:
+            if self.xa is not None and self.ownsApp:
+                self.xa.quit()
+            if self.brokerClient is not None:
+                #  The broker closes the workbooks of a connection that ends.
+                self.brokerClient.close()
+            for path in self.templateCopies:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _excel_app(self):
+        if self.xa is None:
+            if xw is None:
+                raise RuntimeError("The excel backend needs xlwings, install it or use backend=xlsx")
+            start = time.time()
+            if self.attachApp and xw.apps.count:
+                self.xa = xw.apps.active
+                print '*INFO* Attached to running Excel in %.2f seconds' % (time.time() - start)
+            else:
+                self.xa = xw.App(False)
+                self.ownsApp = True
+                print '*INFO* Started Excel in %.2f seconds' % (time.time() - start)
+        return self.xa
+
+    def _broker(self):
+        if self.brokerClient is None:
+            start = time.time()
+            self.brokerClient = BrokerClient(self.broker, self.brokerApps, xlwings=xw)
+            print '*INFO* Connected to the Excel broker on %s in %.2f seconds' % (self.broker, time.time() - start)
+        return self.brokerClient
+
+    def _open(self, path, alias, **options):
+        self._store()
+        if self.backendName == 'xlsx':
+            self.wb = None
+            if self.snapshots is not None:
+                hits = self.snapshots.hits
+                backend = self.snapshots.open(path)
+                print '*DEBUG* %s snapshot of %s' % ('Read' if self.snapshots.hits > hits else 'Wrote', path)
+            else:
+                backend = XlsxBackend(path)
+        elif self.broker:
+            self.wb = None
+            backend = BrokerBackend.open(self._broker(), os.path.abspath(path), self.brokerTimeout, **options)
+        else:
+            self.wb = self._excel_app().books.open(path, **options)
+            backend = ExcelBackend(self.wb, self.performance)
+        self.backend = CountingBackend(backend, self.stats)
+        #  Absolute, so Get Workbook Values finds the file after a change of working directory.
+        self.fileName = os.path.abspath(path)
+        self.valueIndex = {}
+        self.keyIndex = {}
+        self.sheetNames = self.backend.sheet_names()
+        self._register(alias)
+
+    def _state(self):
+        return {'wb': self.wb, 'backend': self.backend, 'sheetNames': self.sheetNames, 'fileName': self.fileName,
+                'valueIndex': self.valueIndex, 'keyIndex': self.keyIndex}
+
+    def _restore(self, alias, state):
+        self.alias = alias
+        self.wb = state['wb']
+        self.backend = state['backend']
+        self.sheetNames = state['sheetNames']
+        self.fileName = state['fileName']
+        self.valueIndex = state['valueIndex']
+        self.keyIndex = state['keyIndex']
+
+    def _store(self):
+        #  The current workbook's attributes change freely, they are written back before switching away.
+        if self.alias is not None:
+            self.workbooks.update(self.alias, self._state())
+
+    def _register(self, alias):
+        replaced = self.workbooks.remove(alias)
+        if replaced is not None and replaced['wb'] is not None and replaced['wb'] == self.wb:
+            #  Excel hands out the already open book when a file is opened twice.
+            replaced = None
+        if replaced is not None:
+            self._close(alias, replaced)
+        self.alias = alias
+        for old_alias, state in self.workbooks.add(alias, self._state()):
+            print '*WARN* Closing workbook %s without saving, more than %d workbooks are open' % (old_alias, self.workbooks.max_open)
+            self._close(old_alias, state)
+
+    def _close(self, alias, state):
+        for cursor, (cursor_alias, rows) in list(self.cursors.items()):
+            if cursor_alias == alias:
+                self.close_row_cursor(cursor)
+        try:
+            self._wait_for_saves(alias)
+        finally:
+            state['backend'].close()
+
+    def _invalidate(self, sheetname=None):
+        #  Everything cached about the sheet is stale after a change through one of the keywords.
+        self.backend.invalidate(sheetname)
+
+    def _format_values(self, values, first_row, first_column, includeEmptyCells, format):
+        #  values is a list of rows as read from the backend, starting at first_row/first_column.
+        width = len(values[0]) if values else 0
+        if format == 'rows':
+            if includeEmptyCells is True:
+                return values
+            return [row_values for row_values in values if _has_value(row_values)]
+        if format == 'columns':
+            data = OrderedDict()
+            for col_offset in range(width):
+                column_values = [row_values[col_offset] for row_values in values]
+                if includeEmptyCells is True or _has_value(column_values):
+                    data[column_letter(first_column + col_offset)] = column_values
+            return data
+        if format != 'pairs':
+            raise ValueError("Unknown format '%s', use pairs, rows or columns" % format)
+        #  Same order as a natural sort of the addresses: column letters alphabetically, then row number.
+        data = []
+        columns = sorted(range(first_column, first_column + width), key=column_letter)
+        for column in columns:
+            letters = column_letter(column)
+            col_offset = column - first_column
+            for row_offset, row_values in enumerate(values):
+                value = row_values[col_offset]
+                if includeEmptyCells is True or value:
+                    data.append((letters + str(first_row + row_offset), value))
+        return data
+
+    def _layer(self, cls):
+        backend = self.backend
+        while backend is not None and not isinstance(backend, cls):
+            backend = getattr(backend, 'backend', None)
+        return backend
+
+    def _backend_for(self, method):
+        if self.backend is None:
+            raise RuntimeError("No workbook is open, use Open Excel or Create Excel Workbook first")
+        if not hasattr(self.backend, method):
+            raise RuntimeError("This keyword is not available for the current workbook with backend=%s, "
+                               "%s workbooks are read only and created workbooks are write only" % (self.backendName, self.backendName))
+        return self.backend
+
+    def _write_cell(self, sheetname, column, row, value):
+        self._backend_for('write_cell')
+        self.backend.write_cell(sheetname, int(row), int(column), value)
+        self._invalidate(sheetname)
+        self._update_indexes(sheetname, int(row), int(column), [[value]])
+
+    def _write_range(self, sheetname, first_row, first_column, rows):
+        self._backend_for('write_range')
+        self.backend.write_range(sheetname, first_row, first_column, rows)
+        self._invalidate(sheetname)
+        self._update_indexes(sheetname, first_row, first_column, rows)
+
+    def _update_indexes(self, sheetname, first_row, first_column, rows):
+        self.keyIndex.pop(sheetname, None)
+        index = self.valueIndex.get(sheetname)
+        if index is None:
+            return
+        for row_offset, row_values in enumerate(rows):
+            for col_offset, value in enumerate(row_values):
+                #  The index holds what a read returns, e.g. text without the apostrophe that marks a number as text.
+                index.update(first_row + row_offset, first_column + col_offset, stored_value(value))
+
+    def _sheet_index(self, sheetname):
+        index = self.valueIndex.get(sheetname)
+        if index is None:
+            index = self.valueIndex[sheetname] = SheetIndex(self.backend.iter_rows(sheetname, 1000))
+        return index
+
+    def _find(self, sheetname, search):
+        if sheetname:
+            return [cell_address(row, column) for row, column in search(self._sheet_index(sheetname))]
+        found = []
+        for name in self.sheetNames:
+            found.extend('%s!%s' % (name, cell_address(row, column)) for row, column in search(self._sheet_index(name)))
+        return found
+
+    def _other_backend(self, alias):
+        if alias is None or alias == self.alias:
+            return self.backend
+        return self.workbooks.get(alias)['backend']
+
+    def _compare(self, left, right, other, first_row, first_column, tolerance, ignorecolumns, maxdifferences):
+        #  Numbers are compared with dates in the date system of their own workbook.
+        count, differences = compare_blocks(left, right, first_row, first_column, tolerance,
+                                            ignored_columns(ignorecolumns), int(maxdifferences),
+                                            (self.backend.epoch(), other.epoch()))
+        if count > len(differences):
+            print '*INFO* %d cells differ, the first %d are reported' % (count, len(differences))
+        else:
+            print '*INFO* %d cells differ' % count
+        return differences
+
+    def _save(self, path):
+        self._commit_batch()
+        backend = self._backend_for('save')
+        #  One save per workbook at a time, so the files are written in the order of the keywords.
+        self._wait_for_saves(self.alias)
+        if self.backgroundSave and hasattr(backend, 'save_task'):
+            self.saves[self.alias] = BackgroundSave(backend.save_task(path), path)
+            print '*DEBUG* Saving %s in the background' % path
+        else:
+            backend.save(path)
+
+    def _wait_for_saves(self, alias=None):
+        aliases = [alias] if alias is not None else list(self.saves)
+        errors = []
+        for alias in aliases:
+            save = self.saves.pop(alias, None)
+            if save is None:
+                continue
+            try:
+                save.wait()
+                print '*DEBUG* Saved %s in %.2f seconds' % (save.filename, save.seconds)
+            except RuntimeError, error:
+                errors.append(error)
+        if errors:
+            raise errors[0]
+
+    def _commit_batch(self):
+        if isinstance(self.backend, BatchEdit):
+            pending = self.backend.pending_cells
+            #  Excel recalculates once after the last block instead of after every block.
+            with self.performance.active(self.xa if self.backendName == 'excel' else None):
+                self.backend = self.backend.commit()
+            print '*DEBUG* Committed %d buffered cells' % pending
+
+    def open_excel(self, filename, useTempDir=False, alias=None):
         """
         Opens the Excel file from the path provided in the file name parameter.
         If the boolean useTempDir is set to true, depending on the operating system of the computer running the test the file will be opened in the Temp directory if the operating system is Windows or tmp directory if it is not.
@@ -65,6 +397,7 @@ class Excel10Library:
         Arguments:
                 |  File Name (string)                      | The file name string value that will be used to open the excel file to perform tests upon.                                  |
                 |  Use Temporary Directory (default=False) | The file will not open in a temporary directory by default. To activate and open the file in a temporary directory, pass 'True' in the variable. |
+                |  Alias (default=file name)               | The name used by Switch Workbook and Close Excel Workbook to refer to this workbook. |
         Example:
 
         | *Keywords*           |  *Parameters*                                      |
@@ -74,21 +407,37 @@ class Excel10Library:
 
         if useTempDir is True:
             print 'Opening file at %s' % filename
-            self.wb = xw.books.open(os.path.join("/", self.tmpDir, filename))
+            self._open(os.path.join("/", self.tmpDir, filename), alias or filename)
         else:
-            self.wb = xw.books.open(filename)
-        self.fileName = filename
-        sheetnames = []
-        for sh in self.wb.sheets:
-            sheetnames.append(sh.name)
-        self.sheetNames = sheetnames
+            self._open(filename, alias or filename)
+
+    def switch_workbook(self, alias):
+        """
+        Makes the workbook opened or created under the given alias the current workbook and returns the alias of the previous one.
+
+        Arguments:
+                |  Alias (string)  | The alias given to Open Excel, Open Excel Current Directory or Create Excel Workbook. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |                 |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\Input.xlsx           |  alias=input    |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\Output.xlsx          |  alias=output   |
+        | Switch Workbook      |  input                                             |                 |
 
-    def open_excel_current_directory(self, filename):
+        """
+        previous = self.alias
+        state = self.workbooks.get(alias)
+        self._store()
+        self._restore(alias, state)
+        return previous
+
+    def open_excel_current_directory(self, filename, alias=None):
         """
         Opens the Excel file from the current directory using the directory the test has been run from.
 
         Arguments:
                 |  File Name (string)  | The file name string value that will be used to open the excel file to perform tests upon.  |
+                |  Alias (default=file name) | The name used by Switch Workbook and Close Excel Workbook to refer to this workbook. |
         Example:
 
         | *Keywords*           |  *Parameters*        |
@@ -97,11 +446,10 @@ class Excel10Library:
         """
         workdir = os.getcwd()
         print 'Opening file at %s' % filename
-        self.wb = xw.books.open(os.path.join(workdir, filename), read_only=False, keep_vba=False)
-        sheetnames = []
-        for sh in self.wb.sheets:
-            sheetnames.append(sh.name)
-        self.sheetNames = sheetnames
+        if self.backendName == 'xlsx':
+            self._open(os.path.join(workdir, filename), alias or filename)
+        else:
+            self._open(os.path.join(workdir, filename), alias or filename, read_only=False, keep_vba=False)
 
     def get_sheet_names(self):
         """
@@ -138,7 +486,7 @@ class Excel10Library:
 
         Arguments:
                 |  Sheet Name (string)  | The selected sheet that the column count will be returned from. |
-                |  scanmaxrows (default=150)    | The number of rows to scan for the right most column.   |
+                |  scanmaxrows (default=150)    | Not used anymore, the count comes from the used range of the sheet. Kept for compatibility. |
         Example:
 
         | *Keywords*          |  *Parameters*                                      |
@@ -146,15 +494,7 @@ class Excel10Library:
         | Get Column Count    |  TestSheet1                                        |
 
         """
-        #  XLwings provides no property to use so a scan is needed.
-        sheet = self.wb.sheets[sheetname]
-        most_right = 0
-        for r in range(1,int(scanmaxrows)):
-            last_col =  sheet.range((16384,r)).end('left')
-            if last_col.column > most_right:
-                most_right = last_col.column
-        return most_right
-
+        return self.backend.dimensions(sheetname)[1]
 
     def get_row_count(self, sheetname, scanmaxcolumns = 100):
         """
@@ -162,7 +502,7 @@ class Excel10Library:
 
         Arguments:
                 |  Sheet Name (string)  | The selected sheet that the row count will be returned from. |
-                |  scanmaxcolumns (default=100)    | The number of columns to scan for the lowest row.   |
+                |  scanmaxcolumns (default=100)    | Not used anymore, the count comes from the used range of the sheet. Kept for compatibility. |
         Example:
 
         | *Keywords*          |  *Parameters*                                      |
@@ -170,20 +510,9 @@ class Excel10Library:
         | Get Row Count       |  TestSheet1                                        |
 
         """
+        return self.backend.dimensions(sheetname)[0]
 
-        # XLwings provides no property to use so a scan is needed.
-
-        sheet = self.wb.sheets[sheetname]
-        lowest = 0
-        for col in range(1, int(scanmaxcolumns)):
-            last_row =  sheet.range((1048575,col)).end('up')
-            if last_row.row > lowest:
-                lowest = last_row.row
-
-        return lowest
-
-
-    def get_column_values(self, sheetname, column, includeEmptyCells=True):
+    def get_column_values(self, sheetname, column, includeEmptyCells=True, format='pairs'):
         """
         Returns the specific column values of the sheet name specified.
 
@@ -191,6 +520,7 @@ class Excel10Library:
                 |  Sheet Name (string)                 | The selected sheet that the column values will be returned from.                                                            |
                 |  Column (int)                        | The column integer value that will be used to select the column from which the values will be returned.                     |
                 |  Include Empty Cells (default=True)  | The empty cells will be included by default. To deactivate and only return cells with values, pass 'False' in the variable. |
+                |  Format (default=pairs)              | pairs: a list of (address, value) tuples. rows: a list of rows, each a list of values. columns: a dictionary of column letter to the list of values in that column. Without empty cells, rows and columns only leave out rows or columns that are completely empty. |
         Example:
 
         | *Keywords*           |  *Parameters*                                          |
@@ -198,22 +528,12 @@ class Excel10Library:
         | Get Column Values    |  TestSheet1                                        | 0 |
 
         """
-        sheet = self.wb.sheets[sheetname]
-        data = {}
-        last_row = sheet.range((1048575, int(column))).end('up')
-
-        for cell in sheet.range((1,int(column)), last_row):
-            addr = cell.get_address(False,False)
-            data[addr] = cell.value
-        if includeEmptyCells is True:
-            sorted_data = natsort.natsorted(data.items(), key=itemgetter(0))
-            return sorted_data
-        else:
-            data = dict([(k, v) for (k, v) in data.items() if v])
-            ordered_data = natsort.natsorted(data.items(), key=itemgetter(0))
-            return ordered_data
+        column = int(column)
+        last_row = self.backend.last_row_in_column(sheetname, column)
+        values = self.backend.read_range(sheetname, 1, column, last_row, column)
+        return self._format_values(values, 1, column, includeEmptyCells, format)
 
-    def get_row_values(self, sheetname, row, includeEmptyCells=True):
+    def get_row_values(self, sheetname, row, includeEmptyCells=True, format='pairs'):
         """
         Returns the specific row values of the sheet name specified.
 
@@ -221,6 +541,7 @@ class Excel10Library:
                 |  Sheet Name (string)                 | The selected sheet that the row values will be returned from.                                                               |
                 |  Row (int)                           | The row integer value that will be used to select the row from which the values will be returned.                           |
                 |  Include Empty Cells (default=True)  | The empty cells will be included by default. To deactivate and only return cells with values, pass 'False' in the variable. |
+                |  Format (default=pairs)              | pairs: a list of (address, value) tuples. rows: a list of rows, each a list of values. columns: a dictionary of column letter to the list of values in that column. Without empty cells, rows and columns only leave out rows or columns that are completely empty. |
         Example:
 
         | *Keywords*           |  *Parameters*                                          |
@@ -228,27 +549,19 @@ class Excel10Library:
         | Get Row Values       |  TestSheet1                                        | 0 |
 
         """
-        sheet = self.wb.sheets[sheetname]
-        data = {}
-        last_column =  sheet.range("XFD"+str(row)).end('left')
-        for cell in sheet.range((int(row), 1), last_column):
-            addr = cell.get_address(False, False)
-            data[addr] = cell.value
-        if includeEmptyCells is True:
-            sorted_data = natsort.natsorted(data.items(), key=itemgetter(0))
-            return sorted_data
-        else:
-            data = dict([(k, v) for (k, v) in data.items() if v])
-            ordered_data = natsort.natsorted(data.items(), key=itemgetter(0))
-            return ordered_data
+        row = int(row)
+        last_column = self.backend.last_column_in_row(sheetname, row)
+        values = self.backend.read_range(sheetname, row, 1, row, last_column)
+        return self._format_values(values, row, 1, includeEmptyCells, format)
 
-    def get_sheet_values(self, sheetname, includeEmptyCells=True):
+    def get_sheet_values(self, sheetname, includeEmptyCells=True, format='pairs'):
         """
         Returns the values from the sheet name specified.
 
         Arguments:
                 |  Sheet Name (string)                 | The selected sheet that the cell values will be returned from.                                                              |
                 |  Include Empty Cells (default=True)  | The empty cells will be included by default. To deactivate and only return cells with values, pass 'False' in the variable. |
+                |  Format (default=pairs)              | pairs: a list of (address, value) tuples. rows: a list of rows, each a list of values. columns: a dictionary of column letter to the list of values in that column. Without empty cells, rows and columns only leave out rows or columns that are completely empty. |
         Example:
 
         | *Keywords*           |  *Parameters*                                      |
@@ -256,26 +569,19 @@ class Excel10Library:
         | Get Sheet Values     |  TestSheet1                                        |
 
         """
-        sheet = self.wb.sheets[sheetname]
-        data = {}
-        last_row = self.get_column_count(sheetname)
-        last_col = self.get_row_count(sheetname)
-        for cell in sheet.range((1, 1), (last_row, last_col)):
-            data[cell.get_address(False, False)] = cell.value
-        if includeEmptyCells is True:
-            sorted_data = natsort.natsorted(data.items(), key=itemgetter(0))
-            return sorted_data
-        else:
-            data = dict([(k, v) for (k, v) in data.items() if v])
-            ordered_data = natsort.natsorted(data.items(), key=itemgetter(0))
-            return ordered_data
+        last_row, last_col = self.backend.dimensions(sheetname)
+        values = self.backend.read_range(sheetname, 1, 1, last_row, last_col)
+        return self._format_values(values, 1, 1, includeEmptyCells, format)
 
-    def get_workbook_values(self, includeEmptyCells=True):
+    def get_workbook_values(self, includeEmptyCells=True, format='pairs', workers=1):
         """
-        Returns the values from each sheet of the current workbook.
+        Returns the values from each sheet of the current workbook as a dictionary of sheet name to the values of that sheet, in the same format as Get Sheet Values.
+        With the xlsx backend and more than one worker, the sheets are read from the file by a pool of worker processes, unless the workbook has unsaved changes.
 
         Arguments:
                 |  Include Empty Cells (default=True)  | The empty cells will be included by default. To deactivate and only return cells with values, pass 'False' in the variable. |
+                |  Format (default=pairs)              | pairs, rows or columns, see Get Sheet Values. |
+                |  Workers (default=1)                 | The number of worker processes used with the xlsx backend. |
         Example:
 
         | *Keywords*           |  *Parameters*                                      |
@@ -283,9 +589,109 @@ class Excel10Library:
         | Get Workbook Values  |                                                    |
 
         """
+        data = OrderedDict()
+        xlsx = self._layer(XlsxBackend)
+        #  The workers read the file, changes that are not saved yet are only in this process.
+        if (int(workers) > 1 and xlsx is not None and not xlsx.has_changes() and self._layer(BatchEdit) is None
+                and self.fileName):
+            filename = self.fileName
+            for sheetname, values in extract_sheets([filename], workers=workers)[filename].items():
+                data[sheetname] = self._format_values(values, 1, 1, includeEmptyCells, format)
+        else:
+            for sheetname in self.sheetNames:
+                data[sheetname] = self.get_sheet_values(sheetname, includeEmptyCells, format)
+        return data
+
+    def get_values_from_workbooks(self, filenames, sheetnames=None, includeEmptyCells=True, format='pairs', workers=None):
+        """
+        Reads the sheets of one or more xlsx files in parallel and returns a dictionary of file name to a dictionary of sheet name to the values of that sheet, in the same format as Get Sheet Values.
+        The files are read directly by a pool of worker processes, so they do not have to be opened first and Excel is not needed.
+        The order of the files and sheets in the result is always the order given, or the workbook order.
+
+        Arguments:
+                |  File Names (list)                   | The xlsx files to read. A single file name is accepted as well. |
+                |  Sheet Names (default=all sheets)    | The sheets to read from each file. |
+                |  Include Empty Cells (default=True)  | The empty cells will be included by default. To deactivate and only return cells with values, pass 'False' in the variable. |
+                |  Format (default=pairs)              | pairs, rows or columns, see Get Sheet Values. |
+                |  Workers (default=number of CPUs)    | The number of worker processes. |
+        Example:
+
+        | *Keywords*                 |  *Parameters*    |                |
+        | @{files}=                  |  Create List     |  Input.xlsx    |  Output.xlsx  |
+        | ${values}=                 |  Get Values From Workbooks  |  ${files}  |  workers=4  |
+
+        """
+        if isinstance(filenames, basestring):
+            filenames = [filenames]
+        if isinstance(sheetnames, basestring):
+            sheetnames = [sheetnames]
+        extracted = extract_sheets(list(filenames), sheetnames, workers)
+        for sheets in extracted.values():
+            for sheetname, values in sheets.items():
+                sheets[sheetname] = self._format_values(values, 1, 1, includeEmptyCells, format)
+        return extracted
+
+    def open_row_cursor(self, sheetname, chunksize=1000):
+        """
+        Opens a cursor to go through the rows of a sheet a chunk at a time and returns its id for Fetch Next Rows.
+        Only one chunk of rows is held in memory, so this works for sheets that are too large for Get Sheet Values.
+        With the xlsx backend the rows are streamed from the file.
+
+        Arguments:
+                |  Sheet Name (string)       | The selected sheet that the rows will be returned from.  |
+                |  Chunk Size (default=1000) | The maximum number of rows returned by one Fetch Next Rows. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |      |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |      |
+        | ${cursor}=           |  Open Row Cursor                                   |  TestSheet1  |  500  |
+        | ${rows}=             |  Fetch Next Rows                                   |  ${cursor}   |
+        | Close Row Cursor     |  ${cursor}                                         |      |
+
+        """
+        cursor = max(self.cursors or [0]) + 1
+        self.cursors[cursor] = (self.alias, self.backend.iter_rows(sheetname, int(chunksize)))
+        return cursor
+
+    def fetch_next_rows(self, cursor):
+        """
+        Returns the next chunk of rows of a cursor opened by Open Row Cursor as a list of rows, each row a list of values starting at column A.
+        Rows without values inside the used area are returned as rows of empty cells. An empty list is returned when all rows have been fetched.
+
+        Arguments:
+                |  Cursor (int)  | The id returned by Open Row Cursor. |
+        Example:
+
+        | *Keywords*           |  *Parameters*      |
+        | ${rows}=             |  Fetch Next Rows   |  ${cursor}  |
+
+        """
+        rows = self._cursor(cursor)[1]
+        try:
+            return next(rows)
+        except StopIteration:
+            return []
+
+    def close_row_cursor(self, cursor):
+        """
+        Closes a cursor opened by Open Row Cursor.
+
+        Arguments:
+                |  Cursor (int)  | The id returned by Open Row Cursor. |
+        Example:
+
+        | *Keywords*           |  *Parameters*      |
+        | Close Row Cursor     |  ${cursor}         |
+
+        """
+        self._cursor(cursor)[1].close()
+        del self.cursors[int(cursor)]
 
-        #Only included for compatibility reasons.  Always failed to see the use of this function
-        self.get_sheet_values(self.wb.sheets.active, includeEmptyCells=includeEmptyCells)
+    def _cursor(self, cursor):
+        try:
+            return self.cursors[int(cursor)]
+        except KeyError:
+            raise ValueError("No open row cursor with id %s" % cursor)
 
     def read_cell_data_by_name(self, sheetname, cell_name):
         """
@@ -301,9 +707,7 @@ class Excel10Library:
         | Get Cell Data        |  TestSheet1                                        |  A2  |
 
         """
-        sheet = self.wb.sheets[sheetname]
-        cell = sheet.range(cell_name)
-        return cell.value
+        return self.backend.read_cell(sheetname, cell_name)
 
 
     def read_cell_data_by_coordinates(self, sheetname, column, row):
@@ -341,8 +745,7 @@ class Excel10Library:
         | Check Cell Type      |  TestSheet1                                        | 0 | 0 |
 
         """
-        sheet = self.wb.sheets[sheetname]
-        cell = sheet.range((int(row),int(column))).value
+        cell = self.backend.read_cell(sheetname, (int(row), int(column)))
 
         if type(cell) is float:
             celltype="number"
@@ -354,15 +757,315 @@ class Excel10Library:
             celltype = "boolean"
 #        elif cell.data_type is XL_CELL_ERROR:
 #            print "The cell value has an error"
-        elif cell.value == "":
+        elif cell == "":
             celltype = "blank"
-        elif cell.value is None:
+        elif cell is None:
             celltype = "empty"
         else:
             celltype = "Unknown"
         print "The cell value is a " + celltype
         return  celltype
 
+    def enable_cell_cache(self, maxblocks=256):
+        """
+        Keeps the values of the cells read by Read Cell Data By Name, Read Cell Data By Coordinates and Check Cell Type of the current workbook in memory.
+        The first read of a cell loads a block of 64 rows by 16 columns around it, later reads in that block do not go to Excel anymore.
+        Every keyword that changes the workbook empties the cache, opening or closing a workbook drops it.
+
+        Arguments:
+                |  maxblocks (default=256)  | The number of blocks kept in memory. When more are needed the least recently used block is dropped. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |
+        | Enable Cell Cache    |  512                                               |
+
+        """
+        if self._layer(CellCache) is not None:
+            return
+        batch = self._layer(BatchEdit)
+        if batch is not None:
+            #  The cache sits under a running batch edit, so buffered values still win.
+            batch.backend = CellCache(batch.backend, maxblocks)
+        else:
+            self.backend = CellCache(self.backend, maxblocks)
+
+    def disable_cell_cache(self):
+        """
+        Stops caching cell values for the current workbook and empties the cache.
+
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |
+        | Disable Cell Cache   |                                                    |
+
+        """
+        cache = self._layer(CellCache)
+        if cache is None:
+            return
+        batch = self._layer(BatchEdit)
+        if batch is not None:
+            batch.backend = cache.backend
+        else:
+            self.backend = cache.backend
+
+    def get_cell_cache_statistics(self):
+        """
+        Returns a dictionary with the hits, misses, evictions, blocks and max_blocks of the cell cache of the current workbook.
+
+        Example:
+
+        | *Keywords*                   |  *Parameters*      |
+        | Enable Cell Cache            |                    |
+        | ${stats}=                    |  Get Cell Cache Statistics  |
+
+        """
+        cache = self._layer(CellCache)
+        if cache is None:
+            raise RuntimeError("The cell cache is not enabled, use Enable Cell Cache first")
+        return cache.statistics()
+
+    def get_excel_performance_stats(self, reset=False):
+        """
+        Returns a dictionary with the number of calls made to Excel or the file per backend method (backend_calls), the cells read and written,
+        and per keyword of this library the number of calls, total, mean, min and max time in seconds, backend calls, cells moved and a histogram of the durations.
+        Keywords are only timed when the library runs in Robot Framework.
+
+        Arguments:
+                |  Reset (default=False)  | Start counting from zero again after returning the numbers. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                   |
+        | ${stats}=            |  Get Excel Performance Stats    |
+        | Log                  |  ${stats['keywords']}           |
+
+        """
+        data = self.stats.as_dict()
+        if str(reset).lower() in ('true', 'yes', '1'):
+            self.stats.reset()
+        return data
+
+    def enable_excel_profiling(self, keywords, directory=None):
+        """
+        Runs the given keywords of this library under cProfile from now on. The 20 functions with the highest cumulative time are logged with each call.
+
+        Arguments:
+                |  Keywords (string)         | Comma separated keyword names, for example Get Sheet Values, Compare Sheets. |
+                |  Directory (default=None)  | When given, the profile of every call is also written to a .prof file in this directory. |
+        Example:
+
+        | *Keywords*               |  *Parameters*                        |
+        | Enable Excel Profiling   |  Get Sheet Values, Compare Sheets    |
+
+        """
+        self.stats.profile = set(normalize_name(keyword) for keyword in keywords.split(',') if keyword.strip())
+        self.stats.profile_dir = directory
+
+    def disable_excel_profiling(self):
+        """
+        Stops profiling keywords.
+
+        Example:
+
+        | *Keywords*               |  *Parameters*   |
+        | Disable Excel Profiling  |                 |
+
+        """
+        self.stats.profile = set()
+        self.stats.profile_dir = None
+
+    def find_cells_with_value(self, value, sheetname=None):
+        """
+        Returns the addresses of the cells that hold the given value, in one sheet or in every sheet of the current workbook.
+        Values are compared as text and whole numbers without fraction, so 5 finds cells holding 5 or 5.0.
+        The first search in a sheet builds an index of all its values, later searches are answered from that index.
+        Changes made by the Put ... To Cell and Modify keywords are applied to the index, values calculated by formulas are the values from when the index was built.
+
+        Arguments:
+                |  Value                                 | The value to look for. |
+                |  Sheet Name (default=all sheets)       | The sheet to search. Without a sheet name all sheets are searched and the addresses are returned as Sheet!A1. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |              |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |              |
+        | ${cells}=            |  Find Cells With Value                             |  Total  |  TestSheet1  |
+
+        """
+        return self._find(sheetname, lambda index: index.find(value))
+
+    def find_cells_matching_regex(self, pattern, sheetname=None):
+        """
+        Returns the addresses of the cells whose value, as text, matches the regular expression, in one sheet or in every sheet of the current workbook.
+        The pattern may match anywhere in the value, use ^ and $ to match the whole value. Uses the same index as Find Cells With Value.
+
+        Arguments:
+                |  Pattern (regular expression)          | The regular expression to match. |
+                |  Sheet Name (default=all sheets)       | The sheet to search. Without a sheet name all sheets are searched and the addresses are returned as Sheet!A1. |
+        Example:
+
+        | *Keywords*                 |  *Parameters*                 |              |
+        | ${cells}=                  |  Find Cells Matching Regex    |  ^Total.*$   |
+
+        """
+        return self._find(sheetname, lambda index: index.match(pattern))
+
+    def get_row_by_key(self, sheetname, keycolumn, key, headerrow=1):
+        """
+        Treats the sheet as a table with a header row and returns the row whose key column holds the given key, as a dictionary of header to value.
+        The header row and the key column are read once, the key column is kept in a hash index so later lookups in the same sheet take no reading but the found row.
+        The index is kept until a keyword changes the sheet. When a key occurs more than once the first row is returned. Columns without header are left out.
+
+        Arguments:
+                |  Sheet Name (string)       | The selected sheet that the row will be returned from. |
+                |  Key Column (string)       | The header of the key column, or its column number. |
+                |  Key                       | The value to look for in the key column. Compared as text, so 5 finds 5.0. |
+                |  Header Row (default=1)    | The row number of the header row. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |      |       |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |      |       |
+        | ${row}=              |  Get Row By Key                                    |  TestSheet1  |  ID  |  1042  |
+        | Should Be Equal      |  ${row['Name']}                                    |  Smith       |
+
+        """
+        index = self._key_index(sheetname, headerrow)
+        column = index.column(keycolumn)
+        if not index.has_column(column):
+            index.add_column(column, self._column_below(sheetname, column, index.header_row))
+        row = index.row(column, key)
+        if row is None:
+            raise ValueError("No row with %s = %s in sheet %s" % (keycolumn, key, sheetname))
+        values = self.backend.read_range(sheetname, row, 1, row, len(index.headers))[0]
+        return OrderedDict((header, value) for header, value in zip(index.headers, values) if header is not None)
+
+    def _key_index(self, sheetname, headerrow):
+        headerrow = int(headerrow)
+        index = self.keyIndex.get(sheetname)
+        if index is None or index.header_row != headerrow:
+            headers = []
+            if headerrow > 0:
+                last_column = self.backend.dimensions(sheetname)[1]
+                headers = self.backend.read_range(sheetname, headerrow, 1, headerrow, last_column)[0]
+            index = self.keyIndex[sheetname] = KeyIndex(headerrow, headers)
+        return index
+
+    def _column_below(self, sheetname, column, headerrow):
+        #  The values of a column under its header, down to the last row of the used area, with one read.
+        last_row = self.backend.dimensions(sheetname)[0]
+        if last_row <= headerrow:
+            return []
+        return [row_values[0] for row_values in self.backend.read_range(sheetname, headerrow + 1, column, last_row, column)]
+
+    def get_column_statistics(self, sheetname, column, headerrow=1, nonnumeric='skip'):
+        """
+        Returns a dictionary with the count, sum, mean, min, max and distinct of the values in a column under its header, plus the number of blanks and skipped cells.
+        The column is read with one range read and the statistics are computed in a single pass, which is much faster than looping over Get Column Values.
+        Numbers and text holding a number are counted. Blank cells are never counted, distinct is the number of different non blank values, numbers or not.
+
+        Arguments:
+                |  Sheet Name (string)            | The selected sheet. |
+                |  Column (string)                | The header of the column, or its column number. |
+                |  Header Row (default=1)         | The row number of the header row, the values start below it. 0 for a sheet without header. |
+                |  Non Numeric (default=skip)     | What to do with cells that are not blank and not a number: skip leaves them out, zero counts them as 0, fail fails the keyword. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |              |          |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |              |          |
+        | ${stats}=            |  Get Column Statistics                             |  TestSheet1  |  Amount  |
+        | Should Be Equal      |  ${stats['sum']}                                   |  ${1250.0}   |          |
+
+        """
+        index = self._key_index(sheetname, headerrow)
+        column = index.column(column)
+        return column_statistics(self._column_below(sheetname, column, index.header_row), index.header_row + 1, column, nonnumeric)
+
+    def group_by_and_aggregate(self, sheetname, keycolumn, valuecolumn, function='sum', headerrow=1, nonnumeric='skip'):
+        """
+        Groups the rows under the header by the value of the key column and returns a dictionary of key to the function applied to the values
+        in the value column of its rows, in the order the keys first occur. Keys are text, so 5 and 5.0 are the same key.
+        Both columns are read with one range read each. Rows with a blank key are left out, blank values are not counted.
+
+        Arguments:
+                |  Sheet Name (string)            | The selected sheet. |
+                |  Key Column (string)            | The header of the column to group by, or its column number. |
+                |  Value Column (string)          | The header of the column to aggregate, or its column number. |
+                |  Function (default=sum)         | One of count, sum, mean, min, max or distinct. |
+                |  Header Row (default=1)         | The row number of the header row, the values start below it. 0 for a sheet without header. |
+                |  Non Numeric (default=skip)     | What to do with values that are not blank and not a number: skip leaves them out, zero counts them as 0, fail fails the keyword. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |              |          |          |      |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |              |          |          |      |
+        | ${totals}=           |  Group By And Aggregate                            |  TestSheet1  |  Region  |  Amount  |  sum  |
+        | Should Be Equal      |  ${totals['North']}                                |  ${400.0}    |          |          |      |
+
+        """
+        index = self._key_index(sheetname, headerrow)
+        keycolumn = index.column(keycolumn)
+        valuecolumn = index.column(valuecolumn)
+        keys = self._column_below(sheetname, keycolumn, index.header_row)
+        values = self._column_below(sheetname, valuecolumn, index.header_row)
+        return group_aggregate(keys, values, index.header_row + 1, valuecolumn, function, nonnumeric)
+
+    def compare_sheets(self, sheetname, othersheet=None, otherworkbook=None, tolerance=0, ignorecolumns=None, maxdifferences=100):
+        """
+        Compares the used area of a sheet with a sheet of the same or another open workbook and returns the cells that differ, as a list of (address, value, other value) tuples in row order.
+        Both sheets are read with one range read each. Empty cells and empty strings are equal, dates equal midnight datetimes and a date equals its Excel serial number, in the 1900 or 1904 date system of the workbook holding the number.
+        The number of differing cells is logged, only the first Max Differences of them are returned.
+
+        Arguments:
+                |  Sheet Name (string)               | The sheet of the current workbook to compare. |
+                |  Other Sheet (default=Sheet Name)  | The sheet to compare it with. |
+                |  Other Workbook (default=current)  | The alias of the open workbook holding the other sheet. |
+                |  Tolerance (default=0)             | The largest difference between two numbers that still counts as equal. |
+                |  Ignore Columns (default=None)     | Comma separated column letters or numbers that are not compared. |
+                |  Max Differences (default=100)     | The largest number of differences returned. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |       |                         |                          |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\Golden.xlsx          |  alias=golden  |                |                          |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\Output.xlsx          |       |                         |                          |
+        | ${differences}=      |  Compare Sheets                                    |  TestSheet1  |  otherworkbook=golden  |  ignorecolumns=A,D  |
+        | Should Be Empty      |  ${differences}                                    |       |                         |                          |
+
+        """
+        other = self._other_backend(otherworkbook)
+        othersheet = othersheet or sheetname
+        last_row, last_col = self.backend.dimensions(sheetname)
+        left = self.backend.read_range(sheetname, 1, 1, last_row, last_col)
+        last_row, last_col = other.dimensions(othersheet)
+        right = other.read_range(othersheet, 1, 1, last_row, last_col)
+        return self._compare(left, right, other, 1, 1, tolerance, ignorecolumns, maxdifferences)
+
+    def compare_ranges(self, sheetname, cellrange, othersheet=None, otherrange=None, otherworkbook=None, tolerance=0, ignorecolumns=None, maxdifferences=100):
+        """
+        Compares a range of a sheet with a range of the same size in the same or another sheet or open workbook, the same way as Compare Sheets.
+        The addresses returned and the ignored columns refer to the first range.
+
+        Arguments:
+                |  Sheet Name (string)               | The sheet of the current workbook holding the range. |
+                |  Cell Range (string)               | The range to compare, for example A1:D20. |
+                |  Other Sheet (default=Sheet Name)  | The sheet holding the other range. |
+                |  Other Range (default=Cell Range)  | The range to compare with, the first cell is enough. |
+                |  Other Workbook (default=current)  | The alias of the open workbook holding the other sheet. |
+                |  Tolerance (default=0)             | The largest difference between two numbers that still counts as equal. |
+                |  Ignore Columns (default=None)     | Comma separated column letters or numbers that are not compared. |
+                |  Max Differences (default=100)     | The largest number of differences returned. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |              |         |              |          |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |              |         |              |          |
+        | ${differences}=      |  Compare Ranges                                    |  TestSheet1  |  A1:D20 |  TestSheet2  |  F1      |
+
+        """
+        other = self._other_backend(otherworkbook)
+        first_row, first_col, last_row, last_col = split_range(cellrange)
+        other_row, other_col = split_range(otherrange or cellrange)[:2]
+        left = self.backend.read_range(sheetname, first_row, first_col, last_row, last_col)
+        right = other.read_range(othersheet or sheetname, other_row, other_col,
+                                 other_row + last_row - first_row, other_col + last_col - first_col)
+        return self._compare(left, right, other, first_row, first_col, tolerance, ignorecolumns, maxdifferences)
+
     def put_value_to_cell(self, sheetname, column, row, value):
         """
         Using the sheet name the value of the indicated cell is set to be the number given in the parameter.
@@ -378,15 +1081,7 @@ class Excel10Library:
         | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls   |     |     |      |
         | Put Value To Cell    |  TestSheet1                                         |  0  |  0  |  34  |
         """
-        sheet = self.wb.sheets[sheetname]
-        #import pdb, sys
-        #pdb.Pdb(stdout=sys.__stdout__).set_trace()
-        if value.isdigit():
-            sheet.range((int(row), int(column))).value = int(value)
-        elif value.replace('.','',1).isdigit():
-            sheet.range((int(row), int(column))).value = float(value)
-        else:
-            sheet.range((int(row), int(column))).value = value
+        self._write_cell(sheetname, column, row, coerce_value(value))
 
     def put_number_to_cell(self, sheetname, column, row, value):
         """
@@ -422,12 +1117,11 @@ class Excel10Library:
         | Put String To Cell   |  TestSheet1                                        |  0  |  0  |  Hello |
 
         """
-        sheet = self.wb.sheets[sheetname]
         value = str(value)
         if value.replace('.','',1).isdigit():
-            sheet.range((int(row), int(column))).value = '\''+str(value)
+            self._write_cell(sheetname, column, row, '\''+str(value))
         else:
-            sheet.range((int(row), int(column))).value = value
+            self._write_cell(sheetname, column, row, value)
 
     def put_date_to_cell(self, sheetname, column, row, value, informat='%d-%m-%Y'):
         """
@@ -445,15 +1139,134 @@ class Excel10Library:
         | Put Date To Cell     |  TestSheet1                                        |  0  |  0  |  12.3.1999 |
 
         """
-        sheet = self.wb.sheets[sheetname]
-        #import pdb, sys
-        #pdb.Pdb(stdout=sys.__stdout__).set_trace()
-        if format != '%d-%m-%Y':
-            dateparts = re.split('(\d+)',value)
-            if dateparts[2] != "-":
-                value = value.replace(dateparts[2], "-")
-        dt=datetime.strptime(value,informat)
-        sheet.range((int(row), int(column))).options(dates=dt.date).value = dt
+        self._write_cell(sheetname, column, row, date_parser(informat).parse(value))
+
+    def _put_values(self, sheetname, first_row, first_column, rows, type, informat):
+        if not rows:
+            return
+        width = max(len(row_values) for row_values in rows)
+        rows = [list(row_values) + [None] * (width - len(row_values)) for row_values in rows]
+        self._backend_for('write_range')
+        #  Datetimes, not serial numbers: the workbook may count from 1904.
+        rows = coerce_values(rows, type, informat)
+        self._write_range(sheetname, first_row, first_column, rows)
+        if type == 'date' and hasattr(self.backend, 'set_number_format'):
+            self.backend.set_number_format(sheetname, first_row, first_column, first_row + len(rows) - 1,
+                                           first_column + width - 1, number_format(informat))
+        print '*DEBUG* Wrote %d rows of %d values' % (len(rows), width)
+
+    def put_values_to_column(self, sheetname, column, row, values, type='value', informat='%d-%m-%Y'):
+        """
+        Writes a list of values down a column, starting at the indicated cell, with one write for the whole list.
+        All values are converted in one go according to the type; dates are written as dates with the number format matching the input format.
+
+        Arguments:
+                |  Sheet Name (string)            | The selected sheet that the values will be written to. |
+                |  Column (int)                   | The column the values are written to. |
+                |  Row (int)                      | The row of the first value. |
+                |  Values (list)                  | The values to write. Empty values empty their cell. |
+                |  Type (default=value)           | value: numbers become numbers like Put Value To Cell does. number: all values are numbers. string: all values stay text like Put String To Cell does. date: all values are dates in the input format. |
+                |  Input Format (default=%d-%m-%Y) | The format of the dates for type date. The separators - . and / can be used for one another. |
+        Example:
+
+        | *Keywords*              |  *Parameters*                                      |     |     |             |             |
+        | Open Excel              |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |     |     |             |             |
+        | @{dates}=               |  Create List                                       |  12-03-2019  |  13-03-2019  |
+        | Put Values To Column    |  TestSheet1                                        |  2  |  2  |  ${dates}   |  type=date  |
+
+        """
+        self._put_values(sheetname, int(row), int(column), [[value] for value in values], type, informat)
+
+    def put_values_to_row(self, sheetname, column, row, values, type='value', informat='%d-%m-%Y'):
+        """
+        Writes a list of values along a row, starting at the indicated cell, with one write for the whole list.
+        The values are converted like Put Values To Column does.
+
+        Arguments:
+                |  Sheet Name (string)            | The selected sheet that the values will be written to. |
+                |  Column (int)                   | The column of the first value. |
+                |  Row (int)                      | The row the values are written to. |
+                |  Values (list)                  | The values to write. Empty values empty their cell. |
+                |  Type (default=value)           | value, number, string or date, see Put Values To Column. |
+                |  Input Format (default=%d-%m-%Y) | The format of the dates for type date. |
+        Example:
+
+        | *Keywords*              |  *Parameters*                                      |     |     |             |
+        | Open Excel              |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |     |     |             |
+        | @{values}=              |  Create List                                       |  1  |  2  |  3          |
+        | Put Values To Row       |  TestSheet1                                        |  1  |  5  |  ${values}  |
+
+        """
+        self._put_values(sheetname, int(row), int(column), [list(values)], type, informat)
+
+    def put_values_to_range(self, sheetname, column, row, rows, type='value', informat='%d-%m-%Y'):
+        """
+        Writes a list of rows, each a list of values, starting at the indicated cell, with one write for the whole block.
+        Shorter rows are padded with empty cells. The values are converted like Put Values To Column does.
+
+        Arguments:
+                |  Sheet Name (string)            | The selected sheet that the values will be written to. |
+                |  Column (int)                   | The column of the first value of each row. |
+                |  Row (int)                      | The row of the first row. |
+                |  Rows (list)                    | The list of rows to write. |
+                |  Type (default=value)           | value, number, string or date, see Put Values To Column. |
+                |  Input Format (default=%d-%m-%Y) | The format of the dates for type date. |
+        Example:
+
+        | *Keywords*              |  *Parameters*                                      |     |     |           |
+        | Open Excel              |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |     |     |           |
+        | Put Values To Range     |  TestSheet1                                        |  1  |  2  |  ${rows}  |
+
+        """
+        self._put_values(sheetname, int(row), int(column), [list(row_values) for row_values in rows], type, informat)
+
+    def import_csv_to_sheet(self, sheetname, filename, column=1, row=1, delimiter=',', encoding='utf-8', chunksize=1000):
+        """
+        Writes the rows of a CSV file to a sheet, starting at the indicated cell. The values are converted like Put Value To Cell does.
+        The file is read in chunks of rows and every chunk is written with one range write, so large files take little memory.
+
+        Arguments:
+                |  Sheet Name (string)         | The selected sheet that the rows will be written to. |
+                |  File Name (string)          | The CSV file to read. |
+                |  Column (default=1)          | The column of the first value of each row. |
+                |  Row (default=1)             | The row the first line of the file is written to. |
+                |  Delimiter (default=,)       | The character between the fields. |
+                |  Encoding (default=utf-8)    | The encoding of the file. A byte order mark at the start of a UTF-8 file is skipped. Encodings that do not write ASCII characters as single bytes, like utf-16, are not supported. |
+                |  Chunk Size (default=1000)   | The number of rows read and written at a time. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |            |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |            |
+        | Import CSV To Sheet  |  TestSheet1                                        |  data.csv  |
+
+        """
+        first_row = int(row)
+        count = 0
+        for rows in read_csv_chunks(filename, int(chunksize), delimiter, encoding):
+            self._write_range(sheetname, first_row + count, int(column), rows)
+            count += len(rows)
+        print '*DEBUG* Imported %d rows from %s' % (count, filename)
+
+    def export_sheet_to_csv(self, sheetname, filename, delimiter=',', encoding='utf-8', chunksize=1000):
+        """
+        Writes the used area of a sheet to a CSV file, reading and writing a chunk of rows at a time.
+        Whole numbers are written without fraction, booleans as TRUE and FALSE and dates as 2019-03-12 or 2019-03-12 14:30:00.
+
+        Arguments:
+                |  Sheet Name (string)         | The selected sheet that the rows will be read from. |
+                |  File Name (string)          | The CSV file to write. |
+                |  Delimiter (default=,)       | The character between the fields. |
+                |  Encoding (default=utf-8)    | The encoding of the file, utf-8-sig writes UTF-8 with a byte order mark. Encodings that do not write ASCII characters as single bytes, like utf-16, are not supported. |
+                |  Chunk Size (default=1000)   | The number of rows read and written at a time. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |              |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |              |
+        | Export Sheet To CSV  |  TestSheet1                                        |  output.csv  |
+
+        """
+        count = write_csv(filename, self.backend.iter_rows(sheetname, int(chunksize)), delimiter, encoding)
+        print '*DEBUG* Exported %d rows to %s' % (count, filename)
 
 
     def modify_cell_with(self, sheetname, column, row, op, val):
@@ -473,13 +1286,12 @@ class Excel10Library:
         | Modify Cell With     |  TestSheet1                                        |  0  |  0  |  *  |  56  |
 
         """
-        sheet = self.wb.sheets[sheetname]
-        cell = sheet.range((int(row), int(column)))
-        if cell.value is None:
-                cell.value = 0
+        curval = self.backend.read_cell(sheetname, (int(row), int(column)))
+        if curval is None:
+                curval = 0
+                self._write_cell(sheetname, column, row, curval)
         if val.replace('.','',1).isdigit():
-            curval = cell.value
-            cell.value = eval(str(curval)+str(op)+str(val))
+            self._write_cell(sheetname, column, row, eval(str(curval)+str(op)+str(val)))
 
     def add_to_date(self, sheetname, column, row, numdays):
         """
@@ -497,14 +1309,12 @@ class Excel10Library:
         | Add To Date          |  TestSheet1                                        |  0  |  0  |  4  |
 
         """
-        sheet = self.wb.sheets[sheetname]
-        cell = sheet.range((int(row), int(column)))
         #import pdb, sys
         #pdb.Pdb(stdout=sys.__stdout__).set_trace()
-        if type(cell.value) is datetime:
-            dt=cell.value
+        dt = self.backend.read_cell(sheetname, (int(row), int(column)))
+        if type(dt) is datetime:
             dated = timedelta(days=int(numdays))
-            cell.value = dt + dated
+            self._write_cell(sheetname, column, row, dt + dated)
 
     def subtract_from_date(self, sheetname, column, row, numdays):
         """
@@ -525,6 +1335,150 @@ class Excel10Library:
 
         self.add_to_date(sheetname, column, row, -int(numdays))
 
+    def modify_range_with(self, sheetname, cellrange, op, val):
+        """
+        Modifies every number in a range with the given operation and value. The range is read once and written back with one write.
+        Empty cells, text, booleans and dates are left as they are.
+
+        Arguments:
+                |  Sheet Name (string)  | The selected sheet that the range will be modified in. |
+                |  Cell Range (string)  | The range to modify, for example B2:D100. |
+                |  Operation (operator) | One of + - * / // % or ** |
+                |  Value (number)       | The value that will be used in conjuction with the operation parameter. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |             |         |     |      |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |             |         |     |      |
+        | Modify Range With    |  TestSheet1                                        |  B2:D100    |  *      |  1.21  |
+
+        """
+        first_row, first_col, last_row, last_col = split_range(cellrange)
+        rows = self.backend.read_range(sheetname, first_row, first_col, last_row, last_col)
+        count, rows = arithmetic(rows, op, val)
+        if count:
+            self._write_range(sheetname, first_row, first_col, rows)
+        print '*DEBUG* Modified %d cells' % count
+
+    def shift_dates_in_range(self, sheetname, cellrange, numdays):
+        """
+        Adds the number of days to every date in a range, a negative number subtracts them. The range is read once and written back with one write.
+        Cells that do not hold a date are left as they are.
+
+        Arguments:
+                |  Sheet Name (string)    | The selected sheet that the range will be modified in. |
+                |  Cell Range (string)    | The range to modify, for example D2:D100. |
+                |  Number of Days (int)   | The number of days added to each date. |
+        Example:
+
+        | *Keywords*             |  *Parameters*                                      |             |       |
+        | Open Excel             |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |             |       |
+        | Shift Dates In Range   |  TestSheet1                                        |  D2:D100    |  -7   |
+
+        """
+        first_row, first_col, last_row, last_col = split_range(cellrange)
+        rows = self.backend.read_range(sheetname, first_row, first_col, last_row, last_col)
+        count, rows = shift_dates(rows, numdays)
+        if count:
+            self._write_range(sheetname, first_row, first_col, rows)
+        print '*DEBUG* Shifted %d dates' % count
+
+    def begin_batch_edit(self):
+        """
+        Starts buffering the changes made by the Put ... To Cell, Modify Cell With, Add To Date and Subtract From Date keywords.
+        The changes are kept in memory and are only written to Excel by Commit Batch Edit (or by saving the workbook), which makes a long
+        series of cell changes a lot faster. Keywords that read cells see the buffered values. Buffered changes are lost when the workbook is closed before they are committed.
+
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |     |     |      |
+        | Open Excel           |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |     |     |      |
+        | Begin Batch Edit     |                                                    |     |     |      |
+        | Put Value To Cell    |  TestSheet1                                        |  1  |  1  |  34  |
+        | Put Value To Cell    |  TestSheet1                                        |  1  |  2  |  35  |
+        | Commit Batch Edit    |                                                    |     |     |      |
+
+        """
+        self._backend_for('write_cell')
+        if isinstance(self.backend, BatchEdit):
+            raise RuntimeError("A batch edit is already in progress, use Commit Batch Edit first")
+        self.backend = BatchEdit(self.backend)
+
+    def commit_batch_edit(self):
+        """
+        Writes the changes buffered since Begin Batch Edit to Excel and stops buffering.
+        Adjacent cells are combined into rectangular blocks, each block is written with a single range assignment.
+
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |
+        | Begin Batch Edit     |                                                    |
+        | Commit Batch Edit    |                                                    |
+
+        """
+        if not isinstance(self.backend, BatchEdit):
+            raise RuntimeError("No batch edit in progress, use Begin Batch Edit first")
+        self._commit_batch()
+
+    def enable_excel_performance_mode(self):
+        """
+        Switches Excel to manual calculation and turns off screen updating and events, so keywords that change many cells do not make Excel
+        recalculate and redraw after every change. Formulas are recalculated by Recalculate Excel, and once before the first read of a cell
+        after cells were changed, so keywords never read stale values.
+        Disable Excel Performance Mode restores the settings Excel had before. When a test fails before that, they are restored at the end
+        of the suite that enabled the mode, and when the library is done. Commit Batch Edit uses the mode by itself while it writes.
+        With backend=xlsx there is nothing to switch, and the Excel of a broker is shared with other tests, the keyword then does nothing.
+
+        Example:
+
+        | *Keywords*                       |  *Parameters*                                      |     |     |      |
+        | Open Excel                       |  C:\\Python27\\ExcelRobotTest\\ExcelRobotTest.xls  |     |     |      |
+        | Enable Excel Performance Mode    |                                                    |     |     |      |
+        | Put Values To Column             |  TestSheet1                                        |  1  |  2  |  ${values}  |
+        | Recalculate Excel                |                                                    |     |     |      |
+        | Disable Excel Performance Mode   |                                                    |     |     |      |
+
+        """
+        if self.backendName != 'excel' or self.broker:
+            print '*INFO* Performance mode has no effect with backend=xlsx or a broker'
+            return
+        if self.performance.enabled:
+            return
+        self.performance.enable(self._excel_app(), self.performanceListener.current_suite())
+        print '*DEBUG* Excel performance mode enabled, settings saved: %s' % ', '.join('%s=%s' % setting for setting in self.performance.saved)
+
+    def disable_excel_performance_mode(self):
+        """
+        Restores the calculation, screen updating and events settings Excel had before Enable Excel Performance Mode.
+        Setting the calculation back to automatic recalculates the changed formulas.
+
+        Example:
+
+        | *Keywords*                       |  *Parameters*                                      |
+        | Disable Excel Performance Mode   |                                                    |
+
+        """
+        if self.performance.enabled:
+            self.performance.disable()
+            print '*DEBUG* Excel performance mode disabled after %d recalculations' % self.performance.recalculations
+
+    def recalculate_excel(self):
+        """
+        Recalculates the formulas of all open workbooks. Only needed with Enable Excel Performance Mode, and only before something outside
+        the library looks at the workbook: the library recalculates by itself before it reads changed workbooks.
+
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |
+        | Recalculate Excel    |                                                    |
+
+        """
+        if self.backendName != 'excel' or self.xa is None:
+            return
+        if self.performance.enabled:
+            self.performance.recalculate()
+        else:
+            self.xa.calculate()
+
     def save_excel(self, filename, useTempDir=False):
         """
         Saves the Excel file indicated by file name, the useTempDir can be set to true if the user needs the file saved in the temporary directory.
@@ -542,9 +1496,9 @@ class Excel10Library:
         """
         if useTempDir is True:
             print '*DEBUG* Got fname %s' % filename
-            self.wb.save(os.path.join("/", self.tmpDir, filename))
+            self._save(os.path.join("/", self.tmpDir, filename))
         else:
-            self.wb.save(filename)
+            self._save(filename)
 
     def save_excel_current_directory(self, filename):
         """
@@ -561,7 +1515,23 @@ class Excel10Library:
         """
         workdir = os.getcwd()
         print '*DEBUG* Got fname %s' % filename
-        self.wb.save(os.path.join(workdir, filename))
+        self._save(os.path.join(workdir, filename))
+
+    def wait_for_save(self, alias=None):
+        """
+        Waits until the saves running in the background are done and fails with the error of a save that failed.
+        Saves only run in the background when the library is imported with backgroundsave=True, see the introduction.
+
+        Arguments:
+                |  Alias (default=all workbooks)  | The alias of the workbook to wait for. |
+        Example:
+
+        | *Keywords*           |  *Parameters*                                      |
+        | Save Excel           |  NewExcelRobotTest.xlsx                            |
+        | Wait For Save        |                                                    |
+
+        """
+        self._wait_for_saves(alias)
 
     def add_new_sheet(self, newsheetname):
         """
@@ -576,14 +1546,17 @@ class Excel10Library:
         | Add New Sheet        |  NewSheet                                          |
 
         """
-        self.wb.sheets.add(newsheetname)
+        self._backend_for('add_sheet').add_sheet(newsheetname)
+        self._invalidate()
+        self.sheetNames = self.backend.sheet_names()
 
-    def create_excel_workbook(self, newsheetname):
+    def create_excel_workbook(self, newsheetname, alias=None):
         """
         Creates a new Excel workbook
 
         Arguments:
                 |  New Sheet Name (string)  | The name of the new sheet added to the new workbook.  |
+                |  Alias (default=workbook name) | The name used by Switch Workbook and Close Excel Workbook to refer to this workbook. |
         Example:
 
         | *Keywords*           |  *Parameters*                                      |
@@ -591,13 +1564,91 @@ class Excel10Library:
         | Create Excel         |  NewExcelSheet                                     |
 
         """
-        self.wb=xw.books.add()
+        self._store()
+        if self.backendName == 'xlsx':
+            self.wb = None
+            backend = XlsxStreamBackend()
+            self.created += 1
+            name = 'Book%d' % self.created
+        elif self.broker:
+            self.wb = None
+            backend, name = BrokerBackend.create(self._broker())
+        else:
+            self.wb=self._excel_app().books.add()
+            backend = ExcelBackend(self.wb, self.performance)
+            name = self.wb.name
+        self.backend = CountingBackend(backend, self.stats)
+        self.fileName = None
+        self.valueIndex = {}
+        self.keyIndex = {}
+        self.sheetNames = self.backend.sheet_names()
+        self._register(alias or name)
         self.add_new_sheet(newsheetname)
 
-    def close_excel_workbook(self):
+    def register_template(self, name, filename):
+        """
+        Reads a workbook file once and keeps it in memory under a name, for New Workbook From Template. Registering a name again replaces
+        the template, workbooks made from the old one are not affected. Later changes to the file are not seen.
+
+        Arguments:
+                |  Name (string)       | The name New Workbook From Template uses for the template. |
+                |  File Name (string)  | The workbook file to keep. |
+        Example:
+
+        | *Keywords*                  |  *Parameters*  |                                               |
+        | Register Template           |  report        |  C:\\Python27\\ExcelRobotTest\\Template.xlsx  |
+
+        """
+        old = self.templates.pop(name, None)
+        if old is not None:
+            old.close()
+        self.templates[name] = Template(filename)
+        print '*DEBUG* Registered template %s: %s, %d bytes' % (name, filename, len(self.templates[name].data))
+
+    def new_workbook_from_template(self, name, alias=None):
+        """
+        Makes a new workbook that is a copy of a template registered with Register Template, and makes it the current workbook.
+        With the xlsx backend the copy is made in memory: it shares the template's bytes and parsed sheets and only copies the rows it
+        changes, so every sheet of a template is parsed once for all its copies. With Excel the kept bytes are written to a temporary
+        file that Excel opens, the template file itself is not opened. Save Excel writes the copy to the file given, never to the template.
+
+        Arguments:
+                |  Name (string)                  | The name the template was registered under. |
+                |  Alias (default=template name)  | The name used by Switch Workbook and Close Excel Workbook to refer to this workbook. |
+        Example:
+
+        | *Keywords*                  |  *Parameters*  |                                               |     |     |      |
+        | Register Template           |  report        |  C:\\Python27\\ExcelRobotTest\\Template.xlsx  |     |     |      |
+        | New Workbook From Template  |  report        |                                               |     |     |      |
+        | Put Value To Cell           |  Sheet1        |  1                                            |  1  |  34  |      |
+        | Save Excel                  |  C:\\Python27\\ExcelRobotTest\\Report1.xlsx   |                  |     |     |      |
+
+        """
+        template = self.templates.get(name)
+        if template is None:
+            raise ValueError("No template named '%s', registered templates: %s" % (name, ', '.join(sorted(self.templates))))
+        alias = alias or name
+        if self.backendName != 'xlsx':
+            path = template.write_copy()
+            self.templateCopies.append(path)
+            self._open(path, alias)
+            return
+        self._store()
+        self.wb = None
+        self.backend = CountingBackend(XlsxBackend(template.filename, template), self.stats)
+        self.fileName = None
+        self.valueIndex = {}
+        self.keyIndex = {}
+        self.sheetNames = self.backend.sheet_names()
+        self._register(alias)
+
+    def close_excel_workbook(self, alias=None):
         """
         Closes current Excel workbook in memory. Good to use in Suite Teardown.
+        When an alias is given that workbook is closed instead. After closing the current workbook the most recently used open workbook becomes the current one.
 
+        Arguments:
+                |  Alias (default=current workbook)  | The alias of the workbook to close. |
         Example:
 
         | *Keywords*              |  *Parameters*                                      |
@@ -606,4 +1657,18 @@ class Excel10Library:
 
 
         """
-        self.wb.close()
+        if alias is not None and alias != self.alias:
+            state = self.workbooks.remove(alias)
+            if state is None:
+                raise ValueError("No open workbook with alias '%s'" % alias)
+            self._close(alias, state)
+            return
+        self._backend_for('close')
+        self._close(self.alias, self._state())
+        self.workbooks.remove(self.alias)
+        self.wb = self.backend = self.sheetNames = self.fileName = self.alias = None
+        self.valueIndex = {}
+        self.keyIndex = {}
+        if len(self.workbooks):
+            alias = self.workbooks.most_recent()
+            self._restore(alias, self.workbooks.get(alias))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Statistics of the values of a column, overall or per key, for the Get Column Statistics
+and Group By And Aggregate keywords.
+
+Values are first split in plain lists (one per key), then every list is reduced with
+the builtins sum, min and max, which keeps a column of a million cells at a second.
+"""
+
+import math
+from collections import OrderedDict
+from itertools import izip
+from numbers import Number
+
+from cellref import cell_address
+from valueindex import index_key
+
+FUNCTIONS = ('count', 'sum', 'mean', 'min', 'max', 'distinct')
+
+#  What happens with a cell that holds something else than a number.
+POLICIES = ('skip', 'zero', 'fail')
+
+
+def _blank(value):
+    return value is None or (isinstance(value, basestring) and not value.strip())
+
+
+def number(value, policy='skip'):
+    """
+    Returns the value as a float, or None when it is not taken into account. Numbers
+    and text holding a number count, booleans, dates and other text follow the policy.
+    """
+    if isinstance(value, Number) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, basestring):
+        try:
+            converted = float(value.strip())
+        except ValueError:
+            pass
+        else:
+            if not math.isnan(converted) and not math.isinf(converted):
+                return converted
+    if policy == 'zero':
+        return 0.0
+    if policy == 'fail':
+        raise ValueError("%r is not a number" % (value,))
+    return None
+
+
+def _check(function, policy):
+    if function not in FUNCTIONS:
+        raise ValueError("Unknown function '%s', use one of: %s" % (function, ', '.join(FUNCTIONS)))
+    if policy not in POLICIES:
+        raise ValueError("Unknown policy '%s', use one of: %s" % (policy, ', '.join(POLICIES)))
+
+
+def _check_numbers(values, first_row, column):
+    #  The fail policy: a separate pass, so the fast path below never needs row numbers.
+    for row_offset, value in enumerate(values):
+        if type(value) is not float and not _blank(value) and number(value) is None:
+            raise ValueError("Cell %s holds %r, not a number" % (cell_address(first_row + row_offset, column), value))
+
+
+def _split(values, policy):
+    """
+    Returns (numbers, values, blanks): the numbers to compute with, the non blank
+    values and the number of blank cells.
+    """
+    numbers = [value for value in values if type(value) is float]
+    if len(numbers) == len(values):
+        return numbers, values, 0
+    filled = [value for value in values if not _blank(value)]
+    numbers = [converted for converted in (number(value, policy) for value in filled) if converted is not None]
+    return numbers, filled, len(values) - len(filled)
+
+
+def _result(function, numbers, values):
+    if function == 'count':
+        return len(numbers)
+    if function == 'sum':
+        return sum(numbers, 0.0)
+    if function == 'mean':
+        return sum(numbers, 0.0) / len(numbers) if numbers else None
+    if function == 'min':
+        return min(numbers) if numbers else None
+    if function == 'max':
+        return max(numbers) if numbers else None
+    #  Duplicates go first, index keys are only made of the different raw values.
+    return len(set(index_key(value) for value in set(values)))
+
+
+def column_statistics(values, first_row, column, policy='skip'):
+    """
+    Returns an OrderedDict with the count, sum, mean, min, max and distinct count of a
+    column's values, plus the number of blank and skipped cells. values are the cells
+    from first_row down. Blank cells never count, distinct counts all other values.
+    """
+    _check('count', policy)
+    if policy == 'fail':
+        _check_numbers(values, first_row, column)
+    numbers, filled, blanks = _split(values, policy)
+    statistics = OrderedDict((function, _result(function, numbers, filled)) for function in FUNCTIONS)
+    statistics['blanks'] = blanks
+    statistics['skipped'] = len(filled) - len(numbers)
+    return statistics
+
+
+def group_aggregate(keys, values, first_row, column, function='sum', policy='skip'):
+    """
+    Returns an OrderedDict of key text to function applied to the values of the rows
+    with that key, in the order the keys first occur. Rows with a blank key are left
+    out, blank values are not counted.
+    """
+    _check(function, policy)
+    if policy == 'fail':
+        _check_numbers(values, first_row, column)
+    buckets = {}
+    order = []
+    for key, value in izip(keys, values):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = []
+            order.append(key)
+        bucket.append(value)
+    #  Raw keys that are the same text (5 and 5.0) end up in one group.
+    groups = OrderedDict()
+    for key in order:
+        if not _blank(key):
+            groups.setdefault(index_key(key), []).extend(buckets[key])
+    aggregated = OrderedDict()
+    for key, group in groups.items():
+        numbers, filled, blanks = _split(group, policy)
+        aggregated[key] = _result(function, numbers, filled)
+    return aggregated
@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Backends that read the cells of an opened workbook for Excel10Library.
+
+Every backend offers the same read methods, all rows and columns are 1 based:
+
+- sheet_names()
+- active_sheet_name()
+- dimensions(sheetname) returning the (last row, last column) of the used area, cached per sheet
+- last_row_in_column(sheetname, column) / last_column_in_row(sheetname, row)
+- read_cell(sheetname, cell) where cell is an A1 address or a (row, column) tuple
+- read_range(sheetname, first_row, first_column, last_row, last_column) returning a list of rows
+- iter_rows(sheetname, chunk_size) yielding the rows of the used area in lists of at most chunk_size rows
+- write_cell(sheetname, row, column, value) / write_range(sheetname, first_row, first_column, rows),
+  add_sheet(sheetname) and save(filename), only for backends that can change a workbook
+- set_number_format(sheetname, first_row, first_column, last_row, last_column, number_format), only for
+  backends that can format cells; the others get datetimes and choose a date format themselves
+- invalidate(sheetname=None) to drop what is cached for a sheet, or for all sheets, after a change
+- epoch() returning the datetime of serial number 0, which differs for the 1904 date system
+- close()
+"""
+
+import os
+from cStringIO import StringIO
+from datetime import datetime
+
+from cellref import split_address
+from coercion import stored_value
+from xlsxpatch import save_changes
+from xlsxreader import XlsxReader
+from xlsxstream import XlsxStreamWriter
+
+
+def iter_row_chunks(backend, sheetname, chunk_size):
+    """
+    Yields the used area of a sheet in lists of at most chunk_size rows, one read_range
+    call per chunk.
+    """
+    chunk_size = int(chunk_size)
+    last_row, last_column = backend.dimensions(sheetname)
+    for first_row in range(1, last_row + 1, chunk_size):
+        yield backend.read_range(sheetname, first_row, 1, min(first_row + chunk_size - 1, last_row), last_column)
+
+
+_EPOCH_1900 = datetime(1899, 12, 30)
+_EPOCH_1904 = datetime(1904, 1, 1)
+
+
+def _same_file(path, other):
+    return os.path.normcase(os.path.abspath(path)) == os.path.normcase(os.path.abspath(other))
+
+
+class ExcelBackend(object):
+    """
+    Reads through a workbook that is opened in Excel by xlwings.
+
+    mode is the library's PerformanceMode, it is told about every change and
+    recalculates before a read when Excel calculates manually and cells changed.
+    """
+
+    name = 'excel'
+
+    def __init__(self, book, mode=None):
+        self.book = book
+        self.mode = mode
+        self._dimensions = {}
+
+    def sheet_names(self):
+        return [sh.name for sh in self.book.sheets]
+
+    def epoch(self):
+        try:
+            date1904 = self.book.api.Date1904
+        except Exception:
+            #  Only the Windows api has the property.
+            date1904 = False
+        return _EPOCH_1904 if date1904 is True else _EPOCH_1900
+
+    def active_sheet_name(self):
+        return self.book.sheets.active.name
+
+    def dimensions(self, sheetname):
+        dimensions = self._dimensions.get(sheetname)
+        if dimensions is None:
+            last_cell = self.book.sheets[sheetname].used_range.last_cell
+            dimensions = self._dimensions[sheetname] = (last_cell.row, last_cell.column)
+        return dimensions
+
+    def invalidate(self, sheetname=None):
+        if sheetname is None:
+            self._dimensions.clear()
+        else:
+            self._dimensions.pop(sheetname, None)
+
+    def last_row_in_column(self, sheetname, column):
+        return self.book.sheets[sheetname].range((1048575, column)).end('up').row
+
+    def last_column_in_row(self, sheetname, row):
+        return self.book.sheets[sheetname].range((row, 16384)).end('left').column
+
+    def read_cell(self, sheetname, cell):
+        if self.mode is not None:
+            self.mode.before_read()
+        return self.book.sheets[sheetname].range(cell).value
+
+    def read_range(self, sheetname, first_row, first_column, last_row, last_column):
+        if self.mode is not None:
+            self.mode.before_read()
+        #  One call for the whole block, ndim=2 keeps single rows and columns as a list of rows.
+        block = self.book.sheets[sheetname].range((first_row, first_column), (last_row, last_column))
+        return block.options(ndim=2).value
+
+    def iter_rows(self, sheetname, chunk_size):
+        return iter_row_chunks(self, sheetname, chunk_size)
+
+    def write_cell(self, sheetname, row, column, value):
+        self.book.sheets[sheetname].range((row, column)).value = value
+        if self.mode is not None:
+            self.mode.after_write()
+
+    def write_range(self, sheetname, first_row, first_column, rows):
+        self.book.sheets[sheetname].range((first_row, first_column)).value = rows
+        if self.mode is not None:
+            self.mode.after_write()
+
+    def set_number_format(self, sheetname, first_row, first_column, last_row, last_column, number_format):
+        self.book.sheets[sheetname].range((first_row, first_column), (last_row, last_column)).number_format = number_format
+
+    def add_sheet(self, sheetname):
+        self.book.sheets.add(sheetname)
+
+    def save(self, filename):
+        self.book.save(filename)
+
+    def close(self):
+        self.book.close()
+
+
+class XlsxBackend(object):
+    """
+    Reads and changes an xlsx file directly, without Excel.
+
+    A worksheet is parsed the first time one of its cells is read and kept in memory
+    as a sparse {row: {column: value}} mapping. Written cells are applied to that
+    mapping and remembered, save() writes them into a copy of the file and copies
+    everything else unchanged, see xlsxpatch.
+
+    A copy of a templates.Template reads the template's bytes and starts from its parsed
+    sheets. They are shared with the other copies, so a row is copied before its first
+    change and the template itself never changes.
+    """
+
+    name = 'xlsx'
+
+    def __init__(self, filename, template=None):
+        self.template = template
+        self.reader = XlsxReader(filename, template.source() if template is not None else None)
+        self._data = None
+        self._sheets = {}
+        self._shared = {}
+        self._dimensions = {}
+        self._changes = {}
+
+    def sheet_names(self):
+        return self.reader.sheet_names()
+
+    def epoch(self):
+        return self.reader.epoch
+
+    def active_sheet_name(self):
+        return self.reader.active_sheet_name()
+
+    def _sheet(self, sheetname):
+        sheetname = self.reader.sheet_name(sheetname)
+        sheet = self._sheets.get(sheetname)
+        if sheet is None:
+            if self.template is not None:
+                #  Only the row mapping is copied, the rows stay the template's until they change.
+                sheet = self._sheets[sheetname] = dict(self.template.sheet(sheetname))
+                self._shared[sheetname] = set(sheet)
+            else:
+                sheet = self._sheets[sheetname] = dict(self.reader.iter_rows(sheetname))
+        return sheet
+
+    def dimensions(self, sheetname):
+        sheetname = self.reader.sheet_name(sheetname)
+        dimensions = self._dimensions.get(sheetname)
+        if dimensions is None:
+            sheet = self._sheets.get(sheetname)
+            if sheet is None:
+                #  Not parsed yet, the <dimension> element at the top of the sheet is enough.
+                dimensions = self.reader.dimension(sheetname)
+            if dimensions is None:
+                sheet = self._sheet(sheetname)
+                dimensions = (max(sheet or [1]), max([max(cells) for cells in sheet.values()] or [1]))
+            self._dimensions[sheetname] = dimensions
+        return dimensions
+
+    def invalidate(self, sheetname=None):
+        #  Only write_cell changes the workbook and it grows the dimensions itself, recomputing
+        #  them would cost a pass over the whole sheet after every write.
+        pass
+
+    def last_row_in_column(self, sheetname, column):
+        rows = [row for row, cells in self._sheet(sheetname).items() if column in cells]
+        return max(rows or [1])
+
+    def last_column_in_row(self, sheetname, row):
+        return max(self._sheet(sheetname).get(row) or [1])
+
+    def read_cell(self, sheetname, cell):
+        if isinstance(cell, tuple):
+            row, column = cell
+        else:
+            row, column = split_address(cell)
+        return self._sheet(sheetname).get(row, {}).get(column)
+
+    def read_range(self, sheetname, first_row, first_column, last_row, last_column):
+        sheet = self._sheet(sheetname)
+        columns = range(first_column, last_column + 1)
+        rows = []
+        for row in range(first_row, last_row + 1):
+            cells = sheet.get(row, {})
+            rows.append([cells.get(column) for column in columns])
+        return rows
+
+    def iter_rows(self, sheetname, chunk_size):
+        sheetname = self.reader.sheet_name(sheetname)
+        if sheetname in self._sheets:
+            return iter_row_chunks(self, sheetname, chunk_size)
+        return self._stream_rows(sheetname, int(chunk_size))
+
+    def _stream_rows(self, sheetname, chunk_size):
+        #  Streams from the file instead of parsing the whole sheet, only one chunk is kept in memory.
+        last_column = self.dimensions(sheetname)[1]
+        columns = range(1, last_column + 1)
+        chunk = []
+        next_row = 1
+        for row, cells in self.reader.iter_rows(sheetname):
+            while next_row <= row:
+                if next_row == row:
+                    chunk.append([cells.get(column) for column in columns])
+                else:
+                    chunk.append([None] * last_column)
+                next_row += 1
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def write_cell(self, sheetname, row, column, value):
+        sheetname = self.reader.sheet_name(sheetname)
+        cells = self._sheet(sheetname)
+        shared = self._shared.get(sheetname)
+        if shared and row in shared:
+            cells[row] = dict(cells[row])
+            shared.discard(row)
+        stored = stored_value(value)
+        if stored is None:
+            cells.get(row, {}).pop(column, None)
+        else:
+            cells.setdefault(row, {})[column] = stored
+        #  The patcher gets the value as written, an apostrophe still tells it to keep a number as text.
+        self._changes.setdefault(sheetname, {})[(row, column)] = value
+        last_row, last_column = self.dimensions(sheetname)
+        self._dimensions[sheetname] = (max(last_row, row), max(last_column, column))
+
+    def write_range(self, sheetname, first_row, first_column, rows):
+        for row_offset, values in enumerate(rows):
+            for col_offset, value in enumerate(values):
+                self.write_cell(sheetname, first_row + row_offset, first_column + col_offset, value)
+
+    def has_changes(self):
+        return bool(self._changes)
+
+    def save(self, filename):
+        self.save_task(filename)()
+
+    def save_task(self, filename):
+        """
+        Returns a function without arguments that saves the workbook as it is now to
+        filename. It only uses copies of the state, so it can run on another thread.
+        """
+        changes = dict((sheetname, dict(cells)) for sheetname, cells in self._changes.items())
+        paths = dict((sheetname, self.reader.sheet_path(sheetname)) for sheetname in changes)
+        dimensions = dict((sheetname, self.dimensions(sheetname)) for sheetname in changes)
+        date_styles, day_styles = self.reader.date_styles(), self.reader.day_styles()
+        source = self._source(filename)
+        epoch = self.reader.epoch
+        return lambda: save_changes(source, filename, changes, paths, dimensions, date_styles, day_styles, epoch)
+
+    def _source(self, filename):
+        #  The file the changes are applied to. Windows cannot replace a file that is open, so
+        #  before the opened file is saved over the reader goes on from a copy in memory.
+        if self.template is not None:
+            return self.template.source()
+        if self._data is None and _same_file(filename, self.reader.filename):
+            with open(self.reader.filename, 'rb') as source:
+                self._data = source.read()
+            reader = XlsxReader(self.reader.filename, StringIO(self._data))
+            self.reader.close()
+            self.reader = reader
+        if self._data is not None:
+            return StringIO(self._data)
+        return self.reader.filename
+
+    def close(self):
+        self.reader.close()
+
+
+class XlsxStreamBackend(object):
+    """
+    Creates a new xlsx file without Excel. Write only: cells cannot be read back.
+
+    Rows are streamed to disk once the writes are more than window rows past them,
+    see XlsxStreamWriter.
+    """
+
+    name = 'xlsx'
+
+    def __init__(self, window=1000):
+        self.writer = XlsxStreamWriter(window)
+
+    def sheet_names(self):
+        return self.writer.sheet_names()
+
+    def epoch(self):
+        return _EPOCH_1900
+
+    def active_sheet_name(self):
+        return self.sheet_names()[0]
+
+    def invalidate(self, sheetname=None):
+        pass
+
+    def write_cell(self, sheetname, row, column, value):
+        self.writer.write_cell(sheetname, row, column, value)
+
+    def write_range(self, sheetname, first_row, first_column, rows):
+        for row_offset, values in enumerate(rows):
+            for col_offset, value in enumerate(values):
+                self.writer.write_cell(sheetname, first_row + row_offset, first_column + col_offset, value)
+
+    def add_sheet(self, sheetname):
+        self.writer.add_sheet(sheetname)
+
+    def save(self, filename):
+        self.writer.save(filename)
+
+    def save_task(self, filename):
+        return self.writer.save_task(filename)
+
+    def close(self):
+        self.writer.close()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Saves that run on a worker thread, for the backgroundsave library argument.
+"""
+
+import sys
+import threading
+import time
+
+
+class BackgroundSave(object):
+    """
+    Runs a save task (a function without arguments, see the save_task method of the
+    file backends) on its own thread. wait() blocks until it is done and raises the
+    error the task raised, if any, in the calling thread.
+    """
+
+    def __init__(self, task, filename):
+        self.filename = filename
+        self.seconds = None
+        self._task = task
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='save %s' % filename)
+        self._thread.start()
+
+    def _run(self):
+        start = time.time()
+        try:
+            self._task()
+        except Exception:
+            self._error = sys.exc_info()
+        self.seconds = time.time() - start
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def wait(self):
+        self._thread.join()
+        if self._error is not None:
+            error_type, error, traceback = self._error
+            raise RuntimeError, 'Saving %s failed: %s: %s' % (self.filename, error_type.__name__, error), traceback
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Buffered cell writes for the Begin Batch Edit / Commit Batch Edit keywords.
+"""
+
+from backends import iter_row_chunks
+from cellref import split_address
+from coercion import stored_value
+
+
+def coalesce(cells):
+    """
+    Groups a sparse {row: {column: value}} mapping into rectangular blocks.
+
+    Returns a list of (first_row, first_column, rows) tuples, where rows is a list of
+    equally long value lists. Cells in the same row with consecutive columns form a run,
+    runs spanning the same columns in consecutive rows are stacked into one block.
+    Only the given cells are covered, so writing the blocks never touches other cells.
+    """
+    blocks = []
+    open_blocks = {}
+    for row in sorted(cells):
+        still_open = {}
+        for first_column, values in _runs(cells[row]):
+            key = (first_column, len(values))
+            block = open_blocks.pop(key, None)
+            if block is not None and block[0] + len(block[2]) == row:
+                block[2].append(values)
+            else:
+                if block is not None:
+                    blocks.append(block)
+                block = (row, first_column, [values])
+            still_open[key] = block
+        blocks.extend(open_blocks.values())
+        open_blocks = still_open
+    blocks.extend(open_blocks.values())
+    return sorted(blocks)
+
+
+def _runs(row_cells):
+    runs = []
+    for column in sorted(row_cells):
+        if runs and runs[-1][0] + len(runs[-1][1]) == column:
+            runs[-1][1].append(row_cells[column])
+        else:
+            runs.append((column, [row_cells[column]]))
+    return runs
+
+
+class BatchEdit(object):
+    """
+    Wraps a backend and keeps every cell write in memory until commit() is called.
+
+    Reads are passed to the wrapped backend with the pending writes laid over the
+    result, so a test sees its own changes before they are committed. They are laid
+    over as Excel returns them after the commit, see coercion.stored_value.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._pending = {}
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    @property
+    def pending_cells(self):
+        return sum(len(cells) for rows in self._pending.values() for cells in rows.values())
+
+    def write_cell(self, sheetname, row, column, value):
+        self._pending.setdefault(sheetname, {}).setdefault(row, {})[column] = value
+
+    def write_range(self, sheetname, first_row, first_column, rows):
+        for row_offset, values in enumerate(rows):
+            for col_offset, value in enumerate(values):
+                self.write_cell(sheetname, first_row + row_offset, first_column + col_offset, value)
+
+    def read_cell(self, sheetname, cell):
+        pending = self._pending.get(sheetname)
+        if pending:
+            if isinstance(cell, tuple):
+                row, column = cell
+            else:
+                row, column = split_address(cell)
+            cells = pending.get(row)
+            if cells and column in cells:
+                return stored_value(cells[column])
+        return self.backend.read_cell(sheetname, cell)
+
+    def read_range(self, sheetname, first_row, first_column, last_row, last_column):
+        rows = self.backend.read_range(sheetname, first_row, first_column, last_row, last_column)
+        for row, cells in self._pending.get(sheetname, {}).items():
+            if first_row <= row <= last_row:
+                values = rows[row - first_row]
+                for column, value in cells.items():
+                    if first_column <= column <= last_column:
+                        values[column - first_column] = stored_value(value)
+        return rows
+
+    def iter_rows(self, sheetname, chunk_size):
+        return iter_row_chunks(self, sheetname, chunk_size)
+
+    def dimensions(self, sheetname):
+        last_row, last_column = self.backend.dimensions(sheetname)
+        for row, cells in self._pending.get(sheetname, {}).items():
+            last_row = max(last_row, row)
+            last_column = max([last_column] + list(cells))
+        return last_row, last_column
+
+    def last_row_in_column(self, sheetname, column):
+        rows = [row for row, cells in self._pending.get(sheetname, {}).items() if column in cells]
+        return max([self.backend.last_row_in_column(sheetname, column)] + rows)
+
+    def last_column_in_row(self, sheetname, row):
+        columns = list(self._pending.get(sheetname, {}).get(row, {}))
+        return max([self.backend.last_column_in_row(sheetname, row)] + columns)
+
+    def commit(self):
+        """
+        Writes the pending cells to the wrapped backend, one range assignment per block,
+        and returns the wrapped backend.
+        """
+        for sheetname, cells in self._pending.items():
+            for first_row, first_column, rows in coalesce(cells):
+                self.backend.write_range(sheetname, first_row, first_column, rows)
+            self.backend.invalidate(sheetname)
+        self._pending = {}
+        return self.backend
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Compares reading a sheet cell by cell (the old Get Sheet Values loop) with one bulk
+range read, on a generated sheet of 200 rows by 50 columns. Needs Excel and xlwings.
+
+Usage: python benchmarks/bench_bulk_read.py [rows] [columns]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import xlwings as xw
+from backends import ExcelBackend
+from cellref import cell_address
+
+
+def per_cell(sheet, rows, columns):
+    data = {}
+    for cell in sheet.range((1, 1), (rows, columns)):
+        data[cell.get_address(False, False)] = cell.value
+    return data
+
+
+def bulk(backend, sheetname, rows, columns):
+    data = {}
+    for row_offset, row_values in enumerate(backend.read_range(sheetname, 1, 1, rows, columns)):
+        for col_offset, value in enumerate(row_values):
+            data[cell_address(row_offset + 1, col_offset + 1)] = value
+    return data
+
+
+def main(rows=200, columns=50):
+    app = xw.App(False)
+    try:
+        book = app.books.add()
+        sheet = book.sheets[0]
+        sheet.range((1, 1)).value = [[r * columns + c for c in range(columns)] for r in range(rows)]
+
+        start = time.time()
+        expected = per_cell(sheet, rows, columns)
+        cell_time = time.time() - start
+
+        start = time.time()
+        actual = bulk(ExcelBackend(book), sheet.name, rows, columns)
+        bulk_time = time.time() - start
+
+        assert actual == expected, 'bulk read returned different data'
+        print 'cells:     %d' % (rows * columns)
+        print 'per cell:  %.3fs' % cell_time
+        print 'bulk:      %.3fs' % bulk_time
+        print 'speedup:   %.0fx' % (cell_time / max(bulk_time, 1e-6))
+        book.close()
+    finally:
+        app.quit()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
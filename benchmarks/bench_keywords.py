@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Times the read and write keywords of Excel10Library on generated workbooks of 1k to 1M
+cells and writes the results as JSON, so runs can be compared over time.
+
+Targets:
+- fake: the excel backend on the in-memory xlwings stand-in of fakexlwings.py, which
+  also counts the round trips that would go to Excel. Runs anywhere, without Excel.
+- xlsx: the xlsx backend on generated xlsx files.
+- xlsx-cache: the xlsx backend with the on-disk snapshot cache (cachedir).
+
+For every keyword the result holds the seconds taken, the backend calls and cells moved
+(from Get Excel Performance Stats) and, for the fake target, the xlwings round trips.
+
+Usage: python benchmarks/bench_keywords.py [--sizes 1000,10000] [--targets fake,xlsx] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import Excel10Library as library_module
+import fakexlwings
+from Excel10Library import Excel10Library
+from xlsxstream import XlsxStreamWriter
+
+TARGETS = ('fake', 'xlsx', 'xlsx-cache')
+SHEET = 'Data'
+SAMPLES = 100
+
+
+def shape(cells):
+    columns = min(20, cells)
+    return max(cells // columns, 2), columns
+
+
+def generate_rows(rows, columns):
+    """
+    Returns a header row and rows-1 data rows: a unique ID, a text, a date and numbers.
+    """
+    headers = ['ID', 'Name', 'When'] + ['V%d' % column for column in range(4, columns + 1)]
+    data = [headers[:columns]]
+    start = datetime(2020, 1, 1)
+    for row in range(1, rows):
+        values = [float(row), u'name%d' % row, start + timedelta(days=row % 365)]
+        values.extend((row * column) * 0.5 for column in range(4, columns + 1))
+        data.append(values[:columns])
+    return data
+
+
+def write_xlsx(filename, data):
+    writer = XlsxStreamWriter()
+    try:
+        writer.add_sheet(SHEET)
+        for row, values in enumerate(data, 1):
+            for column, value in enumerate(values, 1):
+                writer.write_cell(SHEET, row, column, value)
+        writer.save(filename)
+    finally:
+        writer.close()
+
+
+def read_cases(rows, columns, rng):
+    cells = [(rng.randint(1, columns), rng.randint(1, rows)) for _ in range(SAMPLES)]
+    keys = [rng.randint(1, rows - 1) for _ in range(SAMPLES)]
+
+    def read_cells(lib):
+        for column, row in cells:
+            lib.read_cell_data_by_coordinates(SHEET, column, row)
+
+    def rows_by_key(lib):
+        for key in keys:
+            lib.get_row_by_key(SHEET, 'ID', key)
+
+    def cursor(lib):
+        cursor = lib.open_row_cursor(SHEET, 1000)
+        while lib.fetch_next_rows(cursor):
+            pass
+        lib.close_row_cursor(cursor)
+
+    return [
+        ('Get Row Count', lambda lib: lib.get_row_count(SHEET)),
+        ('Get Sheet Values (pairs)', lambda lib: lib.get_sheet_values(SHEET)),
+        ('Get Sheet Values (rows)', lambda lib: lib.get_sheet_values(SHEET, format='rows')),
+        ('Get Workbook Values', lambda lib: lib.get_workbook_values(format='rows')),
+        ('Get Column Values', lambda lib: lib.get_column_values(SHEET, 2)),
+        ('Get Row Values', lambda lib: lib.get_row_values(SHEET, rows // 2)),
+        ('Read Cell Data By Coordinates x%d' % SAMPLES, read_cells),
+        ('Fetch Next Rows (all)', cursor),
+        ('Find Cells With Value (first)', lambda lib: lib.find_cells_with_value('name%d' % (rows // 2), SHEET)),
+        ('Find Cells With Value (indexed)', lambda lib: lib.find_cells_with_value('name%d' % (rows // 3), SHEET)),
+        ('Get Row By Key x%d' % SAMPLES, rows_by_key),
+        ('Compare Sheets', lambda lib: lib.compare_sheets(SHEET)),
+    ]
+
+
+def write_cases(rows, columns, rng):
+    cells = [(rng.randint(1, columns), rng.randint(2, rows)) for _ in range(SAMPLES)]
+    last = 'C%d' % rows
+
+    def put_cells(lib):
+        for column, row in cells:
+            lib.put_value_to_cell(SHEET, column, row, '42')
+
+    def put_batch(lib):
+        lib.begin_batch_edit()
+        put_cells(lib)
+        lib.commit_batch_edit()
+
+    return [
+        ('Put Value To Cell x%d' % SAMPLES, put_cells),
+        ('Put Value To Cell x%d (batch)' % SAMPLES, put_batch),
+        ('Modify Range With', lambda lib: lib.modify_range_with(SHEET, 'A2:A%d' % rows, '+', '1')),
+        ('Shift Dates In Range', lambda lib: lib.shift_dates_in_range(SHEET, 'C2:%s' % last, '1')),
+        ('Save Excel', lambda lib: lib.save_excel(os.path.join(tempfile.gettempdir(), 'bench.xlsx'))),
+    ]
+
+
+def measure(lib, target, cells, keyword, function):
+    lib.get_excel_performance_stats(reset=True)
+    fakexlwings.reset_round_trips()
+    start = time.time()
+    function(lib)
+    seconds = time.time() - start
+    stats = lib.get_excel_performance_stats(reset=True)
+    result = {'target': target, 'cells': cells, 'keyword': keyword, 'seconds': round(seconds, 6),
+              'backend_calls': sum(stats['backend_calls'].values()),
+              'cells_moved': stats['cells_read'] + stats['cells_written'],
+              'round_trips': fakexlwings.round_trips() if target == 'fake' else None}
+    print '%-10s %8d  %-40s %10.4fs %8d calls' % (target, cells, keyword, seconds, result['backend_calls'])
+    return result
+
+
+def run_target(target, cells, data, workdir):
+    rows, columns = len(data), len(data[0])
+    rng = random.Random(cells)
+    results = []
+    if target == 'fake':
+        library_module.xw = fakexlwings
+        filename = os.path.join(workdir, 'fake-%d.xlsx' % cells)
+        fakexlwings.add_file(filename, [(SHEET, data)])
+        lib = Excel10Library()
+    else:
+        filename = os.path.join(workdir, 'bench-%d.xlsx' % cells)
+        if not os.path.exists(filename):
+            write_xlsx(filename, data)
+        cachedir = os.path.join(workdir, 'cache') if target == 'xlsx-cache' else None
+        if cachedir:
+            #  The first open writes the snapshot, the measured open reads it.
+            Excel10Library(backend='xlsx', cachedir=cachedir).open_excel(filename)
+        lib = Excel10Library(backend='xlsx', cachedir=cachedir)
+    results.append(measure(lib, target, cells, 'Open Excel', lambda lib: lib.open_excel(filename)))
+    for keyword, function in read_cases(rows, columns, rng):
+        results.append(measure(lib, target, cells, keyword, function))
+    if target == 'fake':
+        for keyword, function in write_cases(rows, columns, rng):
+            results.append(measure(lib, target, cells, keyword, function))
+        lib.close_excel_workbook()
+    else:
+        lib.close_excel_workbook()
+        writer = Excel10Library(backend='xlsx')
+
+        def create(lib):
+            lib.create_excel_workbook(SHEET)
+            for row, values in enumerate(data, 1):
+                for column, value in enumerate(values, 1):
+                    #  Robot Framework passes keyword arguments as text.
+                    if isinstance(value, datetime):
+                        lib.put_date_to_cell(SHEET, column, row, value.strftime('%d-%m-%Y'))
+                    else:
+                        lib.put_value_to_cell(SHEET, column, row, unicode(value))
+            lib.save_excel(os.path.join(workdir, 'created-%d.xlsx' % cells))
+
+        results.append(measure(writer, target, cells, 'Create Excel Workbook + Put Value To Cell (all)', create))
+        writer.close_excel_workbook()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the keywords of Excel10Library.')
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000',
+                        help='comma separated numbers of cells (default: %(default)s)')
+    parser.add_argument('--targets', default=','.join(TARGETS),
+                        help='comma separated targets out of %s (default: all)' % ', '.join(TARGETS))
+    parser.add_argument('--output', default='bench_results.json', help='JSON file to write (default: %(default)s)')
+    options = parser.parse_args()
+    targets = [target.strip() for target in options.targets.split(',')]
+    for target in targets:
+        if target not in TARGETS:
+            parser.error("unknown target '%s'" % target)
+    workdir = tempfile.mkdtemp(prefix='excel10bench')
+    results = []
+    try:
+        for cells in [int(size) for size in options.sizes.split(',')]:
+            data = generate_rows(*shape(cells))
+            for target in targets:
+                results.extend(run_target(target, cells, data, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    report = {'python': platform.python_version(), 'platform': platform.platform(),
+              'version': library_module.VERSION, 'time': datetime.utcnow().isoformat() + 'Z', 'results': results}
+    with open(options.output, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    print 'Results written to %s' % options.output
+
+
+if __name__ == '__main__':
+    main()
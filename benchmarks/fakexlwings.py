@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+In-memory stand-in for the parts of xlwings that Excel10Library uses, so the excel
+backend can be benchmarked and exercised without Excel.
+
+Every operation that is a round trip to Excel with the real xlwings (reading or writing
+a value, end(), used_range, adding sheets, opening and saving books) is counted in
+ROUND_TRIPS by operation name. Values behave like Excel's: numbers come back as floats,
+a leading apostrophe marks text and is not stored, and writing None or '' empties a cell.
+
+Use it by replacing the module the library imported:
+
+    import Excel10Library
+    import fakexlwings
+    Excel10Library.xw = fakexlwings
+"""
+
+import re
+
+from cellref import column_number
+
+ROUND_TRIPS = {}
+
+_CELL_RE = re.compile(r'^\$?([A-Za-z]{1,3})\$?(\d+)$')
+
+
+def count(operation):
+    ROUND_TRIPS[operation] = ROUND_TRIPS.get(operation, 0) + 1
+
+
+def round_trips():
+    return sum(ROUND_TRIPS.values())
+
+
+def reset_round_trips():
+    ROUND_TRIPS.clear()
+
+
+def _position(cell):
+    if isinstance(cell, tuple):
+        return cell
+    match = _CELL_RE.match(cell)
+    if match is None:
+        raise ValueError("Unsupported cell reference '%s'" % cell)
+    return int(match.group(2)), column_number(match.group(1))
+
+
+def _stored(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, long)):
+        return float(value)
+    if isinstance(value, basestring) and value.startswith("'"):
+        return value[1:]
+    return value
+
+
+class Range(object):
+
+    def __init__(self, sheet, first, last=None, ndim=None):
+        self.sheet = sheet
+        self.first_row, self.first_column = _position(first)
+        self.last_row, self.last_column = _position(last) if last is not None else (self.first_row, self.first_column)
+        self.ndim = ndim
+
+    @property
+    def row(self):
+        return self.first_row
+
+    @property
+    def column(self):
+        return self.first_column
+
+    @property
+    def last_cell(self):
+        return Range(self.sheet, (self.last_row, self.last_column))
+
+    def options(self, ndim=None, **options):
+        return Range(self.sheet, (self.first_row, self.first_column), (self.last_row, self.last_column), ndim)
+
+    def end(self, direction):
+        count('end')
+        cells = self.sheet.cells
+        if direction == 'up':
+            rows = [row for row, column in cells if column == self.first_column and row < self.first_row]
+            return Range(self.sheet, (max(rows or [1]), self.first_column))
+        if direction == 'left':
+            columns = [column for row, column in cells if row == self.first_row and column < self.first_column]
+            return Range(self.sheet, (self.first_row, max(columns or [1])))
+        raise ValueError("Unsupported direction '%s'" % direction)
+
+    @property
+    def value(self):
+        count('get_value')
+        cells = self.sheet.cells
+        columns = range(self.first_column, self.last_column + 1)
+        rows = [[cells.get((row, column)) for column in columns] for row in range(self.first_row, self.last_row + 1)]
+        if self.ndim == 2:
+            return rows
+        if len(rows) == 1:
+            return rows[0][0] if len(columns) == 1 else rows[0]
+        if len(columns) == 1:
+            return [row_values[0] for row_values in rows]
+        return rows
+
+    @value.setter
+    def value(self, value):
+        count('set_value')
+        if isinstance(value, (list, tuple)):
+            if value and not isinstance(value[0], (list, tuple)):
+                value = [value]
+            for row_offset, row_values in enumerate(value):
+                for col_offset, cell_value in enumerate(row_values):
+                    self.sheet.set(self.first_row + row_offset, self.first_column + col_offset, cell_value)
+        else:
+            for row in range(self.first_row, self.last_row + 1):
+                for column in range(self.first_column, self.last_column + 1):
+                    self.sheet.set(row, column, value)
+
+    @property
+    def number_format(self):
+        count('get_number_format')
+        return self.sheet.formats.get((self.first_row, self.first_column), 'General')
+
+    @number_format.setter
+    def number_format(self, value):
+        count('set_number_format')
+        for row in range(self.first_row, self.last_row + 1):
+            for column in range(self.first_column, self.last_column + 1):
+                self.sheet.formats[(row, column)] = value
+
+
+class Sheet(object):
+
+    def __init__(self, book, name):
+        self.book = book
+        self.name = name
+        self.cells = {}
+        self.formats = {}
+        #  Like Excel's, the used range only grows until the book is saved.
+        self.last_row = 1
+        self.last_column = 1
+
+    def set(self, row, column, value):
+        if value is None or value == '':
+            self.cells.pop((row, column), None)
+            return
+        self.cells[(row, column)] = _stored(value)
+        self.last_row = max(self.last_row, row)
+        self.last_column = max(self.last_column, column)
+
+    def range(self, first, last=None):
+        return Range(self, first, last)
+
+    @property
+    def used_range(self):
+        count('used_range')
+        return Range(self, (1, 1), (self.last_row, self.last_column))
+
+
+class Sheets(object):
+
+    def __init__(self, book):
+        self.book = book
+        self._sheets = []
+        self.active = None
+
+    def __iter__(self):
+        return iter(list(self._sheets))
+
+    def __len__(self):
+        return len(self._sheets)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._sheets[key]
+        for sheet in self._sheets:
+            if sheet.name.lower() == key.lower():
+                return sheet
+        raise KeyError(key)
+
+    def add(self, name=None):
+        count('add_sheet')
+        name = name or 'Sheet%d' % (len(self._sheets) + 1)
+        if name.lower() in [sheet.name.lower() for sheet in self._sheets]:
+            raise ValueError("A sheet named '%s' already exists" % name)
+        #  Excel puts a new sheet before the active one and activates it.
+        index = self._sheets.index(self.active) if self.active is not None else 0
+        sheet = Sheet(self.book, name)
+        self._sheets.insert(index, sheet)
+        self.active = sheet
+        return sheet
+
+
+class Book(object):
+
+    def __init__(self, app, name):
+        self.app = app
+        self.name = name
+        self.fullname = name
+        self.sheets = Sheets(self)
+        self.saved = []
+
+    def save(self, path=None):
+        count('save')
+        self.saved.append(path or self.fullname)
+
+    def close(self):
+        count('close')
+        self.app.books.remove(self)
+
+
+class Books(object):
+    """
+    The books of an App. open() returns a book registered with add_file, or a new book
+    with one empty sheet for an unknown path, and returns the same book when a path is
+    opened twice, as Excel does.
+    """
+
+    files = {}
+
+    def __init__(self, app):
+        self.app = app
+        self._books = []
+        self._created = 0
+
+    def __iter__(self):
+        return iter(list(self._books))
+
+    def open(self, fullname, **options):
+        count('open')
+        for book in self._books:
+            if book.fullname == fullname:
+                return book
+        book = Book(self.app, fullname)
+        for name, rows in self.files.get(fullname, [('Sheet1', [])]):
+            sheet = Sheet(book, name)
+            for row, row_values in enumerate(rows, 1):
+                for column, value in enumerate(row_values, 1):
+                    sheet.set(row, column, value)
+            book.sheets._sheets.append(sheet)
+        book.sheets.active = book.sheets[0]
+        self._books.append(book)
+        return book
+
+    def add(self):
+        count('add_book')
+        self._created += 1
+        book = Book(self.app, 'Book%d' % self._created)
+        book.sheets.add('Sheet1')
+        self._books.append(book)
+        return book
+
+    def remove(self, book):
+        if book in self._books:
+            self._books.remove(book)
+
+
+def add_file(fullname, sheets):
+    """
+    Makes Books.open return a book with the given sheets for fullname. sheets is a list
+    of (sheet name, list of rows) tuples.
+    """
+    Books.files[fullname] = list(sheets)
+
+
+class App(object):
+
+    def __init__(self, visible=None, add_book=True):
+        self.visible = visible
+        self.books = Books(self)
+        self.calculation = 'automatic'
+        self.screen_updating = True
+        self.enable_events = True
+        apps._apps.append(self)
+
+    def calculate(self):
+        count('calculate')
+
+    def quit(self):
+        if self in apps._apps:
+            apps._apps.remove(self)
+
+
+class Apps(object):
+
+    def __init__(self):
+        self._apps = []
+
+    @property
+    def count(self):
+        return len(self._apps)
+
+    @property
+    def active(self):
+        return self._apps[-1]
+
+
+apps = Apps()
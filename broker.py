@@ -0,0 +1,602 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Shared Excel for parallel test runs (pabot): a broker process owns a small pool of
+Excel apps and the workbooks opened in them, Excel10Library instances imported with
+broker=<address> use it over a local socket instead of starting Excel themselves.
+
+The address is the path of a Unix socket, or localhost:port for a TCP socket on systems
+without Unix sockets (Windows). A Unix socket can only be used by the user that started
+the broker. Any local user can connect to a TCP port, so the broker then writes a random
+token to a file only that user can read (see token_path) and a connection has to send
+it in its first message, {"token": "..."}, before anything else.
+
+A message is a 4 byte length followed by JSON. A request holds a list of calls that are
+run in order, the response the list of their results, or the results so far and the
+error of the call that failed:
+
+    {"calls": [["write_range", 1, ["Sheet1", 1, 1, [[1, 2]]]], ["read_cell", 1, ["Sheet1", "A1"]]]}
+    {"results": [null, 1.0]}
+
+A workbook is locked by the connection that opened (or saved) it: other connections
+get a WorkbookLocked error for that file until it is closed or the connection ends.
+"""
+
+import argparse
+import binascii
+import errno
+import hmac
+import importlib
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from select import select
+
+from backends import ExcelBackend, iter_row_chunks
+
+#  The backend methods a connection can call on a workbook it has open.
+METHODS = frozenset(['sheet_names', 'active_sheet_name', 'dimensions', 'invalidate', 'last_row_in_column',
+                     'last_column_in_row', 'read_cell', 'read_range', 'write_cell', 'write_range',
+                     'set_number_format', 'add_sheet', 'save', 'epoch'])
+
+LOCKED = 'WorkbookLocked'
+
+#  The only hosts a TCP broker listens on and clients connect to.
+LOOPBACK = ('localhost', '127.0.0.1')
+
+#  The largest message accepted from a connection that has not sent the token yet.
+HELLO_SIZE = 1024
+
+#  Seconds a response may take to be sent before the broker drops a client that stopped reading.
+SEND_TIMEOUT = 30
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'$datetime': value.strftime('%Y-%m-%dT%H:%M:%S.%f')}
+    if isinstance(value, date):
+        return {'$date': value.strftime('%Y-%m-%d')}
+    raise TypeError('%r cannot be sent to the broker' % (value,))
+
+
+def _decode(message):
+    if '$datetime' in message:
+        return datetime.strptime(message['$datetime'], '%Y-%m-%dT%H:%M:%S.%f')
+    if '$date' in message:
+        return datetime.strptime(message['$date'], '%Y-%m-%d').date()
+    return message
+
+
+def send_message(connection, message):
+    data = json.dumps(message, default=_encode, separators=(',', ':'))
+    connection.sendall(struct.pack('!I', len(data)) + data)
+
+
+def _receive(connection, size):
+    chunks = []
+    while size:
+        chunk = connection.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+
+def receive_message(connection):
+    """
+    Returns the next message, or None when the other side closed the connection.
+    """
+    header = _receive(connection, 4)
+    if header is None:
+        return None
+    data = _receive(connection, struct.unpack('!I', header)[0])
+    if data is None:
+        return None
+    return json.loads(data, object_hook=_decode)
+
+
+def _socket_address(address):
+    host, separator, port = address.rpartition(':')
+    if separator and port.isdigit():
+        host = host or 'localhost'
+        if host not in LOOPBACK:
+            raise ValueError("The Excel broker only listens on this machine, use localhost:%s instead of %s" % (port, address))
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+def token_path(address):
+    """
+    Returns the file holding the token of the TCP broker on address, or None for a Unix
+    socket. The temporary directory is per user on Windows, the file is only readable by
+    its owner elsewhere.
+    """
+    family, location = _socket_address(address)
+    if family != socket.AF_INET:
+        return None
+    return os.path.join(tempfile.gettempdir(), 'excel10broker-%d.token' % location[1])
+
+
+def _write_token(path):
+    token = binascii.hexlify(os.urandom(16))
+    if os.path.exists(path):
+        os.remove(path)
+    #  O_EXCL: never write through a file or link someone else put there.
+    handle = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0600)
+    try:
+        os.write(handle, token)
+    finally:
+        os.close(handle)
+    return token
+
+
+def connect(address):
+    family, location = _socket_address(address)
+    connection = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        connection.connect(location)
+    except socket.error:
+        connection.close()
+        raise
+    return connection
+
+
+class BrokerError(RuntimeError):
+    """
+    A call failed in the broker. kind is the name of the exception raised there.
+    """
+
+    def __init__(self, kind, message):
+        RuntimeError.__init__(self, message)
+        self.kind = kind
+
+
+class ExcelBroker(object):
+    """
+    Serves the workbooks of one pool of Excel apps to any number of connections, one
+    request at a time, so Excel is never called from two threads.
+
+    At most apps Excel apps are started, when they are needed; a workbook is opened in
+    the app with the fewest open workbooks. The broker stops when no connection has been
+    open for idle seconds, or on a shutdown call, and then quits the apps it started.
+    """
+
+    def __init__(self, address, apps=2, xlwings=None, idle=60):
+        self.address = address
+        self.size = max(int(apps), 1)
+        self.xw = xlwings
+        self.idle = float(idle)
+        self.apps = []
+        self.workbooks = {}
+        self.locks = {}
+        self.handles = 0
+        self.clients = {}
+        self.buffers = {}
+        self.unverified = set()
+        self.token = None
+        self.listener = None
+        self.running = False
+
+    def _bind(self):
+        family, location = _socket_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(location):
+            try:
+                connect(self.address).close()
+            except socket.error:
+                #  Left behind by a broker that did not stop cleanly.
+                os.remove(location)
+            else:
+                return False
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        #  Only the user running the tests may use the workbooks.
+        umask = os.umask(0077)
+        try:
+            listener.bind(location)
+        except socket.error, error:
+            listener.close()
+            if error.errno == errno.EADDRINUSE:
+                return False
+            raise
+        finally:
+            os.umask(umask)
+        if family == socket.AF_INET:
+            #  Written before listening, so a client that gets connected finds it.
+            self.token = _write_token(token_path(self.address))
+        listener.listen(64)
+        self.listener = listener
+        return True
+
+    def serve_forever(self):
+        """
+        Serves until idle or shut down. Returns False without serving when another
+        broker is already listening on the address.
+        """
+        if not self._bind():
+            return False
+        self.running = True
+        last_seen = time.time()
+        try:
+            while self.running:
+                readable = select([self.listener] + list(self.clients), [], [], 1.0)[0]
+                for connection in readable:
+                    if connection is self.listener:
+                        client, _ = self.listener.accept()
+                        #  Only sends can block: recv is called once per select that found data.
+                        client.settimeout(SEND_TIMEOUT)
+                        self.clients[client] = id(client)
+                        self.buffers[client] = bytearray()
+                        if self.token is not None:
+                            self.unverified.add(client)
+                    else:
+                        self._serve(connection)
+                if self.clients:
+                    last_seen = time.time()
+                elif time.time() - last_seen > self.idle:
+                    break
+        finally:
+            self.stop()
+        return True
+
+    def _serve(self, connection):
+        """
+        Reads what a client has sent and answers the requests that are complete, so a
+        client that stops halfway through a message does not hold up the others.
+        """
+        try:
+            data = connection.recv(1 << 20)
+        except socket.error:
+            data = ''
+        if not data:
+            self._disconnect(connection)
+            return
+        self.buffers[connection] += data
+        while connection in self.clients:
+            request = self._next_request(connection)
+            if request is None:
+                return
+            unverified = connection in self.unverified
+            if unverified and not self._verify(request):
+                self._disconnect(connection)
+                return
+            try:
+                if unverified:
+                    self.unverified.discard(connection)
+                    send_message(connection, {'results': []})
+                else:
+                    send_message(connection, self.handle(self.clients[connection], request.get('calls', [])))
+            except socket.error:
+                self._disconnect(connection)
+
+    def _next_request(self, connection):
+        buffer = self.buffers[connection]
+        if len(buffer) < 4:
+            return None
+        size = struct.unpack('!I', str(buffer[:4]))[0]
+        if connection in self.unverified and size > HELLO_SIZE:
+            self._disconnect(connection)
+            return None
+        if len(buffer) < 4 + size:
+            return None
+        data = str(buffer[4:4 + size])
+        del buffer[:4 + size]
+        try:
+            return json.loads(data, object_hook=_decode)
+        except ValueError:
+            self._disconnect(connection)
+            return None
+
+    def _verify(self, request):
+        token = request.get('token') if isinstance(request, dict) else None
+        return isinstance(token, basestring) and hmac.compare_digest(str(token), self.token)
+
+    def _disconnect(self, connection):
+        self.unverified.discard(connection)
+        self.buffers.pop(connection, None)
+        client = self.clients.pop(connection, None)
+        connection.close()
+        if client is not None:
+            self.release(client)
+
+    def handle(self, client, calls):
+        """
+        Runs the calls of one request for a client and returns the response.
+        """
+        results = []
+        for name, handle, args in calls:
+            try:
+                results.append(self._call(client, name, handle, args))
+            except Exception, error:
+                kind = error.kind if isinstance(error, BrokerError) else type(error).__name__
+                return {'results': results, 'error': [kind, unicode(error)]}
+        return {'results': results}
+
+    def _call(self, client, name, handle, args):
+        if name == 'open':
+            return self.open(client, *args)
+        if name == 'create':
+            return self.create(client)
+        if name == 'close':
+            return self.close(client, handle)
+        if name == 'shutdown':
+            self.running = False
+            return None
+        if name == 'ping':
+            return len(self.workbooks)
+        if name not in METHODS:
+            raise ValueError("Unknown broker call '%s'" % name)
+        backend = self._backend(client, handle)
+        if name == 'read_cell' and isinstance(args[1], list):
+            args = [args[0], tuple(args[1])]
+        if name == 'save':
+            self.workbooks[handle]['keys'].add(self._lock(client, args[0]))
+        return getattr(backend, name)(*args)
+
+    def _app(self):
+        if self.xw is None:
+            import xlwings
+            self.xw = xlwings
+        if len(self.apps) < self.size:
+            self.apps.append(self.xw.App(False))
+        #  The app with the fewest open workbooks.
+        load = dict((id(app), 0) for app in self.apps)
+        for workbook in self.workbooks.values():
+            load[id(workbook['app'])] += 1
+        return min(self.apps, key=lambda app: load[id(app)])
+
+    def _key(self, path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _lock(self, client, path):
+        key = self._key(path)
+        owner = self.locks.get(key)
+        if owner is not None and owner != client:
+            raise BrokerError(LOCKED, "Workbook %s is in use by another test" % path)
+        self.locks[key] = client
+        return key
+
+    def _add(self, client, app, book, key):
+        self.handles += 1
+        self.workbooks[self.handles] = {'client': client, 'app': app, 'backend': ExcelBackend(book), 'keys': set([key] if key else [])}
+        return self.handles
+
+    def _backend(self, client, handle):
+        workbook = self.workbooks.get(handle)
+        if workbook is None or workbook['client'] != client:
+            raise ValueError("No open workbook %s for this connection" % handle)
+        return workbook['backend']
+
+    def open(self, client, path, options=None):
+        key = self._lock(client, path)
+        app = self._app()
+        try:
+            book = app.books.open(path, **dict((str(name), value) for name, value in (options or {}).items()))
+        except Exception:
+            self._unlock(client, key)
+            raise
+        return self._add(client, app, book, key)
+
+    def create(self, client):
+        app = self._app()
+        book = app.books.add()
+        return [self._add(client, app, book, None), book.name]
+
+    def close(self, client, handle):
+        self._backend(client, handle)
+        workbook = self.workbooks.pop(handle)
+        try:
+            workbook['backend'].close()
+        finally:
+            for key in workbook['keys']:
+                self._unlock(client, key)
+
+    def _unlock(self, client, key):
+        #  A file stays locked while the client has another workbook open on it.
+        for workbook in self.workbooks.values():
+            if workbook['client'] == client and key in workbook['keys']:
+                return
+        if self.locks.get(key) == client:
+            del self.locks[key]
+
+    def release(self, client):
+        """
+        Closes the workbooks of a client without saving them and unlocks their files.
+        """
+        for handle, workbook in sorted(self.workbooks.items()):
+            if workbook['client'] == client:
+                try:
+                    self.close(client, handle)
+                except Exception:
+                    pass
+        for key, owner in list(self.locks.items()):
+            if owner == client:
+                del self.locks[key]
+
+    def stop(self):
+        for connection in list(self.clients):
+            self._disconnect(connection)
+        for app in self.apps:
+            try:
+                app.quit()
+            except Exception:
+                pass
+        self.apps = []
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            family, location = _socket_address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(location):
+                os.remove(location)
+            if self.token is not None and os.path.exists(token_path(self.address)):
+                os.remove(token_path(self.address))
+                self.token = None
+
+
+class BrokerClient(object):
+    """
+    One connection to a broker. When nothing listens on the address and start is true,
+    a broker process is started and waited for; it uses the xlwings module given, e.g.
+    fakexlwings, when that is not xlwings itself.
+    """
+
+    def __init__(self, address, apps=2, start=True, timeout=30, xlwings=None):
+        self.address = address
+        try:
+            self.connection = connect(address)
+        except socket.error:
+            if not start:
+                raise
+            self.connection = self._start(apps, timeout, xlwings)
+        self._hello()
+
+    def _hello(self):
+        path = token_path(self.address)
+        if path is None:
+            return
+        with open(path, 'rb') as source:
+            token = source.read().strip()
+        send_message(self.connection, {'token': token})
+        if receive_message(self.connection) is None:
+            self.connection.close()
+            raise RuntimeError("The Excel broker on %s refused the token in %s" % (self.address, path))
+
+    def _start(self, apps, timeout, xlwings=None):
+        script = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+        command = [sys.executable, script, '--apps', str(apps), self.address]
+        env = None
+        if xlwings is not None and xlwings.__name__ != 'xlwings':
+            command[2:2] = ['--xlwings', xlwings.__name__]
+            env = dict(os.environ)
+            paths = [os.path.dirname(os.path.abspath(xlwings.__file__))]
+            if env.get('PYTHONPATH'):
+                paths.append(env['PYTHONPATH'])
+            env['PYTHONPATH'] = os.pathsep.join(paths)
+        with open(os.devnull, 'w') as devnull:
+            #  Several pabot workers may get here at once, the brokers that cannot bind exit right away.
+            subprocess.Popen(command, env=env, stdin=devnull, stdout=devnull, stderr=devnull, close_fds=os.name != 'nt')
+        deadline = time.time() + timeout
+        while True:
+            try:
+                return connect(self.address)
+            except socket.error:
+                if time.time() > deadline:
+                    raise RuntimeError("No Excel broker listening on %s after %d seconds" % (self.address, timeout))
+                time.sleep(0.1)
+
+    def request(self, calls):
+        """
+        Sends a list of (name, handle, args) calls in one message and returns their results.
+        """
+        send_message(self.connection, {'calls': calls})
+        response = receive_message(self.connection)
+        if response is None:
+            raise RuntimeError("The Excel broker on %s closed the connection" % self.address)
+        if 'error' in response:
+            raise BrokerError(*response['error'])
+        return response['results']
+
+    def close(self):
+        self.connection.close()
+
+
+class BrokerBackend(object):
+    """
+    The backend of a workbook that is open in a broker.
+
+    Changes are not sent one by one: they are queued and go to the broker in the same
+    message as the next read, save or close, so a series of Put ... To Cell keywords
+    costs one round trip. An error of a queued change is reported by that next call.
+    """
+
+    name = 'excel'
+
+    #  Calls without a result that can wait for the next message.
+    QUEUED = frozenset(['write_cell', 'write_range', 'set_number_format', 'add_sheet', 'invalidate'])
+
+    def __init__(self, client, handle):
+        self.client = client
+        self.handle = handle
+        self._queued = []
+
+    @classmethod
+    def open(cls, client, path, timeout=60, **options):
+        """
+        Opens a workbook in the broker, waiting at most timeout seconds while another
+        test has the file open.
+        """
+        deadline = time.time() + float(timeout)
+        while True:
+            try:
+                return cls(client, client.request([('open', None, [path, options])])[0])
+            except BrokerError, error:
+                if error.kind != LOCKED or time.time() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    @classmethod
+    def create(cls, client):
+        """
+        Returns (backend, name) of a new workbook.
+        """
+        handle, name = client.request([('create', None, [])])[0]
+        return cls(client, handle), name
+
+    def _call(self, name, *args):
+        calls, self._queued = self._queued, []
+        calls.append((name, self.handle, list(args)))
+        return self.client.request(calls)[-1]
+
+    def __getattr__(self, name):
+        if name in self.QUEUED:
+            return lambda *args: self._queued.append((name, self.handle, list(args)))
+        if name in METHODS:
+            return lambda *args: self._call(name, *args)
+        raise AttributeError(name)
+
+    def dimensions(self, sheetname):
+        return tuple(self._call('dimensions', sheetname))
+
+    def iter_rows(self, sheetname, chunk_size):
+        return iter_row_chunks(self, sheetname, chunk_size)
+
+    def close(self):
+        self._call('close')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Shares a pool of Excel apps with the Excel10Library instances of parallel test runs.')
+    parser.add_argument('address', help='path of the Unix socket, or localhost:port')
+    parser.add_argument('--apps', type=int, default=2, help='the largest number of Excel apps started')
+    parser.add_argument('--idle', type=float, default=60, help='seconds without connections after which the broker stops')
+    parser.add_argument('--xlwings', default='xlwings', help='module used instead of xlwings, e.g. fakexlwings')
+    options = parser.parse_args(argv)
+    xlwings = importlib.import_module(options.xlwings) if options.xlwings != 'xlwings' else None
+    ExcelBroker(options.address, options.apps, xlwings, options.idle).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Read-through cache of cell values for the Enable Cell Cache keyword.
+"""
+
+from collections import OrderedDict
+
+from cellref import split_address
+
+
+class CellCache(object):
+    """
+    Wraps a backend and keeps the values of recently read cells in memory.
+
+    A sheet is cached in blocks of block_rows x block_columns cells. The first read of a
+    cell loads its whole block with one read_range call, later reads of cells in that
+    block are served from memory. At most max_blocks blocks are kept, the least recently
+    used block is dropped first.
+    """
+
+    def __init__(self, backend, max_blocks=256, block_rows=64, block_columns=16):
+        self.backend = backend
+        self.max_blocks = int(max_blocks)
+        self.block_rows = int(block_rows)
+        self.block_columns = int(block_columns)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._blocks = OrderedDict()
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def statistics(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'blocks': len(self._blocks), 'max_blocks': self.max_blocks}
+
+    def read_cell(self, sheetname, cell):
+        if isinstance(cell, tuple):
+            row, column = cell
+        else:
+            try:
+                row, column = split_address(cell)
+            except ValueError:
+                #  Ranges and defined names are not cached.
+                return self.backend.read_cell(sheetname, cell)
+        block_row, row_offset = divmod(row - 1, self.block_rows)
+        block_column, col_offset = divmod(column - 1, self.block_columns)
+        key = (sheetname, block_row, block_column)
+        block = self._blocks.pop(key, None)
+        if block is None:
+            self.misses += 1
+            first_row = block_row * self.block_rows + 1
+            first_column = block_column * self.block_columns + 1
+            block = self.backend.read_range(sheetname, first_row, first_column,
+                                            first_row + self.block_rows - 1,
+                                            first_column + self.block_columns - 1)
+            while len(self._blocks) >= self.max_blocks:
+                self._blocks.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+        self._blocks[key] = block
+        return block[row_offset][col_offset]
+
+    def write_cell(self, sheetname, row, column, value):
+        self.backend.write_cell(sheetname, row, column, value)
+        self.invalidate(sheetname)
+
+    def write_range(self, sheetname, first_row, first_column, rows):
+        self.backend.write_range(sheetname, first_row, first_column, rows)
+        self.invalidate(sheetname)
+
+    def invalidate(self, sheetname=None):
+        #  Formulas on any sheet can depend on the changed cells, so nothing cached is trusted anymore.
+        self._blocks.clear()
+        self.backend.invalidate(sheetname)
+
+    def close(self):
+        self._blocks.clear()
+        self.backend.close()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Helpers to convert between A1 style cell references and 1 based
+row/column numbers without asking Excel.
+"""
+
+import re
+
+MAX_ROWS = 1048576
+MAX_COLUMNS = 16384
+
+_CELL_RE = re.compile(r'^\$?([A-Za-z]{1,3})\$?(\d+)$')
+
+_letters = {}
+
+
+def column_letter(column):
+    """
+    Returns the column letters for a 1 based column number (1 -> A, 28 -> AB).
+    """
+    column = int(column)
+    letters = _letters.get(column)
+    if letters is None:
+        remaining = column
+        letters = ''
+        while remaining > 0:
+            remaining, rest = divmod(remaining - 1, 26)
+            letters = chr(65 + rest) + letters
+        _letters[column] = letters
+    return letters
+
+
+def column_number(letters):
+    """
+    Returns the 1 based column number for column letters (A -> 1, AB -> 28).
+    """
+    number = 0
+    for char in letters.upper():
+        number = number * 26 + ord(char) - 64
+    return number
+
+
+def cell_address(row, column):
+    """
+    Returns the A1 style address of a 1 based row and column, without dollar signs.
+    """
+    return column_letter(column) + str(row)
+
+
+def split_address(address):
+    """
+    Returns the 1 based (row, column) tuple of an A1 style cell address.
+    Dollar signs are allowed, ranges are not.
+    """
+    match = _CELL_RE.match(address.strip())
+    if match is None:
+        raise ValueError("'%s' is not a single cell address" % address)
+    return int(match.group(2)), column_number(match.group(1))
+
+
+def split_range(reference):
+    """
+    Returns the 1 based (first_row, first_column, last_row, last_column) tuple of an A1
+    style range such as A1:C10. A single cell address is a range of one cell.
+    """
+    first, _, last = reference.partition(':')
+    first_row, first_column = split_address(first)
+    last_row, last_column = split_address(last) if last else (first_row, first_column)
+    return (min(first_row, last_row), min(first_column, last_column),
+            max(first_row, last_row), max(first_column, last_column))
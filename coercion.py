@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Conversion of keyword arguments, which Robot Framework passes as text, to cell values.
+"""
+
+import re
+from datetime import date, datetime
+
+
+def coerce_value(value):
+    """
+    Returns the value Put Value To Cell writes for a text: whole numbers become int,
+    numbers with one decimal point float, everything else is left as it is.
+    """
+    if value.isdigit():
+        return int(value)
+    if value.replace('.', '', 1).isdigit():
+        return float(value)
+    return value
+
+
+def stored_value(value):
+    """
+    Returns a written value the way Excel stores it and reads it back: numbers as float,
+    text as unicode without the leading apostrophe that marks a number as text, dates as
+    datetime and None for an empty text.
+    """
+    if value is None or isinstance(value, (bool, float, datetime)):
+        return value
+    if isinstance(value, (int, long)):
+        return float(value)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, basestring):
+        if not isinstance(value, unicode):
+            value = value.decode('utf-8')
+        if value.startswith(u"'"):
+            value = value[1:]
+        return value or None
+    return value
+
+
+#  strptime directives the fast date parser understands, with their regular expression.
+_DIRECTIVES = {
+    'd': r'(?P<day>\d{1,2})',
+    'm': r'(?P<month>\d{1,2})',
+    'Y': r'(?P<year>\d{4})',
+    'y': r'(?P<short_year>\d{2})',
+    'H': r'(?P<hour>\d{1,2})',
+    'M': r'(?P<minute>\d{1,2})',
+    'S': r'(?P<second>\d{1,2})',
+}
+#  Separators that may be used for one another, so 12.3.1999 is read with %d-%m-%Y.
+_SEPARATORS = '-./'
+
+#  Excel number formats for the strftime directives, used for the cells dates are written to.
+_NUMBER_FORMATS = {'d': 'dd', 'm': 'mm', 'Y': 'yyyy', 'y': 'yy', 'H': 'hh', 'M': 'mm', 'S': 'ss',
+                   'b': 'mmm', 'B': 'mmmm', 'p': 'AM/PM'}
+
+_parsers = {}
+
+
+class DateParser(object):
+    """
+    Parses dates in one strptime format. Formats made of %d, %m, %Y, %y, %H, %M, %S and
+    separators are parsed with one regular expression, other formats with strptime.
+    """
+
+    def __init__(self, informat):
+        self.informat = informat
+        self._regex = self._compile(informat)
+
+    def _compile(self, informat):
+        parts = []
+        index = 0
+        while index < len(informat):
+            char = informat[index]
+            if char == '%':
+                directive = informat[index + 1:index + 2]
+                if directive not in _DIRECTIVES:
+                    return None
+                parts.append(_DIRECTIVES[directive])
+                index += 2
+                continue
+            parts.append('[%s]' % re.escape(_SEPARATORS) if char in _SEPARATORS else re.escape(char))
+            index += 1
+        try:
+            return re.compile('^%s$' % ''.join(parts))
+        except re.error:
+            #  A directive used twice, strptime reports that better.
+            return None
+
+    def parse(self, value):
+        if self._regex is None:
+            return datetime.strptime(value, self.informat)
+        match = self._regex.match(value.strip())
+        if match is None:
+            raise ValueError("Date '%s' does not match format '%s'" % (value, self.informat))
+        fields = match.groupdict()
+        year = int(fields['year']) if fields.get('year') else 1900
+        if fields.get('short_year'):
+            #  Like strptime: 69-99 are 1969-1999, 00-68 are 2000-2068.
+            year = int(fields['short_year'])
+            year += 1900 if year >= 69 else 2000
+        return datetime(year, int(fields.get('month') or 1), int(fields.get('day') or 1),
+                        int(fields.get('hour') or 0), int(fields.get('minute') or 0), int(fields.get('second') or 0))
+
+
+def date_parser(informat):
+    """
+    Returns the DateParser for a format, made once per format.
+    """
+    parser = _parsers.get(informat)
+    if parser is None:
+        parser = _parsers[informat] = DateParser(informat)
+    return parser
+
+
+def number_format(informat):
+    """
+    Returns the Excel number format that shows dates the way informat reads them.
+    """
+    parts = []
+    index = 0
+    while index < len(informat):
+        if informat[index] == '%' and index + 1 < len(informat):
+            parts.append(_NUMBER_FORMATS.get(informat[index + 1], ''))
+            index += 2
+        else:
+            parts.append(informat[index])
+            index += 1
+    return ''.join(parts)
+
+
+def _string(value):
+    #  Like Put String To Cell: text that looks like a number is kept as text.
+    if value.replace('.', '', 1).isdigit():
+        return "'" + value
+    return value
+
+
+def coerce_values(rows, type='value', informat='%d-%m-%Y'):
+    """
+    Converts a list of rows of texts in one pass. type is value (like Put Value To Cell),
+    number, string (like Put String To Cell) or date (parsed with informat into
+    datetimes). Empty texts and None become None.
+    """
+    if type == 'value':
+        convert = coerce_value
+    elif type == 'number':
+        convert = float
+    elif type == 'string':
+        convert = _string
+    elif type == 'date':
+        convert = date_parser(informat).parse
+    else:
+        raise ValueError("Unknown type '%s', use value, number, string or date" % type)
+    converted = []
+    for row_values in rows:
+        converted.append([None if value is None or value == '' else
+                          (value if not isinstance(value, basestring) else convert(value))
+                          for value in row_values])
+    return converted
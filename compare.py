@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Cell by cell comparison of two blocks of values for the Compare Sheets and Compare
+Ranges keywords.
+"""
+
+from datetime import date, datetime, timedelta
+from numbers import Number
+
+from cellref import cell_address, column_number
+from xlsxstream import to_serial
+
+_EPOCH = datetime(1899, 12, 30)
+
+
+def normalise(value):
+    """
+    Returns the value in the form it is compared in: empty strings become None, dates
+    become datetimes at midnight and datetimes are rounded to the millisecond, which is
+    what Excel stores.
+    """
+    if value == '':
+        return None
+    if isinstance(value, datetime):
+        microseconds = int(round(value.microsecond, -3))
+        return value.replace(microsecond=0) + timedelta(microseconds=microseconds)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def _is_number(value):
+    return isinstance(value, Number) and not isinstance(value, bool)
+
+
+def values_equal(left, right, tolerance=0, left_epoch=_EPOCH, right_epoch=_EPOCH):
+    """
+    Compares two normalised values. Numbers are equal when they differ by no more than
+    tolerance, a datetime equals a number that is its Excel serial number in the date
+    system of the number's workbook, given by the epochs of the two workbooks.
+    """
+    if left == right:
+        return True
+    if isinstance(left, datetime) and _is_number(right):
+        left = to_serial(left, right_epoch)
+    elif isinstance(right, datetime) and _is_number(left):
+        right = to_serial(right, left_epoch)
+    if _is_number(left) and _is_number(right):
+        return abs(left - right) <= tolerance
+    return False
+
+
+def ignored_columns(columns):
+    """
+    Returns the set of 1 based column numbers for a comma separated string or a list of
+    column letters or numbers.
+    """
+    if not columns:
+        return set()
+    if isinstance(columns, basestring):
+        columns = columns.split(',')
+    numbers = set()
+    for column in columns:
+        column = str(column).strip()
+        numbers.add(int(column) if column.isdigit() else column_number(column))
+    return numbers
+
+
+def compare_blocks(left, right, first_row=1, first_column=1, tolerance=0, ignore=(), max_differences=100,
+                   epochs=(_EPOCH, _EPOCH)):
+    """
+    Compares two lists of rows and returns (count, differences). count is the number of
+    differing cells, differences the (address, left value, right value) tuples of the
+    first max_differences of them in row order. Addresses count from first_row and
+    first_column, the position of the left block; ignore holds the column numbers
+    (in that numbering) that are skipped. Blocks of different sizes are padded with None.
+    epochs are the datetimes of serial number 0 in the workbooks of the left and right
+    block, see values_equal.
+    """
+    left_epoch, right_epoch = epochs
+    tolerance = float(tolerance)
+    height = max(len(left), len(right))
+    width = max([len(row_values) for row_values in left + right] or [0])
+    padding = [None] * width
+    compared = [offset for offset in range(width) if first_column + offset not in ignore]
+    count = 0
+    differences = []
+    for row_offset in range(height):
+        left_values = left[row_offset] if row_offset < len(left) else padding
+        right_values = right[row_offset] if row_offset < len(right) else padding
+        if left_values == right_values:
+            #  Most rows of a comparison are identical, one list comparison settles them.
+            continue
+        left_values = list(left_values) + [None] * (width - len(left_values))
+        right_values = list(right_values) + [None] * (width - len(right_values))
+        for col_offset in compared:
+            left_value = normalise(left_values[col_offset])
+            right_value = normalise(right_values[col_offset])
+            if not values_equal(left_value, right_value, tolerance, left_epoch, right_epoch):
+                count += 1
+                if len(differences) < max_differences:
+                    differences.append((cell_address(first_row + row_offset, first_column + col_offset),
+                                        left_values[col_offset], right_values[col_offset]))
+    return count, differences
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Streaming between CSV files and lists of rows for the Import CSV To Sheet and Export
+Sheet To CSV keywords.
+"""
+
+import codecs
+import csv
+from datetime import datetime
+
+from coercion import coerce_value
+
+_ASCII = ''.join(chr(code) for code in range(128))
+
+
+def _codec(encoding):
+    """
+    Returns the codec name for encoding and whether files start with a UTF-8 byte order
+    mark. The csv module splits bytes, so an encoding has to write ASCII characters as
+    themselves: utf-16 and the like raise ValueError.
+    """
+    name = codecs.lookup(encoding).name
+    if name == 'utf-8-sig':
+        return 'utf-8', True
+    try:
+        ascii_compatible = _ASCII.decode('ascii').encode(name) == _ASCII
+    except UnicodeError:
+        ascii_compatible = False
+    if not ascii_compatible:
+        raise ValueError("CSV files in %s are not supported, use an encoding like utf-8 or cp1252" % encoding)
+    return name, False
+
+
+def read_csv_chunks(filename, chunk_size, delimiter=',', encoding='utf-8'):
+    """
+    Yields the rows of a CSV file in lists of at most chunk_size rows. The fields are
+    decoded and converted like Put Value To Cell does, and the rows of a chunk are
+    padded with None to the same length so a chunk can be written as one range. A UTF-8
+    byte order mark at the start of the file is skipped.
+    """
+    encoding = _codec(encoding)[0]
+    chunk = []
+    with open(filename, 'rb') as source:
+        if encoding != 'utf-8' or source.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+            source.seek(0)
+        for fields in csv.reader(source, delimiter=str(delimiter)):
+            chunk.append([coerce_value(field.decode(encoding)) for field in fields])
+            if len(chunk) == chunk_size:
+                yield _padded(chunk)
+                chunk = []
+    if chunk:
+        yield _padded(chunk)
+
+
+def _padded(rows):
+    width = max(len(row_values) for row_values in rows)
+    for row_values in rows:
+        row_values.extend([None] * (width - len(row_values)))
+    return rows
+
+
+def csv_text(value):
+    """
+    Returns the text written to a CSV file for a cell value, like Excel writes it:
+    whole numbers without fraction, TRUE/FALSE, dates without a time of midnight.
+    """
+    if value is None:
+        return u''
+    if isinstance(value, bool):
+        return u'TRUE' if value else u'FALSE'
+    if isinstance(value, float):
+        return unicode(int(value)) if value.is_integer() else repr(value).decode('ascii')
+    if isinstance(value, datetime):
+        if value.time() == datetime.min.time():
+            return unicode(value.date().isoformat())
+        return unicode(value.isoformat(' '))
+    if isinstance(value, unicode):
+        return value
+    if isinstance(value, str):
+        return value.decode('utf-8')
+    return unicode(value)
+
+
+def write_csv(filename, chunks, delimiter=',', encoding='utf-8'):
+    """
+    Writes lists of rows to a CSV file one chunk at a time and returns the number of rows.
+    The file starts with a byte order mark for encoding utf-8-sig.
+    """
+    encoding, byte_order_mark = _codec(encoding)
+    count = 0
+    with open(filename, 'wb') as target:
+        if byte_order_mark:
+            target.write(codecs.BOM_UTF8)
+        writer = csv.writer(target, delimiter=str(delimiter), lineterminator='\r\n')
+        for rows in chunks:
+            writer.writerows([[csv_text(value).encode(encoding) for value in row_values] for row_values in rows])
+            count += len(rows)
+    return count
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Reads all sheets of one or more xlsx files in parallel worker processes.
+"""
+
+from collections import OrderedDict
+from multiprocessing import Pool, cpu_count
+
+from backends import XlsxBackend
+from xlsxreader import XlsxReader
+
+
+def read_sheet(task):
+    """
+    Returns the used area of one sheet as a list of rows. task is a (filename, sheetname)
+    tuple, the function runs in a worker process so it opens the file itself.
+    """
+    filename, sheetname = task
+    backend = XlsxBackend(filename)
+    try:
+        last_row, last_column = backend.dimensions(sheetname)
+        return backend.read_range(sheetname, 1, 1, last_row, last_column)
+    finally:
+        backend.close()
+
+
+def _tasks(filenames, sheetnames):
+    tasks = []
+    for filename in filenames:
+        reader = XlsxReader(filename)
+        try:
+            if sheetnames:
+                names = [reader.sheet_name(sheetname) for sheetname in sheetnames]
+            else:
+                names = reader.sheet_names()
+        finally:
+            reader.close()
+        tasks.extend((filename, sheetname) for sheetname in names)
+    return tasks
+
+
+def extract_sheets(filenames, sheetnames=None, workers=None):
+    """
+    Reads the given sheets (default: all sheets) of every file and returns an
+    OrderedDict of filename to an OrderedDict of sheet name to its list of rows.
+
+    One sheet is one task for a pool of worker processes (default: one per CPU). The
+    result keeps the order of the files and of the sheets, whatever the finishing order.
+    """
+    tasks = _tasks(filenames, sheetnames)
+    workers = int(workers or cpu_count())
+    if workers <= 1 or len(tasks) <= 1:
+        results = [read_sheet(task) for task in tasks]
+    else:
+        pool = Pool(min(workers, len(tasks)))
+        try:
+            results = pool.map(read_sheet, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    extracted = OrderedDict((filename, OrderedDict()) for filename in filenames)
+    for (filename, sheetname), rows in zip(tasks, results):
+        extracted[filename][sheetname] = rows
+    return extracted
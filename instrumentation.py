@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Counters and timers behind the Get Excel Performance Stats keyword.
+
+CountingBackend sits directly around the backend of every workbook and counts the
+calls that reach it and the cells they move. StatsListener is a Robot Framework
+listener that times the library's keywords, SummaryListener adds a summary table to
+the suite metadata when a suite ends.
+"""
+
+import cProfile
+import os
+import pstats
+import time
+from collections import OrderedDict
+from StringIO import StringIO
+
+try:
+    from robot.api import logger
+except ImportError:
+    logger = None
+
+#  Upper bounds in seconds of the keyword duration histogram, the last bucket is open.
+BUCKETS = (0.001, 0.01, 0.1, 1.0, 10.0)
+BUCKET_NAMES = ('<1ms', '<10ms', '<100ms', '<1s', '<10s', '>=10s')
+
+_READS = ('read_cell', 'read_range')
+_WRITES = ('write_cell', 'write_range')
+
+
+def _cells(rows):
+    return sum(len(row_values) for row_values in rows)
+
+
+class CountingBackend(object):
+    """
+    Wraps a backend and counts every method call and the number of cells read and written.
+    """
+
+    def __init__(self, backend, stats):
+        self.backend = backend
+        self.stats = stats
+
+    def __getattr__(self, name):
+        attribute = getattr(self.backend, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+        stats = self.stats
+        if name == 'iter_rows':
+            def counted(*args):
+                for rows in attribute(*args):
+                    #  Every chunk is a separate read from the workbook.
+                    stats.count(name, read=_cells(rows))
+                    yield rows
+        elif name == 'read_range':
+            def counted(*args):
+                rows = attribute(*args)
+                stats.count(name, read=_cells(rows))
+                return rows
+        elif name == 'write_range':
+            def counted(*args):
+                stats.count(name, written=_cells(args[-1]))
+                return attribute(*args)
+        else:
+            def counted(*args):
+                stats.count(name, read=int(name == 'read_cell'), written=int(name == 'write_cell'))
+                return attribute(*args)
+        return counted
+
+
+class PerformanceStats(object):
+    """
+    Backend call counts, cells moved and per keyword timings.
+    """
+
+    def __init__(self):
+        self.profile = set()
+        self.profile_dir = None
+        self.reset()
+
+    def reset(self):
+        self.backend_calls = {}
+        self.cells_read = 0
+        self.cells_written = 0
+        self.keywords = OrderedDict()
+        self._running = []
+
+    def count(self, method, read=0, written=0):
+        self.backend_calls[method] = self.backend_calls.get(method, 0) + 1
+        self.cells_read += read
+        self.cells_written += written
+
+    def _totals(self):
+        return sum(self.backend_calls.values()), self.cells_read + self.cells_written
+
+    def start_keyword(self, name):
+        profiler = None
+        if normalize_name(name) in self.profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        self._running.append((name, time.time(), self._totals(), profiler))
+
+    def end_keyword(self):
+        name, start, (calls, cells), profiler = self._running.pop()
+        elapsed = time.time() - start
+        if profiler is not None:
+            profiler.disable()
+            self._report_profile(name, profiler)
+        end_calls, end_cells = self._totals()
+        record = self.keywords.get(name)
+        if record is None:
+            record = self.keywords[name] = {'calls': 0, 'total': 0.0, 'min': None, 'max': 0.0,
+                                            'backend_calls': 0, 'cells': 0,
+                                            'histogram': OrderedDict((bucket, 0) for bucket in BUCKET_NAMES)}
+        record['calls'] += 1
+        record['total'] += elapsed
+        record['min'] = elapsed if record['min'] is None else min(record['min'], elapsed)
+        record['max'] = max(record['max'], elapsed)
+        record['backend_calls'] += end_calls - calls
+        record['cells'] += end_cells - cells
+        bucket = len([bound for bound in BUCKETS if elapsed >= bound])
+        record['histogram'][BUCKET_NAMES[bucket]] += 1
+
+    def _report_profile(self, name, profiler):
+        output = StringIO()
+        statistics = pstats.Stats(profiler, stream=output)
+        statistics.sort_stats('cumulative').print_stats(20)
+        _log('Profile of %s:\n%s' % (name, output.getvalue()))
+        if self.profile_dir:
+            filename = '%s-%d.prof' % (name.replace(' ', '_'), int(time.time() * 1000))
+            statistics.dump_stats(os.path.join(self.profile_dir, filename))
+
+    def as_dict(self):
+        keywords = OrderedDict()
+        for name, record in self.keywords.items():
+            record = dict(record)
+            record['mean'] = record['total'] / record['calls']
+            keywords[name] = record
+        return {'backend_calls': dict(self.backend_calls), 'cells_read': self.cells_read,
+                'cells_written': self.cells_written, 'keywords': keywords}
+
+    def summary(self):
+        """
+        Returns a table of the keywords by total time, slowest first, in the table syntax
+        of Robot Framework documentation.
+        """
+        lines = ['| *Keyword* | *Calls* | *Total s* | *Mean ms* | *Max ms* | *Backend calls* | *Cells* |']
+        for name, record in sorted(self.keywords.items(), key=lambda item: -item[1]['total']):
+            lines.append('| %s | %d | %.3f | %.2f | %.2f | %d | %d |' % (
+                name, record['calls'], record['total'], record['total'] / record['calls'] * 1000,
+                record['max'] * 1000, record['backend_calls'], record['cells']))
+        calls = ', '.join('%s=%d' % item for item in sorted(self.backend_calls.items()))
+        lines.append('Backend calls: %s' % (calls or 'none'))
+        lines.append('Cells read: %d, cells written: %d' % (self.cells_read, self.cells_written))
+        return '\n'.join(lines)
+
+
+def _log(message):
+    if logger is not None:
+        logger.info(message)
+    else:
+        print '*INFO* %s' % message
+
+
+def normalize_name(name):
+    return name.lower().replace(' ', '').replace('_', '')
+
+
+class StatsListener(object):
+    """
+    Robot Framework listener (API version 2) of the library that times its keywords.
+    A keyword of another library or a user keyword with the same name is not timed.
+    """
+
+    ROBOT_LISTENER_API_VERSION = 2
+
+    def __init__(self, library, stats):
+        self.stats = stats
+        self.libname = library.__class__.__name__
+        self._names = set(normalize_name(name) for name in dir(library)
+                          if not name.startswith('_') and callable(getattr(library, name)))
+        self._timed = []
+
+    def start_keyword(self, name, attrs):
+        timed = (attrs.get('libname') == self.libname
+                 and normalize_name(attrs.get('kwname', name)) in self._names)
+        self._timed.append(timed)
+        if timed:
+            self.stats.start_keyword(attrs.get('kwname', name))
+
+    def end_keyword(self, name, attrs):
+        if self._timed.pop():
+            self.stats.end_keyword()
+
+
+class SummaryListener(object):
+    """
+    Robot Framework listener (API version 3) of the library that adds the summary table
+    of PerformanceStats to the metadata of every suite that ran keywords of the library,
+    so it shows in the log and the report. The table covers the whole run so far.
+    """
+
+    ROBOT_LISTENER_API_VERSION = 3
+
+    def __init__(self, stats):
+        self.stats = stats
+        self._reported = 0
+
+    def end_suite(self, data, result):
+        timed = sum(record['calls'] for record in self.stats.keywords.values())
+        if timed != self._reported:
+            self._reported = timed
+            result.metadata['Excel Performance'] = self.stats.summary()
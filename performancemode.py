@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Excel performance mode: manual calculation, no screen updating and no events while
+cells are changed, for the Enable Excel Performance Mode keyword.
+"""
+
+from contextlib import contextmanager
+
+#  The App settings changed by the performance mode and the values they get.
+SETTINGS = (('calculation', 'manual'), ('screen_updating', False), ('enable_events', False))
+
+
+class PerformanceMode(object):
+    """
+    Switches an xlwings App to manual calculation, without screen updating and events,
+    and back to the settings it had before.
+
+    ExcelBackend calls after_write() after every change and before_read() before every
+    read: while the mode is on, the first read after a change recalculates the
+    workbooks, so formulas never return stale values.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.saved = None
+        self.dirty = False
+        self.recalculations = 0
+        self.suite = None
+
+    @property
+    def enabled(self):
+        return self.saved is not None
+
+    def enable(self, app, suite=None):
+        if self.enabled:
+            return
+        saved = []
+        try:
+            for name, value in SETTINGS:
+                try:
+                    saved.append((name, getattr(app, name)))
+                except AttributeError:
+                    #  Older xlwings versions do not have every setting.
+                    continue
+                setattr(app, name, value)
+        except Exception:
+            self._restore(app, saved)
+            raise
+        self.app = app
+        self.saved = saved
+        self.dirty = False
+        self.suite = suite
+
+    def disable(self):
+        """
+        Restores the settings the App had when the mode was enabled. Setting the
+        calculation back to automatic makes Excel recalculate what is dirty.
+        """
+        if not self.enabled:
+            return
+        saved, self.saved = self.saved, None
+        self.dirty = False
+        self.suite = None
+        self._restore(self.app, saved)
+
+    def _restore(self, app, saved):
+        errors = []
+        for name, value in reversed(saved):
+            try:
+                setattr(app, name, value)
+            except Exception, error:
+                #  Restore the other settings anyway, then report the first failure.
+                errors.append(error)
+        if errors:
+            raise errors[0]
+
+    def recalculate(self):
+        if self.app is not None:
+            self.app.calculate()
+            self.recalculations += 1
+        self.dirty = False
+
+    def before_read(self):
+        if self.dirty:
+            self.recalculate()
+
+    def after_write(self):
+        if self.saved is not None:
+            self.dirty = True
+
+    @contextmanager
+    def active(self, app):
+        """
+        Runs a block with the mode on and restores the settings afterwards, also when
+        the block fails. When the mode is on already it is left on.
+        """
+        if self.enabled or app is None:
+            yield
+            return
+        self.enable(app)
+        try:
+            yield
+        finally:
+            self.disable()
+
+
+class PerformanceModeListener(object):
+    """
+    Robot Framework listener (API version 2) of the library that turns the performance
+    mode off at the end of the suite it was enabled in, and when the library is closed,
+    so the settings are restored even when a test fails before it turns it off.
+    """
+
+    ROBOT_LISTENER_API_VERSION = 2
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.suites = []
+
+    def current_suite(self):
+        return self.suites[-1] if self.suites else None
+
+    def start_suite(self, name, attrs):
+        self.suites.append(attrs.get('id'))
+
+    def end_suite(self, name, attrs):
+        suite = self.suites.pop() if self.suites else None
+        if self.mode.enabled and self.mode.suite in (suite, None):
+            self.mode.disable()
+
+    def close(self):
+        self.mode.disable()
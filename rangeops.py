@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Operations applied to every cell of a block of values, for the Modify Range With and
+Shift Dates In Range keywords.
+"""
+
+import operator
+from datetime import date, timedelta
+from numbers import Number
+
+OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '//': operator.floordiv,
+    '%': operator.mod,
+    '**': operator.pow,
+}
+
+
+def _is_number(value):
+    return isinstance(value, Number) and not isinstance(value, bool)
+
+
+def map_block(rows, function, applies):
+    """
+    Returns (count, rows) where rows is a copy of the block with function applied to
+    every value for which applies is true, and count the number of values changed.
+    """
+    count = 0
+    mapped = []
+    for row_values in rows:
+        new_values = list(row_values)
+        for col_offset, value in enumerate(new_values):
+            if applies(value):
+                new_values[col_offset] = function(value)
+                count += 1
+        mapped.append(new_values)
+    return count, mapped
+
+
+def arithmetic(rows, op, operand):
+    """
+    Applies op ('+', '-', '*', '/', '//', '%' or '**') with operand to every number in the
+    block. Empty cells, text, booleans and dates are left alone.
+    """
+    try:
+        function = OPERATORS[op]
+    except KeyError:
+        raise ValueError("Unknown operation '%s', use one of: %s" % (op, ' '.join(sorted(OPERATORS))))
+    operand = float(operand)
+    if operand == 0 and op in ('/', '//', '%'):
+        raise ValueError("Operation '%s' with 0 is a division by zero" % op)
+    return map_block(rows, lambda value: function(value, operand), _is_number)
+
+
+def shift_dates(rows, days):
+    """
+    Adds days (negative to subtract) to every date and datetime in the block.
+    """
+    delta = timedelta(days=int(days))
+    return map_block(rows, lambda value: value + delta, lambda value: isinstance(value, date))
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+On disk cache of parsed xlsx workbooks, used with the cachedir library argument.
+
+A snapshot holds the used area of every sheet column by column. Each column is stored
+as one type byte per row, an array of doubles for its numbers, booleans and dates and
+a marshalled list for its texts. The snapshot file is memory mapped when a workbook is
+opened again and a column is only decoded when one of its cells is read.
+"""
+
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from datetime import datetime, timedelta
+
+from backends import XlsxBackend, iter_row_chunks
+from cellref import split_address
+
+_MAGIC = 'XLSNAP01'
+_EPOCH = datetime(1899, 12, 30)
+
+_EMPTY, _FLOAT, _INT, _BOOL, _DATETIME, _TEXT = range(6)
+
+
+def _encode_column(values):
+    tags = array('B')
+    numbers = array('d')
+    texts = []
+    for value in values:
+        if value is None:
+            tags.append(_EMPTY)
+        elif isinstance(value, bool):
+            tags.append(_BOOL)
+            numbers.append(value)
+        elif isinstance(value, float):
+            tags.append(_FLOAT)
+            numbers.append(value)
+        elif isinstance(value, (int, long)):
+            tags.append(_INT)
+            numbers.append(value)
+        elif isinstance(value, datetime):
+            tags.append(_DATETIME)
+            delta = value - _EPOCH
+            numbers.append(delta.days * 86400.0 + delta.seconds + delta.microseconds / 1e6)
+        else:
+            tags.append(_TEXT)
+            texts.append(value if isinstance(value, unicode) else str(value).decode('utf-8'))
+    return tags.tostring(), numbers.tostring(), marshal.dumps(texts)
+
+
+def _decode_column(tags, numbers, texts):
+    numbers = iter(array('d', numbers))
+    texts = iter(marshal.loads(texts))
+    values = []
+    for tag in array('B', tags):
+        if tag == _EMPTY:
+            values.append(None)
+        elif tag == _TEXT:
+            values.append(next(texts))
+        elif tag == _FLOAT:
+            values.append(next(numbers))
+        elif tag == _INT:
+            values.append(int(next(numbers)))
+        elif tag == _BOOL:
+            values.append(bool(next(numbers)))
+        else:
+            seconds = next(numbers)
+            values.append(_EPOCH + timedelta(milliseconds=int(round(seconds * 1000))))
+    return values
+
+
+def write_snapshot(path, backend, content_hash):
+    """
+    Writes the used area of every sheet of a backend to a snapshot file. The file is
+    written under a temporary name first, so readers never see half a snapshot.
+    """
+    sheets = backend.sheet_names()
+    header = {'hash': content_hash, 'sheets': sheets, 'active': backend.active_sheet_name(), 'dimensions': {}, 'columns': {}}
+    parts = []
+    offset = 0
+    for sheetname in sheets:
+        last_row, last_column = backend.dimensions(sheetname)
+        rows = backend.read_range(sheetname, 1, 1, last_row, last_column)
+        header['dimensions'][sheetname] = (last_row, last_column)
+        columns = header['columns'][sheetname] = []
+        for col_offset in range(last_column):
+            spans = []
+            for part in _encode_column([row_values[col_offset] for row_values in rows]):
+                parts.append(part)
+                spans.append((offset, len(part)))
+                offset += len(part)
+            columns.append(spans)
+    header = marshal.dumps(header)
+    handle, temp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+    with os.fdopen(handle, 'wb') as output:
+        output.write(_MAGIC + struct.pack('<I', len(header)) + header)
+        for part in parts:
+            output.write(part)
+    try:
+        os.rename(temp_path, path)
+    except OSError:
+        #  Another process wrote the same snapshot first (Windows does not replace files).
+        os.remove(temp_path)
+
+
+class SnapshotBackend(object):
+    """
+    Reads a workbook from a memory mapped snapshot file. Read only, like XlsxBackend.
+    """
+
+    name = 'xlsx'
+
+    def __init__(self, path, filename):
+        self.path = path
+        self.filename = filename
+        self._columns = {}
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(_MAGIC)] != _MAGIC:
+            self.close()
+            raise ValueError("%s is not a workbook snapshot" % path)
+        length = struct.unpack('<I', self._map[len(_MAGIC):len(_MAGIC) + 4])[0]
+        self._data = len(_MAGIC) + 4 + length
+        header = marshal.loads(self._map[len(_MAGIC) + 4:self._data])
+        self.content_hash = header['hash']
+        self._sheet_names = header['sheets']
+        self._active = header['active']
+        self._dimensions = header['dimensions']
+        self._spans = header['columns']
+
+    def sheet_names(self):
+        return list(self._sheet_names)
+
+    def active_sheet_name(self):
+        return self._active
+
+    def sheet_name(self, sheet):
+        if isinstance(sheet, int):
+            return self._sheet_names[sheet]
+        if sheet not in self._dimensions:
+            raise KeyError("No sheet named '%s' in %s" % (sheet, self.filename))
+        return sheet
+
+    def _column(self, sheetname, column):
+        key = (sheetname, column)
+        values = self._columns.get(key)
+        if values is None:
+            parts = [self._map[self._data + offset:self._data + offset + length]
+                     for offset, length in self._spans[sheetname][column - 1]]
+            values = self._columns[key] = _decode_column(*parts)
+        return values
+
+    def dimensions(self, sheetname):
+        return self._dimensions[self.sheet_name(sheetname)]
+
+    def invalidate(self, sheetname=None):
+        pass
+
+    def last_row_in_column(self, sheetname, column):
+        sheetname = self.sheet_name(sheetname)
+        if column > self._dimensions[sheetname][1]:
+            return 1
+        values = self._column(sheetname, column)
+        rows = [row for row, value in enumerate(values, 1) if value is not None]
+        return max(rows or [1])
+
+    def last_column_in_row(self, sheetname, row):
+        sheetname = self.sheet_name(sheetname)
+        last_row, last_column = self._dimensions[sheetname]
+        if row > last_row:
+            return 1
+        columns = [column for column in range(1, last_column + 1) if self._column(sheetname, column)[row - 1] is not None]
+        return max(columns or [1])
+
+    def read_cell(self, sheetname, cell):
+        if isinstance(cell, tuple):
+            row, column = cell
+        else:
+            row, column = split_address(cell)
+        return self.read_range(sheetname, row, column, row, column)[0][0]
+
+    def read_range(self, sheetname, first_row, first_column, last_row, last_column):
+        sheetname = self.sheet_name(sheetname)
+        used_rows, used_columns = self._dimensions[sheetname]
+        empty = [None] * (last_row - first_row + 1)
+        columns = []
+        for column in range(first_column, last_column + 1):
+            if column > used_columns:
+                columns.append(empty)
+            else:
+                values = self._column(sheetname, column)[first_row - 1:last_row]
+                columns.append(values + [None] * (len(empty) - len(values)))
+        return [list(row_values) for row_values in zip(*columns)] if columns else [[] for _ in empty]
+
+    def iter_rows(self, sheetname, chunk_size):
+        return iter_row_chunks(self, sheetname, chunk_size)
+
+    def close(self):
+        self._columns.clear()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class SnapshotCache(object):
+    """
+    Directory of workbook snapshots, limited to max_bytes.
+
+    A snapshot is named after the SHA-1 of the workbook's content, so copies of a file
+    share one snapshot. A small key file named after the path, size and modification
+    time of the workbook points to it, so a workbook that did not change is found
+    without hashing it. When the snapshots take more than max_bytes, the least recently
+    used ones are removed.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _key_path(self, filename):
+        stat = os.stat(filename)
+        fingerprint = '%s|%d|%r' % (os.path.abspath(filename), stat.st_size, stat.st_mtime)
+        return os.path.join(self.directory, hashlib.sha1(fingerprint).hexdigest() + '.key')
+
+    def _snapshot_path(self, content_hash):
+        return os.path.join(self.directory, content_hash + '.snap')
+
+    def open(self, filename):
+        """
+        Returns a SnapshotBackend for an xlsx file, parsing it and writing its snapshot
+        first when there is none yet.
+        """
+        key_path = self._key_path(filename)
+        content_hash = None
+        if os.path.exists(key_path):
+            with open(key_path, 'rb') as key:
+                content_hash = key.read().strip()
+        if not content_hash or not os.path.exists(self._snapshot_path(content_hash)):
+            content_hash = self._hash(filename)
+            with open(key_path, 'wb') as key:
+                key.write(content_hash)
+        path = self._snapshot_path(content_hash)
+        if os.path.exists(path):
+            self.hits += 1
+            #  The modification time of a snapshot records when it was last used.
+            os.utime(path, None)
+        else:
+            self.misses += 1
+            backend = XlsxBackend(filename)
+            try:
+                write_snapshot(path, backend, content_hash)
+            finally:
+                backend.close()
+            self._evict(keep=path)
+        return SnapshotBackend(path, filename)
+
+    def _hash(self, filename):
+        digest = hashlib.sha1()
+        with open(filename, 'rb') as source:
+            for block in iter(lambda: source.read(1 << 20), ''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _evict(self, keep):
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.snap'):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                snapshots.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for mtime, size, path in snapshots)
+        for mtime, size, path in sorted(snapshots):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                #  Still mapped by another open workbook on Windows, it goes next time.
+                continue
+            total -= size
+        for name in os.listdir(self.directory):
+            if name.endswith('.key'):
+                key_path = os.path.join(self.directory, name)
+                with open(key_path, 'rb') as key:
+                    content_hash = key.read().strip()
+                if not os.path.exists(self._snapshot_path(content_hash)):
+                    os.remove(key_path)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Workbooks kept in memory for the Register Template and New Workbook From Template
+keywords.
+"""
+
+import os
+import tempfile
+from cStringIO import StringIO
+
+from xlsxreader import XlsxReader
+
+
+class Template(object):
+    """
+    The bytes of a workbook file, read once, and the sheets parsed from them.
+
+    Copies made with the xlsx backend share both: source() gives every copy its own
+    read only view of the same bytes, and sheet() parses a sheet only for the first copy
+    that reads it. Copies must not change what sheet() returns, XlsxBackend copies the
+    rows it writes to.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as source:
+            self.data = source.read()
+        self._reader = None
+        self._sheets = {}
+
+    def source(self):
+        #  A StringIO made from a str shares its buffer instead of copying it.
+        return StringIO(self.data)
+
+    def sheet(self, sheetname):
+        """
+        Returns the {row: {column: value}} mapping of a sheet given by its name.
+        """
+        sheet = self._sheets.get(sheetname)
+        if sheet is None:
+            if self._reader is None:
+                self._reader = XlsxReader(self.filename, self.source())
+            sheet = self._sheets[sheetname] = dict(self._reader.iter_rows(sheetname))
+        return sheet
+
+    def write_copy(self):
+        """
+        Writes the bytes to a new temporary file, for Excel to open, and returns its path.
+        """
+        handle, path = tempfile.mkstemp(suffix=os.path.splitext(self.filename)[1] or '.xlsx', prefix='template')
+        try:
+            os.write(handle, self.data)
+        finally:
+            os.close(handle)
+        return path
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        self._sheets.clear()
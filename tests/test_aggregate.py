@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+The statistics of Get Column Statistics and Group By And Aggregate and their policies
+for blank and non numeric cells.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregate import column_statistics, group_aggregate, number
+
+MIXED = [1.0, None, u'2.5', u'  ', u'n/a', True, datetime(2019, 3, 12), 4, u'']
+
+
+class NumberTest(unittest.TestCase):
+
+    def test_numbers_and_numeric_text_count(self):
+        self.assertEqual(number(3), 3.0)
+        self.assertEqual(number(2.5), 2.5)
+        self.assertEqual(number(u' 7 '), 7.0)
+        self.assertEqual(number('1e3'), 1000.0)
+
+    def test_other_values_follow_the_policy(self):
+        for value in (True, datetime(2019, 3, 12), u'n/a', u'nan', u'inf', None):
+            self.assertEqual(number(value), None)
+            self.assertEqual(number(value, 'zero'), 0.0)
+            self.assertRaises(ValueError, number, value, 'fail')
+
+
+class ColumnStatisticsTest(unittest.TestCase):
+
+    def test_numbers(self):
+        statistics = column_statistics([3.0, 1.0, 2.0, 2.0], 2, 1)
+        self.assertEqual(statistics.items(), [('count', 4), ('sum', 8.0), ('mean', 2.0), ('min', 1.0), ('max', 3.0),
+                                              ('distinct', 3), ('blanks', 0), ('skipped', 0)])
+
+    def test_skip_leaves_out_blank_and_non_numeric_cells(self):
+        statistics = column_statistics(MIXED, 1, 1)
+        self.assertEqual((statistics['count'], statistics['sum'], statistics['mean']), (3, 7.5, 2.5))
+        self.assertEqual((statistics['min'], statistics['max']), (1.0, 4.0))
+        self.assertEqual((statistics['blanks'], statistics['skipped']), (3, 3))
+
+    def test_zero_counts_non_numeric_cells_as_zero(self):
+        statistics = column_statistics(MIXED, 1, 1, 'zero')
+        self.assertEqual((statistics['count'], statistics['sum'], statistics['min']), (6, 7.5, 0.0))
+        self.assertEqual((statistics['blanks'], statistics['skipped']), (3, 0))
+
+    def test_fail_names_the_cell(self):
+        with self.assertRaises(ValueError) as context:
+            column_statistics([1.0, None, u'n/a'], 5, 2, 'fail')
+        self.assertIn('B7', str(context.exception))
+        self.assertEqual(column_statistics([1.0, None, u'2'], 5, 2, 'fail')['sum'], 3.0)
+
+    def test_distinct_counts_every_non_blank_value_as_text(self):
+        self.assertEqual(column_statistics([5.0, 5, u'5', u'a', None, u'a'], 1, 1)['distinct'], 2)
+
+    def test_empty_column(self):
+        statistics = column_statistics([None, u''], 1, 1)
+        self.assertEqual((statistics['count'], statistics['sum'], statistics['mean']), (0, 0.0, None))
+        self.assertEqual((statistics['min'], statistics['max'], statistics['blanks']), (None, None, 2))
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, column_statistics, [1.0], 1, 1, 'ignore')
+
+
+class GroupAggregateTest(unittest.TestCase):
+
+    KEYS = [u'b', u'a', u'b', None, 5.0, 5, u'', u'a']
+    VALUES = [1.0, 2.0, 3.0, 100.0, 4.0, u'6', 200.0, u'x']
+
+    def aggregate(self, function, policy='skip'):
+        return group_aggregate(self.KEYS, self.VALUES, 2, 3, function, policy)
+
+    def test_groups_in_order_of_first_occurrence(self):
+        self.assertEqual(self.aggregate('sum').items(), [(u'b', 4.0), (u'a', 2.0), (u'5', 10.0)])
+
+    def test_blank_keys_are_left_out(self):
+        self.assertNotIn(u'', self.aggregate('count'))
+        self.assertNotIn(u'None', self.aggregate('count'))
+
+    def test_functions(self):
+        self.assertEqual(self.aggregate('count'), {u'b': 2, u'a': 1, u'5': 2})
+        self.assertEqual(self.aggregate('mean'), {u'b': 2.0, u'a': 2.0, u'5': 5.0})
+        self.assertEqual(self.aggregate('min'), {u'b': 1.0, u'a': 2.0, u'5': 4.0})
+        self.assertEqual(self.aggregate('max'), {u'b': 3.0, u'a': 2.0, u'5': 6.0})
+        self.assertEqual(self.aggregate('distinct'), {u'b': 2, u'a': 2, u'5': 2})
+
+    def test_zero_policy(self):
+        self.assertEqual(self.aggregate('count', 'zero')[u'a'], 2)
+        self.assertEqual(self.aggregate('mean', 'zero')[u'a'], 1.0)
+
+    def test_fail_policy_names_the_cell(self):
+        with self.assertRaises(ValueError) as context:
+            self.aggregate('sum', 'fail')
+        self.assertIn('C9', str(context.exception))
+
+    def test_group_without_numbers(self):
+        aggregated = group_aggregate([u'k', u'k'], [None, u'x'], 1, 1, 'mean')
+        self.assertEqual(aggregated, {u'k': None})
+        self.assertEqual(group_aggregate([u'k'], [None], 1, 1, 'sum'), {u'k': 0.0})
+
+    def test_unknown_function(self):
+        self.assertRaises(ValueError, group_aggregate, [u'k'], [1.0], 1, 1, 'median')
+
+
+if __name__ == '__main__':
+    unittest.main()
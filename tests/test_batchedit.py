@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Block grouping of batched writes and reads through BatchEdit before the commit, against
+the fakexlwings stand-in.
+"""
+
+import os
+import sys
+import unittest
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fakexlwings
+from backends import ExcelBackend
+from batchedit import BatchEdit, coalesce
+
+
+class RecordingBackend(ExcelBackend):
+    """
+    An ExcelBackend that remembers its write_range calls.
+    """
+
+    def __init__(self, book):
+        ExcelBackend.__init__(self, book)
+        self.writes = []
+
+    def write_range(self, sheetname, first_row, first_column, rows):
+        self.writes.append((first_row, first_column, rows))
+        ExcelBackend.write_range(self, sheetname, first_row, first_column, rows)
+
+
+class CoalesceTest(unittest.TestCase):
+
+    def test_stacks_runs_of_the_same_columns(self):
+        cells = {1: {1: 'a', 2: 'b'}, 2: {1: 'c', 2: 'd'}}
+        self.assertEqual(coalesce(cells), [(1, 1, [['a', 'b'], ['c', 'd']])])
+
+    def test_gap_in_a_row_splits_the_run(self):
+        cells = {1: {1: 'a', 2: 'b', 4: 'c'}}
+        self.assertEqual(coalesce(cells), [(1, 1, [['a', 'b']]), (1, 4, [['c']])])
+
+    def test_ragged_run_breaks_the_stack(self):
+        cells = {1: {1: 'a', 2: 'b'}, 2: {1: 'c', 2: 'd', 3: 'e'}, 3: {1: 'f', 2: 'g'}}
+        self.assertEqual(coalesce(cells), [(1, 1, [['a', 'b']]), (2, 1, [['c', 'd', 'e']]), (3, 1, [['f', 'g']])])
+
+    def test_run_after_a_gap_row_starts_a_new_block(self):
+        cells = {1: {2: 'a'}, 2: {2: 'b'}, 4: {2: 'c'}, 5: {2: 'd'}}
+        self.assertEqual(coalesce(cells), [(1, 2, [['a'], ['b']]), (4, 2, [['c'], ['d']])])
+
+    def test_blocks_side_by_side(self):
+        cells = dict((row, {1: row, 2: row, 5: -row}) for row in (1, 2, 3))
+        self.assertEqual(coalesce(cells), [(1, 1, [[1, 1], [2, 2], [3, 3]]), (1, 5, [[-1], [-2], [-3]])])
+
+    def test_blocks_cover_only_the_given_cells(self):
+        cells = {1: {1: 1, 3: 3}, 2: {2: 2}, 7: {1: 7, 2: 7}}
+        covered = {}
+        for first_row, first_column, rows in coalesce(cells):
+            self.assertEqual(len(set(len(values) for values in rows)), 1)
+            for row_offset, values in enumerate(rows):
+                for col_offset, value in enumerate(values):
+                    covered.setdefault(first_row + row_offset, {})[first_column + col_offset] = value
+        self.assertEqual(covered, cells)
+
+
+class BatchEditTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = fakexlwings.App(False)
+        book = self.app.books.add()
+        sheet = book.sheets['Sheet1']
+        for row in (1, 2, 3):
+            sheet.set(row, 1, row)
+            sheet.set(row, 2, 'text %d' % row)
+        self.backend = RecordingBackend(book)
+        self.batch = BatchEdit(self.backend)
+
+    def tearDown(self):
+        self.app.quit()
+
+    def test_read_cell_sees_pending_writes(self):
+        self.batch.write_cell('Sheet1', 1, 1, 42)
+        self.batch.write_cell('Sheet1', 2, 2, "'007")
+        self.assertEqual(self.batch.read_cell('Sheet1', 'A1'), 42.0)
+        self.assertIsInstance(self.batch.read_cell('Sheet1', (1, 1)), float)
+        self.assertEqual(self.batch.read_cell('Sheet1', 'B2'), '007')
+        self.assertEqual(self.batch.read_cell('Sheet1', 'B1'), 'text 1')
+        self.assertEqual(self.backend.writes, [])
+
+    def test_read_cell_sees_pending_dates_as_datetimes(self):
+        self.batch.write_cell('Sheet1', 1, 3, date(2019, 3, 12))
+        self.assertEqual(self.batch.read_cell('Sheet1', 'C1'), datetime(2019, 3, 12))
+
+    def test_read_range_lays_pending_writes_over(self):
+        self.batch.write_range('Sheet1', 2, 2, [[u'x', 5]])
+        self.batch.write_cell('Sheet1', 9, 9, 'outside')
+        self.assertEqual(self.batch.read_range('Sheet1', 1, 1, 3, 3),
+                         [[1.0, 'text 1', None], [2.0, u'x', 5.0], [3.0, 'text 3', None]])
+
+    def test_dimensions_grow_with_pending_writes(self):
+        self.assertEqual(self.batch.dimensions('Sheet1'), (3, 2))
+        self.batch.write_cell('Sheet1', 5, 1, 1)
+        self.batch.write_cell('Sheet1', 2, 4, 1)
+        self.assertEqual(self.batch.dimensions('Sheet1'), (5, 4))
+
+    def test_last_row_and_column_include_pending_writes(self):
+        self.batch.write_cell('Sheet1', 7, 2, 'b7')
+        self.assertEqual(self.batch.last_row_in_column('Sheet1', 2), 7)
+        self.assertEqual(self.batch.last_row_in_column('Sheet1', 1), 3)
+        self.assertEqual(self.batch.last_column_in_row('Sheet1', 7), 2)
+        self.assertEqual(self.batch.last_column_in_row('Sheet1', 1), 2)
+
+    def test_iter_rows_includes_pending_writes(self):
+        self.batch.write_cell('Sheet1', 4, 1, 4)
+        chunks = list(self.batch.iter_rows('Sheet1', 2))
+        self.assertEqual([len(rows) for rows in chunks], [2, 2])
+        self.assertEqual(chunks[1][1], [4.0, None])
+
+    def test_commit_writes_one_range_per_block(self):
+        for row in (1, 2, 3):
+            self.batch.write_cell('Sheet1', row, 3, row * 10)
+            self.batch.write_cell('Sheet1', row, 4, row * 100)
+        self.batch.write_cell('Sheet1', 6, 1, 'alone')
+        self.assertEqual(self.batch.pending_cells, 7)
+        self.assertIs(self.batch.commit(), self.backend)
+        self.assertEqual(self.backend.writes, [(1, 3, [[10, 100], [20, 200], [30, 300]]), (6, 1, [['alone']])])
+        self.assertEqual(self.batch.pending_cells, 0)
+        self.assertEqual(self.backend.read_range('Sheet1', 3, 3, 3, 4), [[30.0, 300.0]])
+        self.assertEqual(self.backend.dimensions('Sheet1'), (6, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+The Excel broker, started by its first client against the fakexlwings stand-in.
+"""
+
+import os
+import shutil
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fakexlwings
+from broker import BrokerBackend, BrokerClient, BrokerError, LOCKED, connect, receive_message, send_message, token_path
+
+
+class BrokerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.address = self.broker_address()
+        self.clients = []
+
+    def broker_address(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            self.skipTest('no Unix sockets')
+        return os.path.join(self.directory, 'excel.sock')
+
+    def tearDown(self):
+        try:
+            BrokerClient(self.address, start=False).request([('shutdown', None, [])])
+        except socket.error:
+            pass
+        for client in self.clients:
+            client.close()
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                connect(self.address).close()
+            except socket.error:
+                break
+            time.sleep(0.1)
+        shutil.rmtree(self.directory)
+
+    def client(self):
+        client = BrokerClient(self.address, apps=1, timeout=20, xlwings=fakexlwings)
+        self.clients.append(client)
+        return client
+
+    def workbook(self, name):
+        return os.path.join(self.directory, name)
+
+
+class BrokerTest(BrokerTestCase):
+
+    def test_clients_share_the_broker(self):
+        first, second = self.client(), self.client()
+        one = BrokerBackend.open(first, self.workbook('one.xlsx'))
+        two = BrokerBackend.open(second, self.workbook('two.xlsx'))
+        one.write_cell('Sheet1', 1, 1, 1)
+        two.write_cell('Sheet1', 1, 1, 2)
+        self.assertEqual(one.read_cell('Sheet1', 'A1'), 1)
+        self.assertEqual(two.read_cell('Sheet1', 'A1'), 2)
+        self.assertEqual(first.request([('ping', None, [])]), [2])
+
+    def test_open_workbook_is_locked(self):
+        first, second = self.client(), self.client()
+        BrokerBackend.open(first, self.workbook('shared.xlsx'))
+        with self.assertRaises(BrokerError) as context:
+            BrokerBackend.open(second, self.workbook('shared.xlsx'), timeout=0.5)
+        self.assertEqual(context.exception.kind, LOCKED)
+
+    def test_open_waits_for_the_lock(self):
+        first, second = self.client(), self.client()
+        workbook = BrokerBackend.open(first, self.workbook('shared.xlsx'))
+        closer = threading.Timer(0.5, workbook.close)
+        closer.start()
+        try:
+            start = time.time()
+            BrokerBackend.open(second, self.workbook('shared.xlsx'), timeout=10)
+            self.assertGreater(time.time() - start, 0.3)
+        finally:
+            closer.join()
+
+    def test_lock_is_released_when_a_client_disconnects(self):
+        first, second = self.client(), self.client()
+        BrokerBackend.open(first, self.workbook('shared.xlsx'))
+        first.close()
+        BrokerBackend.open(second, self.workbook('shared.xlsx'), timeout=10)
+
+    def test_queued_write_error_is_reported_on_next_read(self):
+        workbook = BrokerBackend.open(self.client(), self.workbook('one.xlsx'))
+        workbook.write_cell('Missing', 1, 1, 1)
+        with self.assertRaises(BrokerError) as context:
+            workbook.read_cell('Sheet1', 'A1')
+        self.assertIn('Missing', str(context.exception))
+        self.assertEqual(workbook.read_cell('Sheet1', 'A1'), None)
+
+    def test_partial_message_does_not_stall_other_clients(self):
+        self.client()
+        stalled = connect(self.address)
+        try:
+            stalled.sendall(struct.pack('!I', 100) + '{"calls"')
+            workbook = BrokerBackend.open(self.client(), self.workbook('one.xlsx'))
+            workbook.write_cell('Sheet1', 1, 1, 'text')
+            self.assertEqual(workbook.read_cell('Sheet1', 'A1'), 'text')
+        finally:
+            stalled.close()
+
+
+class TcpBrokerTest(BrokerTestCase):
+
+    def broker_address(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('localhost', 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        return 'localhost:%d' % port
+
+    def test_token_is_required(self):
+        self.assertEqual(self.client().request([('ping', None, [])]), [0])
+        if os.name != 'nt':
+            self.assertEqual(os.stat(token_path(self.address)).st_mode & 0777, 0600)
+        stranger = connect(self.address)
+        try:
+            send_message(stranger, {'calls': [['ping', None, []]]})
+            self.assertEqual(receive_message(stranger), None)
+        finally:
+            stranger.close()
+
+    def test_other_hosts_are_refused(self):
+        with self.assertRaises(ValueError):
+            connect('192.0.2.1:%s' % self.address.split(':')[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
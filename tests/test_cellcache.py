@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+The cell cache of Enable Cell Cache, against the fakexlwings stand-in.
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fakexlwings
+import Excel10Library
+from backends import ExcelBackend
+from cellcache import CellCache
+
+
+class CellCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = fakexlwings.App(False)
+        self.book = self.app.books.add()
+        sheet = self.book.sheets.add('Data')
+        for row in range(1, 11):
+            for column in range(1, 5):
+                sheet.set(row, column, row * 100 + column)
+        self.cache = CellCache(ExcelBackend(self.book), max_blocks=2, block_rows=4, block_columns=2)
+        fakexlwings.reset_round_trips()
+
+    def tearDown(self):
+        self.app.quit()
+
+    def test_first_read_of_a_block_is_a_miss(self):
+        self.assertEqual(self.cache.read_cell('Data', 'A1'), 101.0)
+        self.assertEqual(self.cache.read_cell('Data', (4, 2)), 402.0)
+        self.assertEqual(self.cache.read_cell('Data', 'B2'), 202.0)
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 2))
+        self.assertEqual(fakexlwings.ROUND_TRIPS, {'get_value': 1})
+
+    def test_cells_outside_the_block_load_another_block(self):
+        self.cache.read_cell('Data', 'A1')
+        self.assertEqual(self.cache.read_cell('Data', 'A5'), 501.0)
+        self.assertEqual(self.cache.read_cell('Data', 'C1'), 103.0)
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_least_recently_used_block_is_evicted(self):
+        self.cache.read_cell('Data', 'A1')
+        self.cache.read_cell('Data', 'A5')
+        self.cache.read_cell('Data', 'A1')
+        self.cache.read_cell('Data', 'A9')
+        self.assertEqual(self.cache.evictions, 1)
+        self.cache.read_cell('Data', 'A2')
+        self.cache.read_cell('Data', 'A6')
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 4))
+        self.assertEqual(self.cache.statistics()['blocks'], 2)
+
+    def test_writes_empty_the_cache(self):
+        self.cache.read_cell('Data', 'A1')
+        self.cache.write_cell('Data', 1, 1, 'new')
+        self.assertEqual(self.cache.read_cell('Data', 'A1'), 'new')
+        self.cache.write_range('Data', 1, 2, [[1], [2]])
+        self.assertEqual(self.cache.read_cell('Data', 'B2'), 2.0)
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_invalidate_empties_the_cache(self):
+        self.cache.read_cell('Data', 'A1')
+        self.book.sheets['Data'].set(1, 1, 'changed in Excel')
+        self.assertEqual(self.cache.read_cell('Data', 'A1'), 101.0)
+        self.cache.invalidate()
+        self.assertEqual(self.cache.read_cell('Data', 'A1'), 'changed in Excel')
+
+
+class LibraryCellCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.xw = Excel10Library.xw
+        Excel10Library.xw = fakexlwings
+        self.library = Excel10Library.Excel10Library()
+        self.library.create_excel_workbook('Data')
+        self.library.put_value_to_cell('Data', 1, 1, '1')
+        self.library.enable_cell_cache()
+
+    def tearDown(self):
+        self.library.close_excel_workbook()
+        Excel10Library.xw = self.xw
+
+    def read(self, row=1, column=1):
+        return self.library.read_cell_data_by_coordinates('Data', column, row)
+
+    def statistics(self):
+        statistics = self.library.get_cell_cache_statistics()
+        return statistics['hits'], statistics['misses']
+
+    def test_repeated_reads_are_hits(self):
+        self.read()
+        self.read(2, 2)
+        self.assertEqual(self.statistics(), (1, 1))
+
+    def test_put_value_empties_the_cache(self):
+        self.read()
+        self.library.put_value_to_cell('Data', 1, 1, '2')
+        self.assertEqual(self.read(), 2.0)
+        self.assertEqual(self.statistics(), (0, 2))
+
+    def test_add_new_sheet_empties_the_cache(self):
+        self.read()
+        self.library.add_new_sheet('Other')
+        self.read()
+        self.assertEqual(self.statistics(), (0, 2))
+        self.assertEqual(self.library.get_cell_cache_statistics()['blocks'], 1)
+
+    def test_batch_commit_empties_the_cache(self):
+        self.read()
+        self.library.begin_batch_edit()
+        self.library.put_value_to_cell('Data', 1, 1, '3')
+        self.assertEqual(self.read(), 3.0)
+        self.library.commit_batch_edit()
+        self.assertEqual(self.read(), 3.0)
+        self.assertEqual(self.statistics()[1], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Workbook snapshots of the cachedir library argument: round trips through a snapshot file
+and when SnapshotCache parses a workbook again.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import XlsxBackend
+from snapshot import SnapshotBackend, SnapshotCache, write_snapshot
+from test_xlsxpatch import NUMBERS, write_workbook
+
+#  Style 1 is a date format (built in 14).
+MIXED = ('<row r="1"><c r="A1" t="inlineStr"><is><t>name</t></is></c><c r="B1"><v>1.5</v></c></row>'
+         '<row r="2"><c r="A2" t="b"><v>1</v></c></row>'
+         '<row r="3"><c r="A3" s="1"><v>43536.5</v></c><c r="B3" t="inlineStr"><is><t>caf\xc3\xa9</t></is></c></row>')
+
+
+class SnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.workbook = os.path.join(self.directory, 'workbook.xlsx')
+        self.cachedir = os.path.join(self.directory, 'cache')
+        self.backends = []
+
+    def tearDown(self):
+        for backend in self.backends:
+            backend.close()
+        shutil.rmtree(self.directory)
+
+    def keep(self, backend):
+        self.backends.append(backend)
+        return backend
+
+    def write(self, rows, mtime=None):
+        write_workbook(self.workbook, rows, number_formats=(14,))
+        if mtime is not None:
+            os.utime(self.workbook, (mtime, mtime))
+
+    def snapshots(self):
+        return sorted(name for name in os.listdir(self.cachedir) if name.endswith('.snap'))
+
+
+class SnapshotBackendTest(SnapshotTestCase):
+
+    def test_round_trip(self):
+        self.write(MIXED)
+        source = self.keep(XlsxBackend(self.workbook))
+        path = os.path.join(self.directory, 'workbook.snap')
+        write_snapshot(path, source, 'hash')
+        snapshot = self.keep(SnapshotBackend(path, self.workbook))
+        self.assertEqual(snapshot.content_hash, 'hash')
+        self.assertEqual(snapshot.sheet_names(), ['Data'])
+        self.assertEqual(snapshot.active_sheet_name(), source.active_sheet_name())
+        self.assertEqual(snapshot.dimensions('Data'), (3, 2))
+        self.assertEqual(snapshot.read_range('Data', 1, 1, 3, 2), source.read_range('Data', 1, 1, 3, 2))
+        self.assertEqual(snapshot.read_cell('Data', 'A3'), datetime(2019, 3, 12, 12))
+        self.assertEqual(snapshot.read_cell('Data', (3, 2)), u'caf\xe9')
+        self.assertIs(snapshot.read_cell('Data', 'A2'), True)
+        self.assertEqual(snapshot.read_range('Data', 3, 2, 4, 4), [[u'caf\xe9', None, None], [None] * 3])
+        self.assertEqual(snapshot.last_row_in_column('Data', 1), 3)
+        self.assertEqual(snapshot.last_column_in_row('Data', 3), 2)
+        self.assertEqual(snapshot.last_column_in_row('Data', 2), 1)
+
+    def test_other_files_are_refused(self):
+        self.write(NUMBERS)
+        self.assertRaises(ValueError, SnapshotBackend, self.workbook, self.workbook)
+
+
+class SnapshotCacheTest(SnapshotTestCase):
+
+    def test_second_open_reads_the_snapshot(self):
+        self.write(NUMBERS)
+        cache = SnapshotCache(self.cachedir, 1 << 20)
+        first = self.keep(cache.open(self.workbook))
+        second = self.keep(cache.open(self.workbook))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(second.read_range('Data', 1, 1, 3, 2), first.read_range('Data', 1, 1, 3, 2))
+        self.assertEqual(second.read_cell('Data', 'B3'), 30.0)
+
+    def test_changed_size_is_parsed_again(self):
+        self.write(NUMBERS, mtime=1000000000)
+        cache = SnapshotCache(self.cachedir, 1 << 20)
+        size = os.path.getsize(self.workbook)
+        self.keep(cache.open(self.workbook))
+        self.write(NUMBERS.replace('<v>30</v>', '<v>30000</v>'), mtime=1000000000)
+        self.assertNotEqual(os.path.getsize(self.workbook), size)
+        self.assertEqual(self.keep(cache.open(self.workbook)).read_cell('Data', 'B3'), 30000.0)
+        self.assertEqual(cache.misses, 2)
+
+    def test_changed_modification_time_is_parsed_again(self):
+        self.write(NUMBERS, mtime=1000000000)
+        cache = SnapshotCache(self.cachedir, 1 << 20)
+        self.keep(cache.open(self.workbook))
+        #  Same size, other content: only the modification time tells.
+        self.write(NUMBERS.replace('<v>30</v>', '<v>31</v>'), mtime=1000000000)
+        changed = os.path.getsize(self.workbook)
+        self.write(NUMBERS.replace('<v>30</v>', '<v>32</v>'), mtime=1000000100)
+        self.assertEqual(os.path.getsize(self.workbook), changed)
+        self.assertEqual(self.keep(cache.open(self.workbook)).read_cell('Data', 'B3'), 32.0)
+
+    def test_unchanged_content_shares_the_snapshot(self):
+        self.write(NUMBERS, mtime=1000000000)
+        cache = SnapshotCache(self.cachedir, 1 << 20)
+        self.keep(cache.open(self.workbook))
+        os.utime(self.workbook, (1000000100, 1000000100))
+        self.keep(cache.open(self.workbook))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(len(self.snapshots()), 1)
+
+    def test_least_recently_used_snapshot_is_evicted(self):
+        cache = SnapshotCache(self.cachedir, 1)
+        self.write(NUMBERS, mtime=1000000000)
+        cache.open(self.workbook).close()
+        first = self.snapshots()
+        self.write(MIXED, mtime=1000000100)
+        self.keep(cache.open(self.workbook))
+        self.assertEqual(len(self.snapshots()), 1)
+        self.assertNotEqual(self.snapshots(), first)
+        self.assertEqual(len([name for name in os.listdir(self.cachedir) if name.endswith('.key')]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
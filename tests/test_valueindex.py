@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+The value indexes behind Find Cells With Value, Find Cells Matching Regex and Get Row By
+Key, on their own and through the library against the fakexlwings stand-in.
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import fakexlwings
+import Excel10Library
+from valueindex import KeyIndex, SheetIndex, index_key
+
+ROWS = [[u'name', u'amount'], [u'apple', 5.0], [u'pear', 5.5], [u'apple', 7.0], [None, 5.0]]
+
+
+class LibraryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.xw = Excel10Library.xw
+        Excel10Library.xw = fakexlwings
+        self.library = Excel10Library.Excel10Library()
+        self.library.create_excel_workbook('Data')
+        self.library.put_values_to_range('Data', 1, 1, ROWS)
+
+    def tearDown(self):
+        self.library.close_excel_workbook()
+        Excel10Library.xw = self.xw
+
+
+class IndexKeyTest(unittest.TestCase):
+
+    def test_whole_numbers_lose_their_fraction(self):
+        self.assertEqual(index_key(5.0), u'5')
+        self.assertEqual(index_key(5.5), u'5.5')
+
+    def test_texts_are_unicode(self):
+        self.assertEqual(index_key('caf\xc3\xa9'), u'caf\xe9')
+        self.assertEqual(index_key(datetime(2019, 3, 12)), u'2019-03-12 00:00:00')
+
+
+class SheetIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        #  Two chunks, as iter_rows yields them.
+        self.index = SheetIndex([ROWS[:2], ROWS[2:]])
+
+    def test_finds_every_cell_holding_a_value(self):
+        self.assertEqual(self.index.find('apple'), [(2, 1), (4, 1)])
+        self.assertEqual(self.index.find('5'), [(2, 2), (5, 2)])
+        self.assertEqual(self.index.find(5), [(2, 2), (5, 2)])
+        self.assertEqual(self.index.find('missing'), [])
+
+    def test_empty_cells_are_not_indexed(self):
+        self.assertEqual(self.index.find(None), [])
+        self.assertEqual(self.index.match('^$'), [])
+
+    def test_match_searches_the_texts(self):
+        self.assertEqual(self.index.match('^5'), [(2, 2), (3, 2), (5, 2)])
+        self.assertEqual(self.index.match('p'), [(2, 1), (3, 1), (4, 1)])
+
+    def test_update_moves_a_cell_to_its_new_value(self):
+        self.index.update(2, 1, 'plum')
+        self.assertEqual(self.index.find('apple'), [(4, 1)])
+        self.assertEqual(self.index.find('plum'), [(2, 1)])
+
+    def test_update_adds_and_removes_cells(self):
+        self.index.update(9, 9, 5.0)
+        self.assertEqual(self.index.find(5), [(2, 2), (5, 2), (9, 9)])
+        self.index.update(2, 2, None)
+        self.index.update(5, 2, '')
+        self.assertEqual(self.index.find(5), [(9, 9)])
+        self.index.update(9, 9, None)
+        self.assertEqual(self.index.match('^5$'), [])
+
+
+class FindCellsTest(LibraryTestCase):
+
+    def test_finds_duplicates_in_row_order(self):
+        self.assertEqual(self.library.find_cells_with_value('apple', 'Data'), ['A2', 'A4'])
+        self.assertEqual(self.library.find_cells_with_value('5', 'Data'), ['B2', 'B5'])
+
+    def test_searches_every_sheet(self):
+        self.library.add_new_sheet('Other')
+        self.library.put_value_to_cell('Other', 3, 3, 'apple')
+        self.assertEqual(sorted(self.library.find_cells_with_value('apple')), ['Data!A2', 'Data!A4', 'Other!C3'])
+
+    def test_index_follows_writes(self):
+        self.assertEqual(self.library.find_cells_with_value('apple', 'Data'), ['A2', 'A4'])
+        self.library.put_string_to_cell('Data', 1, 4, 'pear')
+        self.library.put_value_to_cell('Data', 3, 6, '5')
+        self.assertEqual(self.library.find_cells_with_value('apple', 'Data'), ['A2'])
+        self.assertEqual(self.library.find_cells_with_value('pear', 'Data'), ['A3', 'A4'])
+        self.assertEqual(self.library.find_cells_with_value('5', 'Data'), ['B2', 'B5', 'C6'])
+
+    def test_numbers_written_as_text_are_found_without_apostrophe(self):
+        self.library.find_cells_with_value('x', 'Data')
+        self.library.put_string_to_cell('Data', 3, 1, '42')
+        self.assertEqual(self.library.find_cells_matching_regex('^42$', 'Data'), ['C1'])
+
+
+class KeyIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = KeyIndex(1, ROWS[0] + [None, 3.0])
+        self.index.add_column(1, [values[0] for values in ROWS[1:]])
+
+    def test_column_by_header_or_number(self):
+        self.assertEqual(self.index.column('amount'), 2)
+        self.assertEqual(self.index.column('3'), 4)
+        self.assertEqual(self.index.column(3.0), 4)
+        self.assertEqual(self.index.column('5'), 5)
+        self.assertRaises(ValueError, self.index.column, 'missing')
+
+    def test_first_row_of_a_duplicate_key_wins(self):
+        self.assertEqual(self.index.row(1, 'apple'), 2)
+        self.assertEqual(self.index.row(1, 'pear'), 3)
+        self.assertEqual(self.index.row(1, 'missing'), None)
+
+    def test_numeric_keys_match_their_text(self):
+        self.index.add_column(2, [values[1] for values in ROWS[1:]])
+        self.assertEqual(self.index.row(2, '5'), 2)
+        self.assertEqual(self.index.row(2, 7), 4)
+        self.assertTrue(self.index.has_column(2))
+        self.assertFalse(self.index.has_column(3))
+
+    def test_rows_count_from_below_the_header_row(self):
+        index = KeyIndex(3, [u'name'])
+        index.add_column(1, [u'first', None, u'third'])
+        self.assertEqual(index.row(1, 'third'), 6)
+
+
+class GetRowByKeyTest(LibraryTestCase):
+
+    def test_returns_the_first_row_with_the_key(self):
+        self.assertEqual(dict(self.library.get_row_by_key('Data', 'name', 'apple')), {u'name': u'apple', u'amount': 5.0})
+        self.assertEqual(dict(self.library.get_row_by_key('Data', 'amount', '5')), {u'name': u'apple', u'amount': 5.0})
+
+    def test_missing_key_fails(self):
+        self.assertRaises(ValueError, self.library.get_row_by_key, 'Data', 'name', 'plum')
+
+    def test_index_is_rebuilt_after_a_write(self):
+        self.library.get_row_by_key('Data', 'name', 'apple')
+        self.library.put_string_to_cell('Data', 1, 2, 'plum')
+        self.assertEqual(self.library.get_row_by_key('Data', 'name', 'apple')['amount'], 7.0)
+        self.assertEqual(self.library.get_row_by_key('Data', 'name', 'plum')['amount'], 5.0)
+
+    def test_other_header_row(self):
+        self.library.put_values_to_range('Data', 1, 7, [[u'id', u'value'], [u'a', u'1']])
+        self.assertEqual(dict(self.library.get_row_by_key('Data', 'id', 'a', headerrow=7)), {u'id': u'a', u'value': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
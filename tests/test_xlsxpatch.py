@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Round trips of xlsx workbooks through xlsxpatch.save_changes and XlsxBackend.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import XlsxBackend
+from xlsxpatch import save_changes, shift_formula
+from xlsxreader import XlsxReader
+
+MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIPS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_RELATIONSHIPS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.'
+
+
+def write_workbook(path, rows, calc_chain=False, number_formats=()):
+    """
+    Writes a minimal xlsx file with one sheet Data holding the given <row> elements and
+    a style sheet with a cell format for each of the built in number_formats after the
+    default one; without any there are no date formats, as Excel leaves a workbook that
+    has no dates.
+    """
+    cell_formats = ''.join('<xf numFmtId="%d" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+                           % number_format for number_format in number_formats)
+    calc_type = ('<Override PartName="/xl/calcChain.xml" ContentType="%scalcChain+xml"/>' % CONTENT_TYPE
+                 if calc_chain else '')
+    calc_rel = ('<Relationship Id="rId3" Type="%s/calcChain" Target="calcChain.xml"/>' % RELATIONSHIPS
+                if calc_chain else '')
+    archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+    archive.writestr('[Content_Types].xml', (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="%ssheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="%sworksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="%sstyles+xml"/>%s</Types>')
+        % (CONTENT_TYPE, CONTENT_TYPE, CONTENT_TYPE, calc_type))
+    archive.writestr('_rels/.rels', (
+        '<Relationships xmlns="%s"><Relationship Id="rId1" Type="%s/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>') % (PACKAGE_RELATIONSHIPS, RELATIONSHIPS))
+    archive.writestr('xl/workbook.xml', (
+        '<workbook xmlns="%s" xmlns:r="%s"><sheets><sheet name="Data" sheetId="1" r:id="rId1"/></sheets>'
+        '<calcPr calcId="191029"/></workbook>') % (MAIN, RELATIONSHIPS))
+    archive.writestr('xl/_rels/workbook.xml.rels', (
+        '<Relationships xmlns="%s"><Relationship Id="rId1" Type="%s/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="%s/styles" Target="styles.xml"/>%s</Relationships>')
+        % (PACKAGE_RELATIONSHIPS, RELATIONSHIPS, RELATIONSHIPS, calc_rel))
+    archive.writestr('xl/styles.xml', (
+        '<styleSheet xmlns="%s"><fonts count="1"><font/></fonts><fills count="1"><fill/></fills>'
+        '<borders count="1"><border/></borders><cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/>'
+        '</cellStyleXfs><cellXfs count="%d"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>%s</cellXfs>'
+        '</styleSheet>') % (MAIN, len(number_formats) + 1, cell_formats))
+    archive.writestr('xl/worksheets/sheet1.xml', (
+        '<worksheet xmlns="%s"><dimension ref="A1:B3"/><sheetData>%s</sheetData></worksheet>') % (MAIN, rows))
+    if calc_chain:
+        archive.writestr('xl/calcChain.xml', '<calcChain xmlns="%s"><c r="B1" i="1"/></calcChain>' % MAIN)
+    archive.close()
+
+
+NUMBERS = ''.join('<row r="%d"><c r="A%d"><v>%d</v></c><c r="B%d"><v>%d</v></c></row>' % (row, row, row, row, row * 10)
+                  for row in (1, 2, 3))
+FORMULA = '<row r="1"><c r="A1"><v>1</v></c><c r="B1"><f>A1*2</f><v>2</v></c></row>'
+SHARED_FORMULA = ''.join(
+    '<row r="%d"><c r="A%d"><v>%d</v></c><c r="B%d">%s<v>%d</v></c></row>'
+    % (row, row, row, row, '<f t="shared" ref="B1:B3" si="0">A1*2</f>' if row == 1 else '<f t="shared" si="0"/>', row * 2)
+    for row in (1, 2, 3))
+
+
+class SaveChangesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'source.xlsx')
+        self.target = os.path.join(self.directory, 'target.xlsx')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def save(self, changes, target=None):
+        reader = XlsxReader(self.source)
+        try:
+            paths = dict((sheetname, reader.sheet_path(sheetname)) for sheetname in changes)
+            date_styles, day_styles, epoch = reader.date_styles(), reader.day_styles(), reader.epoch
+        finally:
+            reader.close()
+        dimensions = dict((sheetname, (3, 3)) for sheetname in changes)
+        save_changes(self.source, target or self.target, changes, paths, dimensions, date_styles, day_styles, epoch)
+
+    def read(self, cell, filename=None):
+        backend = XlsxBackend(filename or self.target)
+        try:
+            return backend.read_cell('Data', cell)
+        finally:
+            backend.close()
+
+    def member(self, name, filename=None):
+        archive = zipfile.ZipFile(filename or self.target)
+        try:
+            return archive.read(name)
+        finally:
+            archive.close()
+
+    def test_no_changes_copies_every_member_unchanged(self):
+        write_workbook(self.source, NUMBERS)
+        self.save({})
+        source, target = zipfile.ZipFile(self.source), zipfile.ZipFile(self.target)
+        try:
+            self.assertEqual(source.namelist(), target.namelist())
+            for info in source.infolist():
+                copied = target.getinfo(info.filename)
+                self.assertEqual((info.CRC, info.compress_size), (copied.CRC, copied.compress_size))
+                self.assertEqual(source.read(info.filename), target.read(info.filename))
+            self.assertIsNone(target.testzip())
+        finally:
+            source.close()
+            target.close()
+
+    def test_text_is_written_as_inline_string(self):
+        write_workbook(self.source, NUMBERS)
+        self.save({'Data': {(2, 1): u'a < b & \xe9', (2, 3): "'42"}})
+        self.assertEqual(self.read('A2'), u'a < b & \xe9')
+        self.assertEqual(self.read('C2'), u'42')
+        self.assertIn('t="inlineStr"', self.member('xl/worksheets/sheet1.xml'))
+        self.assertEqual(self.read('B2'), 20.0)
+
+    def test_date_adds_a_date_style(self):
+        write_workbook(self.source, NUMBERS)
+        self.save({'Data': {(1, 1): datetime(2020, 3, 4, 12, 30)}})
+        self.assertEqual(self.read('A1'), datetime(2020, 3, 4, 12, 30))
+        styles = self.member('xl/styles.xml')
+        self.assertIn('cellXfs count="2"', styles)
+        self.assertIn('numFmtId="14"', styles)
+
+    def test_date_does_not_get_a_time_style(self):
+        #  Style 1 shows only h:mm, style 2 a date.
+        write_workbook(self.source, NUMBERS, number_formats=(20, 14))
+        self.save({'Data': {(1, 1): datetime(2020, 3, 4)}})
+        self.assertIn('<c r="A1" s="2">', self.member('xl/worksheets/sheet1.xml'))
+
+    def test_date_adds_a_date_style_next_to_time_styles(self):
+        write_workbook(self.source, NUMBERS, number_formats=(20,))
+        self.save({'Data': {(1, 1): datetime(2020, 3, 4)}})
+        self.assertIn('<c r="A1" s="2">', self.member('xl/worksheets/sheet1.xml'))
+        self.assertIn('cellXfs count="3"', self.member('xl/styles.xml'))
+        self.assertEqual(self.read('A1'), datetime(2020, 3, 4))
+
+    def test_overwritten_formula_removes_the_calculation_chain(self):
+        write_workbook(self.source, FORMULA, calc_chain=True)
+        self.save({'Data': {(1, 2): 5}})
+        self.assertEqual(self.read('B1'), 5.0)
+        archive = zipfile.ZipFile(self.target)
+        try:
+            self.assertNotIn('xl/calcChain.xml', archive.namelist())
+            self.assertNotIn('calcChain', archive.read('[Content_Types].xml'))
+            self.assertNotIn('calcChain', archive.read('xl/_rels/workbook.xml.rels'))
+            self.assertIn('fullCalcOnLoad="1"', archive.read('xl/workbook.xml'))
+            self.assertNotIn('<f>', archive.read('xl/worksheets/sheet1.xml'))
+        finally:
+            archive.close()
+
+    def test_overwritten_shared_formula_master_keeps_the_other_formulas(self):
+        write_workbook(self.source, SHARED_FORMULA)
+        self.save({'Data': {(1, 2): 100}})
+        sheet = self.member('xl/worksheets/sheet1.xml')
+        self.assertNotIn('si="0"', sheet)
+        self.assertIn('<c r="B2"><f>A2*2</f><v>4</v></c>', sheet)
+        self.assertIn('<c r="B3"><f>A3*2</f><v>6</v></c>', sheet)
+        self.assertEqual(self.read('B1'), 100.0)
+
+    def test_untouched_shared_formula_stays_shared(self):
+        write_workbook(self.source, SHARED_FORMULA)
+        self.save({'Data': {(2, 1): 7}})
+        self.assertIn('<f t="shared" si="0"/>', self.member('xl/worksheets/sheet1.xml'))
+
+    def test_save_over_the_source_file(self):
+        write_workbook(self.source, NUMBERS)
+        self.save({'Data': {(3, 2): 1.5}}, target=self.source)
+        self.assertEqual(self.read('B3', self.source), 1.5)
+        self.assertEqual(os.listdir(self.directory), ['source.xlsx'])
+
+
+class ShiftFormulaTest(unittest.TestCase):
+
+    def test_relative_references_move(self):
+        self.assertEqual(shift_formula('SUM($A$1:B2)+LOG10(C3)', 1, 1), 'SUM($A$1:C3)+LOG10(D4)')
+        self.assertEqual(shift_formula('A$1+$A1', 2, 2), 'C$1+$A3')
+        self.assertEqual(shift_formula('SUM(A:B)+SUM(1:2)', 1, 1), 'SUM(B:C)+SUM(2:3)')
+
+    def test_text_and_sheet_names_stay(self):
+        self.assertEqual(shift_formula('TAB1!A1&"A1"', 1, 0), 'TAB1!A2&"A1"')
+        self.assertEqual(shift_formula("'Q1 2020'!B2", 1, 0), "'Q1 2020'!B3")
+
+    def test_references_off_the_sheet(self):
+        self.assertEqual(shift_formula('A1', -1, 0), '#REF!')
+
+
+class XlsxBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'book.xlsx')
+        write_workbook(self.filename, NUMBERS)
+        self.backend = XlsxBackend(self.filename)
+
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.directory)
+
+    def reopened(self):
+        backend = XlsxBackend(self.filename)
+        try:
+            return [backend.read_cell('Data', cell) for cell in ('A1', 'B1', 'C1')]
+        finally:
+            backend.close()
+
+    def test_written_values_read_back_like_saved_ones(self):
+        for column, value in enumerate([7, "'42", u'text'], 1):
+            self.backend.write_cell('Data', 1, column, value)
+        written = [self.backend.read_cell('Data', cell) for cell in ('A1', 'B1', 'C1')]
+        self.assertEqual(written, [7.0, u'42', u'text'])
+        self.assertIsInstance(written[0], float)
+        self.backend.save(self.filename)
+        self.assertEqual(self.reopened(), written)
+
+    def test_save_over_the_opened_file_twice(self):
+        self.backend.write_cell('Data', 1, 1, 5)
+        self.backend.save(self.filename)
+        self.backend.write_cell('Data', 1, 3, u'more')
+        self.backend.save(self.filename)
+        self.assertEqual(self.reopened(), [5.0, 10.0, u'more'])
+        self.assertEqual(self.backend.read_cell('Data', 'B2'), 20.0)
+
+    def test_dimensions_follow_writes(self):
+        self.assertEqual(self.backend.dimensions('Data'), (3, 2))
+        self.backend.write_cell('Data', 10, 4, 1)
+        self.backend.invalidate('Data')
+        self.assertEqual(self.backend.dimensions('Data'), (10, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
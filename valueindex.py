@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Indexes of cell values: value to cell addresses for the Find Cells ... keywords and
+key column value to row for the Get Row By Key keyword.
+"""
+
+import re
+
+
+def index_key(value):
+    """
+    Returns the text a cell value is indexed and searched by. Whole numbers lose their
+    fraction, so the text 5 finds a cell holding 5.0.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return unicode(int(value))
+    if isinstance(value, unicode):
+        return value
+    if isinstance(value, str):
+        return value.decode('utf-8')
+    return unicode(value)
+
+
+class SheetIndex(object):
+    """
+    Maps the index key of every non empty cell of a sheet to the (row, column) tuples
+    holding it, and back.
+    """
+
+    def __init__(self, chunks):
+        self._cells = {}
+        self._keys = {}
+        row = 0
+        for rows in chunks:
+            for values in rows:
+                row += 1
+                for col_offset, value in enumerate(values):
+                    if value is not None:
+                        self._add(index_key(value), (row, col_offset + 1))
+
+    def _add(self, key, position):
+        self._cells.setdefault(key, []).append(position)
+        self._keys[position] = key
+
+    def find(self, value):
+        return sorted(self._cells.get(index_key(value), []))
+
+    def match(self, pattern):
+        regex = re.compile(pattern)
+        found = []
+        for key, positions in self._cells.items():
+            if regex.search(key):
+                found.extend(positions)
+        return sorted(found)
+
+    def update(self, row, column, value):
+        position = (row, column)
+        old_key = self._keys.pop(position, None)
+        if old_key is not None:
+            positions = self._cells[old_key]
+            positions.remove(position)
+            if not positions:
+                del self._cells[old_key]
+        if value is not None and value != '':
+            self._add(index_key(value), position)
+
+
+class KeyIndex(object):
+    """
+    Header row and key column lookups of a sheet that is used as a table.
+
+    headers is the list of header texts of the header row, one per column (None for an
+    empty header cell). For every key column asked for, a dictionary of key text to row
+    number is built once; when a key occurs more than once the first row wins.
+    """
+
+    def __init__(self, header_row, headers):
+        self.header_row = header_row
+        self.headers = [None if header is None else index_key(header) for header in headers]
+        self._rows = {}
+
+    def column(self, keycolumn):
+        """
+        Returns the 1 based column number of a header text, or of a column number given as text.
+        """
+        key = index_key(keycolumn)
+        if key in self.headers:
+            return self.headers.index(key) + 1
+        if key.isdigit():
+            return int(key)
+        raise ValueError("No column with header '%s' in row %d" % (keycolumn, self.header_row))
+
+    def has_column(self, column):
+        return column in self._rows
+
+    def add_column(self, column, values):
+        rows = {}
+        for offset, value in enumerate(values):
+            if value is not None:
+                rows.setdefault(index_key(value), self.header_row + 1 + offset)
+        self._rows[column] = rows
+
+    def row(self, column, key):
+        return self._rows[column].get(index_key(key))
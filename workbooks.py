@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Registry of the workbooks Excel10Library has open, by alias.
+"""
+
+from collections import OrderedDict
+
+
+class WorkbookRegistry(object):
+    """
+    Keeps the state of every open workbook under its alias, least recently used first.
+
+    When more than max_open workbooks are added, the least recently used ones are
+    returned by add() so the caller can close them.
+    """
+
+    def __init__(self, max_open=10):
+        self.max_open = int(max_open)
+        self._workbooks = OrderedDict()
+
+    def __contains__(self, alias):
+        return alias in self._workbooks
+
+    def __len__(self):
+        return len(self._workbooks)
+
+    def aliases(self):
+        return list(self._workbooks)
+
+    def add(self, alias, workbook):
+        """
+        Registers a workbook as the most recently used one and returns a list of
+        (alias, workbook) tuples that no longer fit and have been removed.
+        """
+        self._workbooks.pop(alias, None)
+        self._workbooks[alias] = workbook
+        evicted = []
+        while len(self._workbooks) > max(self.max_open, 1):
+            evicted.append(self._workbooks.popitem(last=False))
+        return evicted
+
+    def get(self, alias):
+        """
+        Returns the workbook registered under alias and marks it as most recently used.
+        """
+        try:
+            workbook = self._workbooks.pop(alias)
+        except KeyError:
+            raise ValueError("No open workbook with alias '%s', open workbooks: %s" % (alias, ', '.join(self._workbooks)))
+        self._workbooks[alias] = workbook
+        return workbook
+
+    def update(self, alias, workbook):
+        if alias in self._workbooks:
+            self._workbooks[alias] = workbook
+
+    def remove(self, alias):
+        return self._workbooks.pop(alias, None)
+
+    def most_recent(self):
+        """
+        Returns the alias of the most recently used workbook, or None when none is open.
+        """
+        return next(reversed(self._workbooks), None)
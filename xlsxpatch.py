@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""
+Saves changed cells of an opened xlsx file into a copy of it.
+
+Only the worksheets with changed cells are rewritten, and in them only the changed rows;
+all other members of the zip archive are copied byte for byte, without decompressing
+them. Changed text is written as inline strings, so the shared strings stay as they are.
+"""
+
+import os
+import re
+import struct
+import tempfile
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape, unescape
+
+from cellref import cell_address, column_letter, column_number, split_address
+
+#  The xf added to styles.xml when a date is written and the workbook has no date style yet.
+_DATE_XF = '<%sxf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+
+_ATTRIBUTE_RE = r'\b%s="([^"]*)"'
+
+
+def _attribute(attributes, name):
+    match = re.search(_ATTRIBUTE_RE % name, attributes)
+    return match.group(1) if match else None
+
+
+def _without_attribute(attributes, name):
+    return re.sub(r'\s*' + _ATTRIBUTE_RE % name, '', attributes)
+
+
+#  Relative parts of cell references (A1, $A1, A$1), whole columns (A:C) and whole rows (1:3)
+#  in a formula, outside of text and quoted sheet names.
+_REFERENCE_RE = re.compile(r"(?<![A-Za-z0-9_.$])(\$?)([A-Z]{1,3})(\$?)([0-9]+)(?![A-Za-z0-9_(!])")
+_COLUMNS_RE = re.compile(r"(?<![A-Za-z0-9_.$])(\$?)([A-Z]{1,3}):(\$?)([A-Z]{1,3})(?![A-Za-z0-9_(!])")
+_ROWS_RE = re.compile(r"(?<![A-Za-z0-9_.$:])(\$?)([0-9]+):(\$?)([0-9]+)(?![A-Za-z0-9_.(:])")
+_QUOTED_RE = re.compile(r'("[^"]*"|\'[^\']*\')')
+
+_MAX_ROW = 1048576
+_MAX_COLUMN = 16384
+
+
+def _shift_row(absolute, row, rows):
+    if absolute:
+        return row
+    row = int(row) + rows
+    return str(row) if 1 <= row <= _MAX_ROW else None
+
+
+def _shift_column(absolute, letters, columns):
+    if absolute:
+        return letters
+    column = column_number(letters) + columns
+    return column_letter(column) if 1 <= column <= _MAX_COLUMN else None
+
+
+def shift_formula(formula, rows, columns):
+    """
+    Returns a formula moved by rows and columns, the way Excel fills a shared formula
+    into the other cells of its range: relative references move, absolute ones do not.
+    References moved off the sheet become #REF!.
+    """
+    def reference(match):
+        column = _shift_column(match.group(1), match.group(2), columns)
+        row = _shift_row(match.group(3), match.group(4), rows)
+        if column is None or row is None:
+            return '#REF!'
+        return match.group(1) + column + match.group(3) + row
+
+    def whole_columns(match):
+        first = _shift_column(match.group(1), match.group(2), columns)
+        last = _shift_column(match.group(3), match.group(4), columns)
+        if first is None or last is None:
+            return '#REF!'
+        return '%s%s:%s%s' % (match.group(1), first, match.group(3), last)
+
+    def whole_rows(match):
+        first = _shift_row(match.group(1), match.group(2), rows)
+        last = _shift_row(match.group(3), match.group(4), rows)
+        if first is None or last is None:
+            return '#REF!'
+        return '%s%s:%s%s' % (match.group(1), first, match.group(3), last)
+
+    parts = _QUOTED_RE.split(formula)
+    for index in range(0, len(parts), 2):
+        part = _REFERENCE_RE.sub(reference, parts[index])
+        part = _COLUMNS_RE.sub(whole_columns, part)
+        parts[index] = _ROWS_RE.sub(whole_rows, part)
+    return ''.join(parts)
+
+
+def _serial(value, epoch):
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    delta = value - epoch
+    return delta.days + (delta.seconds + delta.microseconds / 1e6) / 86400.0
+
+
+class SheetPatcher(object):
+    """
+    Writes changed cells into the XML of one worksheet. date_style is the index of the
+    cell format used for dates in cells that do not have a date format already.
+    """
+
+    def __init__(self, xml, date_styles, date_style, epoch):
+        self.xml = xml
+        self.date_styles = date_styles
+        self.date_style = date_style
+        self.epoch = epoch
+        self.removed_formula = False
+        match = re.search(r'<((?:\w+:)?)sheetData\b[^>]*?(/?)>', xml)
+        if match is None:
+            raise ValueError('Worksheet without sheetData')
+        self.prefix = match.group(1)
+
+    def _cell(self, ref, value, style):
+        p = self.prefix
+        if isinstance(value, (date, datetime)):
+            if style is None or int(style) not in self.date_styles:
+                style = str(self.date_style)
+            value = repr(_serial(value, self.epoch))
+            kind = ''
+        elif isinstance(value, bool):
+            value, kind = str(int(value)), ' t="b"'
+        elif isinstance(value, (int, long, float)):
+            value, kind = repr(value).rstrip('L'), ''
+        else:
+            if not isinstance(value, unicode):
+                value = str(value).decode('utf-8')
+            #  A leading apostrophe only tells Excel to keep the text as text, it is not part of the value.
+            if value.startswith(u"'"):
+                value = value[1:]
+            text = escape(value).encode('utf-8')
+            space = ' xml:space="preserve"' if value != value.strip() else ''
+            style = '' if style is None else ' s="%s"' % style
+            return '<%sc r="%s"%s t="inlineStr"><%sis><%st%s>%s</%st></%sis></%sc>' % (
+                p, ref, style, p, p, space, text, p, p, p)
+        style = '' if style is None else ' s="%s"' % style
+        return '<%sc r="%s"%s%s><%sv>%s</%sv></%sc>' % (p, ref, style, kind, p, value, p, p)
+
+    def _unshare(self, xml, changes):
+        """
+        Returns the worksheet XML with the shared formulas whose master cell is changed
+        turned into a plain formula in every cell that shares them. Those cells only
+        point to the master with si, without the master Excel calls the file corrupt.
+        """
+        p = self.prefix
+        cell_re = re.compile(r'<%sc\b([^>]*?)(?:/>|>(.*?)</%sc>)' % (p, p), re.S)
+        formula_re = re.compile(r'<%sf\b([^>]*?)(?:/>|>(.*?)</%sf>)' % (p, p), re.S)
+
+        def shared_formula(cell):
+            #  Returns (position, formula attributes, formula match) of a cell with a shared formula.
+            content = cell.group(2)
+            if not content or 'shared' not in content:
+                return None
+            formula = formula_re.search(content)
+            ref = _attribute(cell.group(1), 'r')
+            if formula is None or ref is None or _attribute(formula.group(1), 't') != 'shared':
+                return None
+            return split_address(ref), formula.group(1), formula
+
+        masters = {}
+        for cell in cell_re.finditer(xml):
+            found = shared_formula(cell)
+            if found is not None and found[0] in changes and _attribute(found[1], 'ref') is not None:
+                masters[_attribute(found[1], 'si')] = (found[0], unescape(found[2].group(2) or ''))
+        if not masters:
+            return xml
+
+        def expand(cell):
+            found = shared_formula(cell)
+            if found is None or _attribute(found[1], 'si') not in masters:
+                return cell.group(0)
+            (row, column), attributes, formula = found
+            (master_row, master_column), text = masters[_attribute(attributes, 'si')]
+            plain = '<%sf>%s</%sf>' % (p, escape(shift_formula(text, row - master_row, column - master_column)), p)
+            content = cell.group(2)
+            return '<%sc%s>%s%s%s</%sc>' % (p, cell.group(1), content[:formula.start()], plain, content[formula.end():], p)
+
+        return cell_re.sub(expand, xml)
+
+    def _row(self, row, attributes, content, changes):
+        #  Returns the new <row> element with the changes merged into its cells.
+        p = self.prefix
+        cells = []
+        column = 0
+        for match in re.finditer(r'<%sc\b([^>]*?)(?:/>|>(.*?)</%sc>)' % (p, p), content or '', re.S):
+            ref = _attribute(match.group(1), 'r')
+            column = split_address(ref)[1] if ref else column + 1
+            cells.append((column, match.group(0), match.group(1), match.group(2) or ''))
+        existing = dict((cell[0], cell) for cell in cells)
+        for column, value in changes.items():
+            old = existing.get(column)
+            style = _attribute(old[2], 's') if old else None
+            if old and ('<%sf' % p) in old[3]:
+                self.removed_formula = True
+            ref = cell_address(row, column)
+            if value is None or value == '':
+                xml = '<%sc r="%s" s="%s"/>' % (p, ref, style) if style is not None else ''
+            else:
+                xml = self._cell(ref, value, style)
+            existing[column] = (column, xml, None, None)
+        body = ''.join(existing[column][1] for column in sorted(existing))
+        attributes = _without_attribute(attributes, 'spans')
+        if _attribute(attributes, 'r') is None:
+            attributes = ' r="%d"%s' % (row, attributes)
+        return '<%srow%s>%s</%srow>' % (p, attributes, body, p)
+
+    def patch(self, changes):
+        """
+        Returns the worksheet XML with changes, a dictionary of (row, column) to value,
+        applied. None or an empty string empties a cell.
+        """
+        p = self.prefix
+        by_row = {}
+        for (row, column), value in changes.items():
+            by_row.setdefault(row, {})[column] = value
+        xml = re.sub(r'<(%s)sheetData\b([^>]*?)/>' % p, r'<\1sheetData\2></\1sheetData>', self.xml, 1)
+        if 'shared' in xml:
+            xml = self._unshare(xml, changes)
+        start = re.search(r'<%ssheetData\b[^>]*>' % p, xml).end()
+        end = xml.index('</%ssheetData>' % p, start)
+        new_rows = sorted(by_row, reverse=True)
+        parts = [xml[:start]]
+        position = start
+        row = 0
+        for match in re.finditer(r'<%srow\b([^>]*?)(?:/>|>(.*?)</%srow>)' % (p, p), xml[start:end], re.S):
+            number = _attribute(match.group(1), 'r')
+            row = int(number) if number else row + 1
+            parts.append(xml[position:start + match.start()])
+            while new_rows and new_rows[-1] < row:
+                new_row = new_rows.pop()
+                parts.append(self._row(new_row, '', '', by_row[new_row]))
+            if new_rows and new_rows[-1] == row:
+                new_rows.pop()
+                parts.append(self._row(row, match.group(1), match.group(2), by_row[row]))
+            else:
+                parts.append(match.group(0))
+            position = start + match.end()
+        parts.append(xml[position:end])
+        parts.extend(self._row(new_row, '', '', by_row[new_row]) for new_row in reversed(new_rows))
+        parts.append(xml[end:])
+        return ''.join(parts)
+
+
+def _dimension(xml, last_row, last_column):
+    return re.sub(r'(<(?:\w+:)?dimension\b[^>]*\bref=")[^"]*(")',
+                  r'\g<1>A1:%s\g<2>' % cell_address(last_row, last_column), xml, 1)
+
+
+def _add_date_style(styles):
+    #  Returns the styles XML with a date cell format added, and the index of that format.
+    match = re.search(r'<((?:\w+:)?)cellXfs\b([^>]*)>(.*?)</(?:\w+:)?cellXfs>', styles, re.S)
+    if match is None:
+        raise ValueError('styles.xml without cellXfs')
+    prefix = match.group(1)
+    index = len(re.findall(r'<%sxf\b' % prefix, match.group(3)))
+    attributes = re.sub(r'\bcount="\d+"', 'count="%d"' % (index + 1), match.group(2))
+    cell_xfs = '<%scellXfs%s>%s%s</%scellXfs>' % (prefix, attributes, match.group(3), _DATE_XF % prefix, prefix)
+    return styles[:match.start()] + cell_xfs + styles[match.end():], index
+
+
+def _full_calculation(workbook):
+    #  Cached formula results may depend on the changed cells, Excel recalculates them on open.
+    if re.search(r'<(?:\w+:)?calcPr\b[^>]*\bfullCalcOnLoad=', workbook):
+        return re.sub(r'(\bfullCalcOnLoad=")[^"]*(")', r'\g<1>1\g<2>', workbook, 1)
+    match = re.search(r'<((?:\w+:)?)calcPr\b', workbook)
+    if match:
+        return workbook[:match.end()] + ' fullCalcOnLoad="1"' + workbook[match.end():]
+    match = re.search(r'</((?:\w+:)?)workbook>', workbook)
+    return workbook[:match.start()] + '<%scalcPr fullCalcOnLoad="1"/>' % match.group(1) + workbook[match.start():]
+
+
+def _without_calc_chain(xml):
+    return re.sub(r'<(?:\w+:)?(?:Override|Relationship)\b[^>]*calcChain[^>]*/>', '', xml)
+
+
+def copy_member(source, target, info):
+    """
+    Copies a member of the zip archive source into target without decompressing it.
+    """
+    source.fp.seek(info.header_offset)
+    header = struct.unpack(zipfile.structFileHeader, source.fp.read(zipfile.sizeFileHeader))
+    source.fp.seek(header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH], 1)
+    data = source.fp.read(info.compress_size)
+    copied = zipfile.ZipInfo(info.filename, info.date_time)
+    copied.compress_type = info.compress_type
+    copied.external_attr = info.external_attr
+    copied.CRC = info.CRC
+    copied.compress_size = info.compress_size
+    copied.file_size = info.file_size
+    #  zipfile has no public way to add compressed data as it is.
+    copied.header_offset = target.fp.tell()
+    target.fp.write(copied.FileHeader())
+    target.fp.write(data)
+    target.filelist.append(copied)
+    target.NameToInfo[copied.filename] = copied
+
+
+def save_changes(source_name, filename, changes, sheet_paths, dimensions, date_styles, day_styles, epoch):
+    """
+    Writes a copy of the xlsx file source_name to filename with the changed cells.
+
+    changes maps sheet names to dictionaries of (row, column) to value, sheet_paths
+    sheet names to their member in the archive and dimensions sheet names to their
+    (last row, last column). date_styles are the cell formats that show a date or time,
+    day_styles those of them that show the day; a date written to a cell without a date
+    format gets the first of day_styles, or a date format added to the workbook. The file is written under a temporary name and then
+    replaces filename, which may be source_name itself.
+    """
+    source = zipfile.ZipFile(source_name)
+    handle, temp_path = tempfile.mkstemp(suffix='.xlsx', dir=os.path.dirname(os.path.abspath(filename)))
+    os.close(handle)
+    try:
+        names = source.namelist()
+        replaced = {}
+        #  Not a format showing only the time, like h:mm.
+        date_style = min(day_styles) if day_styles else None
+        needs_date = any(isinstance(value, (date, datetime))
+                         for cells in changes.values() for value in cells.values())
+        if needs_date and date_style is None:
+            replaced['xl/styles.xml'], date_style = _add_date_style(source.read('xl/styles.xml'))
+            date_styles = set(date_styles) | set([date_style])
+        removed_formula = False
+        for sheetname, cells in changes.items():
+            if not cells:
+                continue
+            path = sheet_paths[sheetname]
+            patcher = SheetPatcher(source.read(path), date_styles, date_style, epoch)
+            replaced[path] = _dimension(patcher.patch(cells), *dimensions[sheetname])
+            removed_formula = removed_formula or patcher.removed_formula
+        if replaced:
+            replaced['xl/workbook.xml'] = _full_calculation(source.read('xl/workbook.xml'))
+        skipped = set()
+        if removed_formula and 'xl/calcChain.xml' in names:
+            #  The calculation chain lists the formula cells, Excel rebuilds it when it is missing.
+            skipped.add('xl/calcChain.xml')
+            replaced['[Content_Types].xml'] = _without_calc_chain(source.read('[Content_Types].xml'))
+            replaced['xl/_rels/workbook.xml.rels'] = _without_calc_chain(source.read('xl/_rels/workbook.xml.rels'))
+        target = zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED)
+        try:
+            for info in source.infolist():
+                if info.filename in skipped:
+                    continue
+                if info.filename in replaced:
+                    target.writestr(info.filename, replaced[info.filename], zipfile.ZIP_DEFLATED)
+                else:
+                    copy_member(source, target, info)
+        finally:
+            target.close()
+    except Exception:
+        source.close()
+        os.remove(temp_path)
+        raise
+    source.close()
+    try:
+        os.rename(temp_path, filename)
+    except OSError:
+        #  Windows does not replace an existing file.
+        os.remove(filename)
+        os.rename(temp_path, filename)
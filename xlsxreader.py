@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Streaming reader for xlsx (Office Open XML) files.
+
+The workbook is read straight from the zip archive, so no Excel process is needed.
+Worksheets are parsed incrementally and only when they are asked for, the shared
+strings and the styles are loaded the first time a cell needs them.
+"""
+
+import re
+import posixpath
+import zipfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+from cellref import split_address
+
+_REL_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+_STRICT_REL_ID = '{http://purl.oclc.org/ooxml/officeDocument/relationships}id'
+
+#  Built in number formats 14-22 and 45-47 are dates and times.
+_BUILTIN_DATE_FORMATS = frozenset(list(range(14, 23)) + list(range(45, 48)))
+#  Of those, 14-17 and 22 show the day, the others only a time.
+_BUILTIN_DAY_FORMATS = frozenset(list(range(14, 18)) + [22])
+_FORMAT_LITERALS_RE = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.|_.|\*.')
+_DATE_TOKENS_RE = re.compile(r'[dmyhs]', re.IGNORECASE)
+_DAY_TOKENS_RE = re.compile(r'[dy]', re.IGNORECASE)
+
+_EPOCH_1900 = datetime(1899, 12, 30)
+_EPOCH_1904 = datetime(1904, 1, 1)
+
+
+def _localname(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _is_date_format(code, tokens=_DATE_TOKENS_RE):
+    code = _FORMAT_LITERALS_RE.sub('', code.split(';')[0])
+    return tokens.search(code) is not None
+
+
+def _string_item(element):
+    #  Plain (<t>) and rich text (<r><t>) runs are joined, phonetic runs (<rPh>) are skipped.
+    parts = []
+    for child in element:
+        name = _localname(child.tag)
+        if name == 't':
+            parts.append(child.text or u'')
+        elif name == 'r':
+            for run in child:
+                if _localname(run.tag) == 't':
+                    parts.append(run.text or u'')
+    return u''.join(parts)
+
+
+class XlsxReader(object):
+    """
+    Reads cell values from an xlsx file without Excel.
+
+    Values are returned like xlwings returns them: numbers as float, text as unicode,
+    dates as datetime, booleans as bool and empty cells as None.
+
+    source is an open file object to read the file from instead of filename, for files
+    that are kept in memory; filename then only names the file in messages.
+    """
+
+    def __init__(self, filename, source=None):
+        self.filename = filename
+        self._zip = zipfile.ZipFile(filename if source is None else source)
+        self._sheet_paths = OrderedDict()
+        self._active_sheet = 0
+        self._epoch = _EPOCH_1900
+        self._shared_strings = None
+        self._date_styles = None
+        self._day_styles = None
+        self._read_workbook()
+
+    def _read_workbook(self):
+        targets = {}
+        for rel in ElementTree.fromstring(self._zip.read('xl/_rels/workbook.xml.rels')):
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join('xl', target))
+            targets[rel.get('Id')] = target
+        for element in ElementTree.fromstring(self._zip.read('xl/workbook.xml')).iter():
+            name = _localname(element.tag)
+            if name == 'sheet':
+                rel_id = element.get(_REL_ID) or element.get(_STRICT_REL_ID)
+                self._sheet_paths[element.get('name')] = targets[rel_id]
+            elif name == 'workbookPr' and element.get('date1904') in ('1', 'true'):
+                self._epoch = _EPOCH_1904
+            elif name == 'workbookView':
+                self._active_sheet = int(element.get('activeTab', 0))
+
+    def sheet_names(self):
+        """
+        Returns the worksheet names in workbook order.
+        """
+        return list(self._sheet_paths)
+
+    def active_sheet_name(self):
+        """
+        Returns the name of the worksheet that was active when the file was saved.
+        """
+        return self.sheet_names()[self._active_sheet]
+
+    def sheet_name(self, sheet):
+        """
+        Returns the name of a worksheet given by name or by 0 based index.
+        """
+        if isinstance(sheet, int):
+            return self.sheet_names()[sheet]
+        if sheet not in self._sheet_paths:
+            raise KeyError("No sheet named '%s' in %s" % (sheet, self.filename))
+        return sheet
+
+    def sheet_path(self, sheet):
+        """
+        Returns the name of the zip archive member holding a worksheet.
+        """
+        return self._sheet_paths[self.sheet_name(sheet)]
+
+    @property
+    def epoch(self):
+        """
+        The datetime of serial number 0, which differs for the 1904 date system.
+        """
+        return self._epoch
+
+    def date_styles(self):
+        """
+        Returns the set of cell format indexes that show a date or time.
+        """
+        return set(self._get_date_styles())
+
+    def day_styles(self):
+        """
+        Returns the set of cell format indexes that show a date, not only a time.
+        """
+        self._get_date_styles()
+        return set(self._day_styles)
+
+    def dimension(self, sheet):
+        """
+        Returns the (last row, last column) from the <dimension> element of a worksheet,
+        or None when the worksheet has no such element. Parsing stops at the cell data.
+        """
+        source = self._zip.open(self._sheet_paths[self.sheet_name(sheet)])
+        try:
+            for event, element in ElementTree.iterparse(source, events=('start',)):
+                name = _localname(element.tag)
+                if name == 'dimension':
+                    return split_address(element.get('ref').split(':')[-1])
+                if name == 'sheetData':
+                    return None
+        finally:
+            source.close()
+        return None
+
+    def iter_rows(self, sheet):
+        """
+        Yields a (row, {column: value}) tuple for every row in the worksheet that holds cells.
+        Rows and columns are 1 based, empty cells are left out. Only one row is held in
+        memory at a time.
+        """
+        path = self._sheet_paths[self.sheet_name(sheet)]
+        source = self._zip.open(path)
+        try:
+            sheet_data = None
+            row_number = 0
+            column_number = 0
+            cells = {}
+            for event, element in ElementTree.iterparse(source, events=('start', 'end')):
+                name = _localname(element.tag)
+                if event == 'start':
+                    if name == 'row':
+                        row_number = int(element.get('r') or row_number + 1)
+                        column_number = 0
+                        cells = {}
+                    elif name == 'sheetData':
+                        sheet_data = element
+                    continue
+                if name == 'c':
+                    ref = element.get('r')
+                    if ref:
+                        column_number = split_address(ref)[1]
+                    else:
+                        column_number += 1
+                    value = self._cell_value(element)
+                    if value is not None:
+                        cells[column_number] = value
+                    element.clear()
+                elif name == 'row':
+                    if cells:
+                        yield row_number, cells
+                    element.clear()
+                    if sheet_data is not None:
+                        sheet_data.clear()
+                elif name == 'sheetData':
+                    break
+        finally:
+            source.close()
+
+    def _cell_value(self, element):
+        ctype = element.get('t', 'n')
+        text = None
+        for child in element:
+            name = _localname(child.tag)
+            if name == 'v':
+                text = child.text
+            elif name == 'is':
+                return _string_item(child)
+        if text is None:
+            return None
+        if ctype == 's':
+            return self._shared_string(int(text))
+        if ctype == 'b':
+            return text == '1'
+        if ctype in ('str', 'e', 'inlineStr'):
+            return text
+        number = float(text)
+        style = element.get('s')
+        if style is not None and int(style) in self._get_date_styles():
+            return self._to_datetime(number)
+        return number
+
+    def _shared_string(self, index):
+        if self._shared_strings is None:
+            self._shared_strings = self._load_shared_strings()
+        return self._shared_strings[index]
+
+    def _load_shared_strings(self):
+        strings = []
+        if 'xl/sharedStrings.xml' not in self._zip.namelist():
+            return strings
+        source = self._zip.open('xl/sharedStrings.xml')
+        try:
+            for event, element in ElementTree.iterparse(source):
+                if _localname(element.tag) == 'si':
+                    strings.append(_string_item(element))
+                    element.clear()
+        finally:
+            source.close()
+        return strings
+
+    def _get_date_styles(self):
+        if self._date_styles is None:
+            self._date_styles, self._day_styles = self._load_date_styles()
+        return self._date_styles
+
+    def _load_date_styles(self):
+        date_styles, day_styles = set(), set()
+        if 'xl/styles.xml' not in self._zip.namelist():
+            return date_styles, day_styles
+        root = ElementTree.fromstring(self._zip.read('xl/styles.xml'))
+        custom_formats = {}
+        cell_formats = None
+        for element in root:
+            name = _localname(element.tag)
+            if name == 'numFmts':
+                for fmt in element:
+                    custom_formats[int(fmt.get('numFmtId'))] = fmt.get('formatCode', '')
+            elif name == 'cellXfs':
+                cell_formats = element
+        if cell_formats is None:
+            return date_styles, day_styles
+        for index, xf in enumerate(cell_formats):
+            format_id = int(xf.get('numFmtId', 0))
+            if format_id in custom_formats:
+                if _is_date_format(custom_formats[format_id]):
+                    date_styles.add(index)
+                    if _is_date_format(custom_formats[format_id], _DAY_TOKENS_RE):
+                        day_styles.add(index)
+            elif format_id in _BUILTIN_DATE_FORMATS:
+                date_styles.add(index)
+                if format_id in _BUILTIN_DAY_FORMATS:
+                    day_styles.add(index)
+        return date_styles, day_styles
+
+    def _to_datetime(self, serial):
+        #  Rounded to milliseconds, the resolution Excel itself displays.
+        return self._epoch + timedelta(milliseconds=int(round(serial * 86400000)))
+
+    def close(self):
+        """
+        Closes the underlying zip archive.
+        """
+        self._zip.close()
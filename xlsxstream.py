@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+
+
+#  Copyright 2018 A.C. Hasper
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Write-only streaming writer for xlsx (Office Open XML) files.
+
+Rows are written to temporary files on disk as soon as the writes have moved past them,
+so memory use does not grow with the number of rows. save() puts the parts together in
+the xlsx zip archive. No Excel process is needed.
+"""
+
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import OrderedDict
+from datetime import datetime, date, time
+from xml.sax.saxutils import escape, quoteattr
+
+from cellref import cell_address
+
+_EPOCH = datetime(1899, 12, 30)
+
+#  Style 0 is the default, 1 shows a date (built in format 14), 2 a date and time (built in format 22).
+_DATE_STYLE = 1
+_DATETIME_STYLE = 2
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '%s</Types>')
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet%d.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>')
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>')
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<bookViews><workbookView activeTab="0"/></bookViews><sheets>%s</sheets></workbook>')
+_WORKBOOK_SHEET = '<sheet name=%s sheetId="%d" r:id="rId%d"/>'
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">%s'
+    '<Relationship Id="rId%d" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '<Relationship Id="rId%d" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+    'Target="sharedStrings.xml"/></Relationships>')
+_WORKBOOK_SHEET_REL = (
+    '<Relationship Id="rId%d" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet%d.xml"/>')
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>')
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<dimension ref="A1:%s"/><sheetData>')
+_SHEET_TAIL = '</sheetData></worksheet>'
+_STRINGS_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="%d" uniqueCount="%d">')
+_STRINGS_TAIL = '</sst>'
+
+
+def to_serial(value, epoch=_EPOCH):
+    """
+    Returns the Excel serial number of a date or datetime, in the 1900 date system unless
+    another epoch (the datetime of serial number 0) is given.
+    """
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    delta = value - epoch
+    return delta.days + (delta.seconds + delta.microseconds / 1e6) / 86400.0
+
+
+def _row_xml(row, cells):
+    parts = ['<row r="%d">' % row]
+    for column in sorted(cells):
+        parts.append(cells[column] % cell_address(row, column))
+    parts.append('</row>')
+    return ''.join(parts)
+
+
+def _copy_bytes(source, target, length):
+    while length > 0:
+        block = source.read(min(length, 1 << 20))
+        if not block:
+            break
+        target.write(block)
+        length -= len(block)
+
+
+def _unicode(value):
+    if isinstance(value, unicode):
+        return value
+    return str(value).decode('utf-8')
+
+
+def _text(value):
+    value = _unicode(value)
+    #  A leading apostrophe only tells Excel to keep the text as text, it is not part of the value.
+    if value.startswith(u"'"):
+        value = value[1:]
+    return value
+
+
+class _SheetStream(object):
+
+    def __init__(self, directory, index, name, window):
+        self.index = index
+        self.name = name
+        self.window = window
+        self.path = os.path.join(directory, 'sheet%d.xml' % index)
+        self.body = open(self.path, 'wb')
+        self.pending = {}
+        self.flushed_row = 0
+        self.last_row = 1
+        self.last_column = 1
+
+    def write_cell(self, row, column, cell):
+        if row <= self.flushed_row:
+            raise ValueError("Row %d of sheet '%s' has already been written to disk, rows can only be "
+                             "changed up to %d rows behind the last row written" % (row, self.name, self.window))
+        self.pending.setdefault(row, {})[column] = cell
+        self.last_row = max(self.last_row, row)
+        self.last_column = max(self.last_column, column)
+        if row - self.window > self.flushed_row:
+            self.flush(row - self.window)
+
+    def flush(self, up_to_row=None):
+        rows = sorted(row for row in self.pending if up_to_row is None or row <= up_to_row)
+        for row in rows:
+            self.body.write(_row_xml(row, self.pending.pop(row)))
+        self.flushed_row = max([self.flushed_row, up_to_row or 0] + rows)
+
+    def snapshot(self):
+        """
+        Returns the state save() needs: the rows on disk up to now, by length, and a copy
+        of the rows still in memory. Later writes do not change it.
+        """
+        self.body.flush()
+        pending = ''.join(_row_xml(row, self.pending[row]) for row in sorted(self.pending))
+        return {'index': self.index, 'name': self.name, 'path': self.path, 'length': self.body.tell(),
+                'pending': pending, 'last': cell_address(self.last_row, self.last_column)}
+
+    def close(self):
+        self.body.close()
+
+
+class XlsxStreamWriter(object):
+    """
+    Writes a new xlsx file without Excel.
+
+    Cells can be written in any order within the last `window` rows of a sheet, rows
+    before that are already on disk and cannot be changed anymore. Numbers, booleans,
+    text (as shared strings) and dates (as serial numbers with a date format) are supported.
+    """
+
+    def __init__(self, window=1000):
+        self.window = int(window)
+        self._directory = tempfile.mkdtemp(prefix='excel10-')
+        self._sheets = OrderedDict()
+        self._strings = {}
+        self._string_count = 0
+        self._strings_body = open(os.path.join(self._directory, 'strings.xml'), 'wb')
+
+    def sheet_names(self):
+        return list(self._sheets)
+
+    def add_sheet(self, name):
+        if name in self._sheets:
+            raise ValueError("Sheet '%s' already exists" % name)
+        self._sheets[name] = _SheetStream(self._directory, len(self._sheets) + 1, name, self.window)
+
+    def write_cell(self, sheetname, row, column, value):
+        try:
+            sheet = self._sheets[sheetname]
+        except KeyError:
+            raise KeyError("No sheet named '%s'" % sheetname)
+        sheet.write_cell(row, column, self._cell(value))
+
+    def _cell(self, value):
+        #  Returns the <c> element with a %s placeholder for its reference.
+        if value is None or value == '':
+            return '<c r="%s"/>'
+        if isinstance(value, bool):
+            return '<c r="%%s" t="b"><v>%d</v></c>' % value
+        if isinstance(value, (int, long, float)):
+            return '<c r="%%s"><v>%s</v></c>' % repr(value).rstrip('L')
+        if isinstance(value, datetime) and value.time() != time():
+            return '<c r="%%s" s="%d"><v>%r</v></c>' % (_DATETIME_STYLE, to_serial(value))
+        if isinstance(value, date):
+            #  Also midnight datetimes, which is what Put Date To Cell writes.
+            return '<c r="%%s" s="%d"><v>%r</v></c>' % (_DATE_STYLE, to_serial(value))
+        return '<c r="%%s" t="s"><v>%d</v></c>' % self._string_index(_text(value))
+
+    def _string_index(self, text):
+        self._string_count += 1
+        index = self._strings.get(text)
+        if index is None:
+            index = self._strings[text] = len(self._strings)
+            space = ' xml:space="preserve"' if text != text.strip() else ''
+            self._strings_body.write(('<si><t%s>%s</t></si>' % (space, escape(text))).encode('utf-8'))
+        return index
+
+    def save(self, filename):
+        """
+        Writes the xlsx file.
+        """
+        self.save_task(filename)()
+
+    def save_task(self, filename):
+        """
+        Returns a function without arguments that writes the xlsx file as it is now. Cells
+        written after this call are not in the file, so the function can run on another
+        thread while writing goes on. The writer must not be closed before it finished.
+        """
+        sheets = [sheet.snapshot() for sheet in self._sheets.values()]
+        self._strings_body.flush()
+        strings = (self._strings_body.name, self._strings_body.tell(),
+                   _STRINGS_HEAD % (self._string_count, len(self._strings)))
+        return lambda: self._save(filename, sheets, strings)
+
+    def _save(self, filename, sheets, strings):
+        archive = zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED)
+        try:
+            archive.writestr('[Content_Types].xml',
+                             _CONTENT_TYPES % ''.join(_SHEET_CONTENT_TYPE % sheet['index'] for sheet in sheets))
+            archive.writestr('_rels/.rels', _ROOT_RELS)
+            archive.writestr('xl/workbook.xml', _WORKBOOK % ''.join(
+                _WORKBOOK_SHEET % (quoteattr(_unicode(sheet['name'])).encode('utf-8'), sheet['index'], sheet['index'])
+                for sheet in sheets))
+            archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS % (
+                ''.join(_WORKBOOK_SHEET_REL % (sheet['index'], sheet['index']) for sheet in sheets),
+                len(sheets) + 1, len(sheets) + 2))
+            archive.writestr('xl/styles.xml', _STYLES)
+            path, length, head = strings
+            self._write_part(archive, 'xl/sharedStrings.xml', path, length, head, _STRINGS_TAIL)
+            for sheet in sheets:
+                self._write_part(archive, 'xl/worksheets/sheet%d.xml' % sheet['index'], sheet['path'], sheet['length'],
+                                 _SHEET_HEAD % sheet['last'], sheet['pending'] + _SHEET_TAIL)
+        finally:
+            archive.close()
+
+    def _write_part(self, archive, name, body_path, length, head, tail):
+        #  Head, streamed body and tail are joined in a temporary file so the body is never read into memory.
+        handle, part_path = tempfile.mkstemp(suffix='.xml', dir=self._directory)
+        with os.fdopen(handle, 'wb') as part:
+            part.write(head)
+            with open(body_path, 'rb') as body:
+                _copy_bytes(body, part, length)
+            part.write(tail)
+        archive.write(part_path, name)
+        os.remove(part_path)
+
+    def close(self):
+        """
+        Removes the temporary files.
+        """
+        for sheet in self._sheets.values():
+            sheet.close()
+        self._strings_body.close()
+        shutil.rmtree(self._directory, ignore_errors=True)